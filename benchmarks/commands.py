@@ -0,0 +1,388 @@
+"""Command benchmarks against a local QuickSight stand-in.
+
+Runs every `fv` command in-process against fastview/fake_quicksight.py, for
+synthetic accounts with 10, 1,000 and 50,000 assets, and records the AWS calls,
+wall time and peak Python memory of each one.  Nothing here needs AWS credentials
+or network access.
+
+    python benchmarks/commands.py [--sizes 10,1000,50000] [--latency-ms 5]
+    python benchmarks/commands.py --update-baseline
+
+Results are compared with benchmarks/baseline.json: the run fails if a command
+makes more calls than its baseline, or takes longer than its baseline wall time
+by more than --tolerance.  Wall times depend on the machine, so refresh the
+baseline with --update-baseline on the machine the comparison runs on, or pass
+--calls-only.
+"""
+import argparse
+import collections
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The catalog must not touch the real cache, so this is set before fastview loads.
+os.environ["FV_CACHE_DIR"] = tempfile.mkdtemp(prefix="fv-benchmark-")
+
+from typer.testing import CliRunner  # noqa: E402
+
+from fastview import calls, catalog, fake_quicksight  # noqa: E402
+from fastview.main import app  # noqa: E402
+
+DEFAULT_SIZES = [10, 1000, 50000]
+DEFAULT_BASELINE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+# Wall times within this many seconds of their baseline always pass, since short
+# commands vary by more than any sensible tolerance.
+TIMING_SLACK = 0.05
+
+Result = collections.namedtuple(
+    "Result", ["command", "calls", "operations", "seconds", "peak_mb", "error"]
+)
+
+
+def scenarios(size, workdir):
+    """Returns (label, argv) for every command, in the order they run.
+
+    They run against one account, so later commands see what earlier ones made;
+    the deletes come last.  Named assets are the last of their kind, so that any
+    scan through a list pays full price.
+    """
+    last = size - 1
+    manifest_path = os.path.join(workdir, "manifest.json")
+    with open(manifest_path, "w") as f:
+        json.dump(
+            {
+                "workspace": "stage",
+                "publish": [
+                    {
+                        "template": f"batch-template{i}",
+                        "analysis_id": f"analysis{i}",
+                        "datasets": [f"dataset{i}", f"dataset{last}"],
+                        "version_description": "benchmark",
+                        "dashboard": f"batch-dashboard{i}",
+                    }
+                    for i in range(min(size, 5))
+                ],
+            },
+            f,
+        )
+    clone_manifest_path = os.path.join(workdir, "clone.json")
+    with open(clone_manifest_path, "w") as f:
+        json.dump(
+            {
+                "owner_groups": ["admins"],
+                "clone": [
+                    {"source": f"dataset{i}", "name": f"batch-clone{i}"}
+                    for i in range(min(size, 3))
+                ],
+            },
+            f,
+        )
+    physical_table_map = json.dumps(
+        {
+            "table": {
+                "RelationalTable": {
+                    "DataSourceArn": "arn:aws:quicksight:::datasource/source0",
+                    "Name": "table",
+                    "InputColumns": [{"Name": "value", "Type": "STRING"}],
+                }
+            }
+        }
+    )
+    logical_table_map = json.dumps(
+        {"logical": {"Alias": "table", "Source": {"PhysicalTableId": "table"}}}
+    )
+    return [
+        ("list-groups", ["list-groups"]),
+        ("list-users", ["list-users"]),
+        ("list-data-sources", ["list-data-sources"]),
+        ("list-datasets", ["list-datasets"]),
+        ("list-datasets --output ndjson", ["--output", "ndjson", "list-datasets"]),
+        (
+            "list-datasets --aws-profiles (2 targets)",
+            ["--aws-profiles", "stage,prod", "list-datasets"],
+        ),
+        ("list-templates", ["list-templates"]),
+        ("list-dashboards", ["list-dashboards"]),
+        ("list-template-versions", ["list-template-versions", f"template{last}"]),
+        ("find", ["find", f"*{last}"]),
+        ("export", ["export", os.path.join(workdir, "export.jsonl.gz")]),
+        (
+            "export --since",
+            [
+                "export",
+                os.path.join(workdir, "incremental.jsonl.gz"),
+                "--since",
+                os.path.join(workdir, "export.jsonl.gz"),
+            ],
+        ),
+        ("describe-data-source", ["describe-data-source", f"Source {last}"]),
+        ("describe-dataset", ["describe-dataset", f"dataset{last}"]),
+        (
+            "describe-dataset (3 names)",
+            ["describe-dataset", "dataset0", f"dataset{size // 2}", f"dataset{last}"],
+        ),
+        ("describe-dashboard", ["describe-dashboard", f"Dashboard {last}"]),
+        ("describe-template", ["describe-template", f"template{last}"]),
+        ("create-group", ["create-group", "benchmark", "Benchmark group"]),
+        ("add-member-to-group", ["add-member-to-group", "user0", "benchmark"]),
+        ("create-group-of-all-users", ["create-group-of-all-users", "everyone"]),
+        (
+            "create-redshift-data-source",
+            [
+                "create-redshift-data-source",
+                "Benchmark source",
+                "admins",
+                "redshift.example.com",
+                "5439",
+                "dev",
+                "user",
+                "password",
+                "arn:aws:quicksight:::vpcConnection/benchmark",
+            ],
+        ),
+        (
+            "create-dataset",
+            [
+                "create-dataset",
+                "benchmark-dataset",
+                "admins",
+                "SPICE",
+                physical_table_map,
+                logical_table_map,
+            ],
+        ),
+        (
+            "clone-dataset",
+            ["clone-dataset", f"dataset{last}", "clone", "--owner-group", "admins"],
+        ),
+        ("clone-datasets (3 datasets)", ["clone-datasets", clone_manifest_path]),
+        (
+            "create-or-update-template",
+            [
+                "create-or-update-template",
+                f"template{last}",
+                "analysis",
+                f"dataset{last}",
+                "benchmark",
+            ],
+        ),
+        ("template-diff", ["template-diff", f"template{last}", "1", "2"]),
+        ("template-diff (cached)", ["template-diff", f"template{last}", "2", "1"]),
+        (
+            "create-or-update-dashboard",
+            [
+                "create-or-update-dashboard",
+                f"dashboard{last}",
+                f"Dashboard {last}",
+                f"template{last}",
+                "2",
+                "admins",
+                "group0",
+            ],
+        ),
+        (
+            "publish-analysis",
+            [
+                "publish-analysis",
+                "published-template",
+                "published-dashboard",
+                "Published dashboard",
+                "prod",
+                "benchmark",
+                "analysis",
+                "dataset0",
+                f"dataset{last}",
+            ],
+        ),
+        ("publish-batch", ["publish-batch", manifest_path]),
+        (
+            "update-data-source-permissions",
+            ["update-data-source-permissions", f"Source {last}", "admins"],
+        ),
+        (
+            "update-dataset-permissions",
+            ["update-dataset-permissions", f"dataset{last}", "admins"],
+        ),
+        (
+            "bulk-update-dataset-permissions",
+            ["bulk-update-dataset-permissions", "admins", "--name", "dataset1*"],
+        ),
+        (
+            "bulk-update-dataset-permissions (no changes)",
+            ["bulk-update-dataset-permissions", "admins", "--name", "dataset1*"],
+        ),
+        ("audit-permissions", ["audit-permissions"]),
+        (
+            "audit-permissions --principal (cached)",
+            ["audit-permissions", "--principal", "admins", "--type", "dataset"],
+        ),
+        ("delete-group", ["delete-group", "benchmark"]),
+        ("delete-data-source", ["delete-data-source", f"source{last}"]),
+        ("delete-dashboard", ["delete-dashboard", f"Dashboard {last}"]),
+        ("delete-template", ["delete-template", f"template{last}"]),
+    ]
+
+
+def _start_command():
+    """Resets the per-process state a fresh `fv` process would start without."""
+    with calls._limiters_lock:
+        calls._limiters.clear()
+    with catalog._lock:
+        catalog._refreshed_this_run.clear()
+
+
+def run_size(size, latency, only=None):
+    """Runs every scenario against a new account of `size` assets."""
+    account_id = f"{size:012d}"
+    quicksight = fake_quicksight.FakeQuickSight(account_id, size)
+    sts = fake_quicksight.FakeSTS(account_id)
+    runner = CliRunner()
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, argv in scenarios(size, workdir):
+            if only and label not in only:
+                continue
+            recorders = fake_quicksight.install(quicksight, sts, latency)
+            _start_command()
+            tracemalloc.start()
+            start = time.perf_counter()
+            # Answers "yes" to the deletes' confirmation prompts.
+            outcome = runner.invoke(app, argv, input="y\n")
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            operations = collections.Counter()
+            for recorder in recorders.values():
+                operations.update(recorder.counts)
+            error = None
+            if outcome.exit_code != 0:
+                error = repr(outcome.exception)
+                if isinstance(outcome.exception, SystemExit):
+                    lines = outcome.output.strip().splitlines()
+                    error = lines[-1] if lines else error
+            results.append(
+                Result(
+                    label,
+                    sum(operations.values()),
+                    dict(sorted(operations.items())),
+                    seconds,
+                    peak / 2**20,
+                    error,
+                )
+            )
+    return results
+
+
+def compare(size, result, baseline, tolerance, calls_only):
+    """Returns the reasons `result` is a regression against `baseline`."""
+    expected = baseline.get(str(size), {}).get(result.command)
+    if expected is None:
+        return []
+    problems = []
+    if result.calls > expected["calls"]:
+        problems.append(f"{result.calls} calls, baseline {expected['calls']}")
+    limit = expected["seconds"] * (1 + tolerance) + TIMING_SLACK
+    if not calls_only and result.seconds > limit:
+        problems.append(
+            f"{result.seconds:.2f}s, baseline {expected['seconds']:.2f}s "
+            f"(limit {limit:.2f}s)"
+        )
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(str(size) for size in DEFAULT_SIZES),
+        help="Comma-separated numbers of assets per account",
+    )
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=5.0,
+        help="Simulated round-trip time of every AWS call",
+    )
+    parser.add_argument(
+        "--only", default="", help="Comma-separated commands to run, e.g. list-users"
+    )
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.5,
+        help="Allowed slowdown over the baseline wall time, as a fraction",
+    )
+    parser.add_argument(
+        "--calls-only", action="store_true", help="Only fail on call count regressions"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write this run's results as the new baseline",
+    )
+    args = parser.parse_args()
+
+    # The fake never throttles, so the limiter would only measure QuickSight's
+    # quotas, not fastview.
+    calls.MAX_RATES = {}
+    calls.DEFAULT_MAX_RATE = 1e6
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    only = set(filter(None, args.only.split(",")))
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    failures = []
+    measured = {}
+    for size in sizes:
+        print(f"\n{size} assets")
+        print(f"{'command':<32} {'calls':>7} {'seconds':>8} {'peak MB':>8}")
+        measured[str(size)] = {}
+        for result in run_size(size, args.latency_ms / 1000, only):
+            problems = compare(size, result, baseline, args.tolerance, args.calls_only)
+            if result.error:
+                problems.append(f"failed: {result.error}")
+            flag = "  REGRESSION" if problems else ""
+            print(
+                f"{result.command:<32} {result.calls:>7} {result.seconds:>8.2f} "
+                f"{result.peak_mb:>8.1f}{flag}"
+            )
+            for problem in problems:
+                print(f"    {problem}")
+                failures.append(f"{size} assets, {result.command}: {problem}")
+            measured[str(size)][result.command] = {
+                "calls": result.calls,
+                "seconds": round(result.seconds, 3),
+                "peak_mb": round(result.peak_mb, 1),
+                "operations": result.operations,
+            }
+
+    if args.update_baseline:
+        for size, results in measured.items():
+            baseline.setdefault(size, {}).update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nWrote {args.baseline}")
+        return
+
+    if failures:
+        print(f"\n{len(failures)} regressions:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
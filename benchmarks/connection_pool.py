@@ -0,0 +1,161 @@
+"""Connection pool benchmark for the QuickSight client.
+
+Starts a local HTTP server that answers like QuickSight's ListDataSets after a
+simulated round trip, and measures how many calls per second a client built by
+fastview.session.client_config makes from many threads, for a range of
+`max_pool_connections`.  Nothing here needs AWS credentials or network access.
+
+When its pool is full, urllib3 does not make a thread wait: it opens another
+connection and throws it away afterwards.  Against AWS every such connection
+costs a TLS handshake, which the server simulates by sleeping --handshake-ms
+before it reads the first request on a connection.
+
+    python benchmarks/connection_pool.py [--pool-sizes 1,2,5,10,25,50]
+        [--threads 16] [--calls 320] [--latency-ms 50] [--handshake-ms 300]
+
+It fails if the largest pool is not at least --min-speedup times faster than the
+smallest, and prints how many TCP connections each run opened, to show that
+connections are reused.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fastview import session  # noqa: E402
+
+ACCOUNT_ID = "123456789012"
+
+
+class StandIn(ThreadingHTTPServer):
+    """A QuickSight endpoint that sleeps `handshake` seconds per new connection
+    and `latency` seconds per request, and counts the connections it is opened.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency, handshake):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keeps connections open between requests, as AWS endpoints do.
+    protocol_version = "HTTP/1.1"
+    # Sends the headers and the body at once, rather than waiting for an ACK.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake)
+
+    def do_GET(self):
+        time.sleep(self.server.latency)
+        body = json.dumps({"DataSetSummaries": [], "RequestId": "standin"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(server, pool_size, threads, calls):
+    """Returns (calls per second, connections opened) for one pool size."""
+    import boto3
+
+    client = boto3.session.Session(
+        aws_access_key_id="standin",
+        aws_secret_access_key="standin",
+        region_name="us-east-1",
+    ).client(
+        "quicksight",
+        endpoint_url=server.url,
+        config=session.client_config("quicksight", max_pool_connections=pool_size),
+    )
+    # Loads the service model, so that it is not timed.
+    client.list_data_sets(AwsAccountId=ACCOUNT_ID)
+    with server.lock:
+        server.connections = 0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        for _ in executor.map(
+            lambda _: client.list_data_sets(AwsAccountId=ACCOUNT_ID), range(calls)
+        ):
+            pass
+    elapsed = time.perf_counter() - start
+    client.close()
+    return calls / elapsed, server.connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", default="1,2,5,10,25,50")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=320)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=50.0,
+        help="Simulated round-trip time of every call",
+    )
+    parser.add_argument(
+        "--handshake-ms",
+        type=float,
+        default=300.0,
+        help="Simulated TLS handshake time of every new connection",
+    )
+    parser.add_argument(
+        "--min-speedup",
+        type=float,
+        default=1.25,
+        help="Required throughput of the largest pool over the smallest",
+    )
+    args = parser.parse_args()
+    pool_sizes = sorted(int(size) for size in args.pool_sizes.split(","))
+
+    server = StandIn(args.latency_ms / 1000, args.handshake_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(
+        f"{args.calls} calls from {args.threads} threads, "
+        f"{args.latency_ms:.0f} ms per call, "
+        f"{args.handshake_ms:.0f} ms per new connection"
+    )
+    print(f"{'pool size':>9} {'calls/s':>9} {'connections':>12}")
+    throughputs = []
+    for pool_size in pool_sizes:
+        throughput, connections = measure(server, pool_size, args.threads, args.calls)
+        throughputs.append(throughput)
+        print(f"{pool_size:>9} {throughput:>9.0f} {connections:>12}")
+    server.shutdown()
+
+    speedup = throughputs[-1] / throughputs[0]
+    print(f"\nPool of {pool_sizes[-1]}: {speedup:.2f}x the calls/s of {pool_sizes[0]}.")
+    if len(pool_sizes) > 1 and speedup < args.min_speedup:
+        print(f"FAIL: less than the required {args.min_speedup:.2f}x")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""Daemon benchmark: the wall time of `fv` commands sent to a warm `fv daemon`.
+
+Serves commands from a daemon thread backed by fastview/fake_quicksight.py, then
+runs a chain of commands, like a release script, each from a fresh `fv` process
+that forwards it to the daemon.  Nothing here needs AWS credentials or network
+access.
+
+    python benchmarks/daemon.py [--size 1000] [--latency-ms 5] [--rounds 3]
+
+Every forwarded command is compared with what a fresh process pays before its
+first AWS call: starting Python and importing fastview and boto3.  (Real runs
+also resolve credentials and look up the caller identity, which the stand-in
+cannot show.)  It fails if the median forwarded command takes longer than that.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# The catalog must not touch the real cache, so this is set before fastview loads.
+os.environ["FV_CACHE_DIR"] = tempfile.mkdtemp(prefix="fv-benchmark-")
+
+from fastview import calls, daemon, fake_quicksight  # noqa: E402
+
+
+def commands(size):
+    last = size - 1
+    return [
+        ["list-datasets"],
+        ["list-templates"],
+        ["describe-dataset", f"dataset{last}"],
+        ["describe-template", f"template{last}"],
+        ["find", f"dataset{last}"],
+        ["list-dashboards"],
+    ]
+
+
+def _time(argv):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable] + argv,
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    # The fake never throttles, so the limiter would only measure QuickSight's
+    # quotas, not fastview.
+    calls.MAX_RATES = {}
+    calls.DEFAULT_MAX_RATE = 1e6
+    account_id = f"{args.size:012d}"
+    fake_quicksight.install(
+        fake_quicksight.FakeQuickSight(account_id, args.size),
+        fake_quicksight.FakeSTS(account_id),
+        args.latency_ms / 1000,
+    )
+    server = threading.Thread(target=daemon.serve, daemon=True)
+    server.start()
+    while not daemon.is_running():
+        time.sleep(0.01)
+
+    # The first run warms the bytecode cache and is not counted.
+    _time(["-c", "import boto3, fastview.main"])
+    cold = statistics.median(
+        _time(["-c", "import boto3, fastview.main"]) for _ in range(5)
+    )
+    print(f"Fresh process, before its first AWS call: {cold:.0f} ms\n")
+
+    forward = ["-c", "from fastview.daemon import main; main()"]
+    timings = {}
+    for round_number in range(args.rounds + 1):
+        for argv in commands(args.size):
+            milliseconds = _time(forward + argv)
+            # The first round fills the catalog and warms the daemon.
+            if round_number:
+                timings.setdefault(" ".join(argv), []).append(milliseconds)
+    daemon.stop()
+    server.join()
+
+    print(f"{'forwarded command':<40} {'median ms':>10}")
+    for command, command_timings in timings.items():
+        print(f"{command:<40} {statistics.median(command_timings):>10.0f}")
+    median = statistics.median(t for ts in timings.values() for t in ts)
+    print(f"\nMedian forwarded command: {median:.0f} ms ({cold / median:.1f}x faster)")
+    if median > cold:
+        print("FAIL: slower than starting a fresh process")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Startup benchmark for the `fv` CLI.
+
+Runs `fv --help` in fresh interpreters and fails if the median wall time goes over
+the budget, or if importing the CLI pulls in boto3.  Nothing here needs AWS
+credentials or network access.
+
+    python benchmarks/startup.py [--runs 10] [--budget-ms 1000]
+
+The budget can also be set with FV_STARTUP_BUDGET_MS.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET_MS = 1000
+
+
+def _run(args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable] + args,
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.environ.get("FV_STARTUP_BUDGET_MS", DEFAULT_BUDGET_MS)),
+    )
+    args = parser.parse_args()
+
+    failures = []
+
+    probe = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, fastview.main; print('boto3' in sys.modules)",
+        ],
+        env=dict(os.environ, PYTHONPATH=ROOT),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    if probe.stdout.strip() != "False":
+        failures.append("importing fastview.main also imports boto3")
+
+    # The first run warms the bytecode cache and is not counted.
+    _run(["-m", "fastview.main", "--help"])
+    timings = [_run(["-m", "fastview.main", "--help"]) for _ in range(args.runs)]
+    median = statistics.median(timings)
+    print(
+        f"fv --help: median {median:.0f} ms, min {min(timings):.0f} ms, "
+        f"max {max(timings):.0f} ms over {args.runs} runs "
+        f"(budget {args.budget_ms:.0f} ms)"
+    )
+    if median > args.budget_ms:
+        failures.append(
+            f"median {median:.0f} ms is over the {args.budget_ms:.0f} ms budget"
+        )
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+"""Exporting a whole account to a compressed JSON Lines archive.
+
+`export` lists every data source, dataset, template and dashboard, describes each
+one and fetches its permissions on a thread pool, and writes one JSON record per
+asset as soon as it arrives.  Listing is streamed and at most a few records per
+worker are held in memory, so memory use does not grow with the account.
+
+The archive is gzip-compressed when its path ends in .gz and zstd-compressed when
+it ends in .zst (which needs the zstandard package).  While it is being written it
+lives at `<path>.partial`, flushed every few records; an interrupted export picks
+up from the records that made it to disk.
+
+Every archive gets a manifest, `<path>.manifest.json`, of the LastUpdatedTime of
+each asset it covers.  An incremental export (`since`) compares the listed
+summaries with a previous archive's manifest and only describes the assets that
+were added or changed since, writing a tombstone record for each one deleted.
+Assets whose describe failed are left out of the manifest (or keep their
+previous entry), so the next incremental export tries them again.
+Permission changes do not move LastUpdatedTime, so only a full export is sure to
+pick them up.
+"""
+import collections
+import gzip
+import io
+import json
+import os
+import time
+
+from fastview import calls, session
+
+ExportResult = collections.namedtuple(
+    "ExportResult", ["exported", "resumed", "unchanged", "deleted", "failed"]
+)
+ExportResult.__doc__ = """Record counts of an export.
+
+exported records were described by this run and resumed ones carried over from an
+interrupted run.  unchanged assets were left out of an incremental export, and
+deleted ones got a tombstone.  failed records have errors.
+"""
+
+Kind = collections.namedtuple(
+    "Kind",
+    [
+        "list_operation",
+        "list_key",
+        "id_key",
+        "describe_operation",
+        "describe_key",
+        "permissions_operation",
+    ],
+)
+
+KINDS = {
+    "data_source": Kind(
+        "list_data_sources",
+        "DataSources",
+        "DataSourceId",
+        "describe_data_source",
+        "DataSource",
+        "describe_data_source_permissions",
+    ),
+    "dataset": Kind(
+        "list_data_sets",
+        "DataSetSummaries",
+        "DataSetId",
+        "describe_data_set",
+        "DataSet",
+        "describe_data_set_permissions",
+    ),
+    "template": Kind(
+        "list_templates",
+        "TemplateSummaryList",
+        "TemplateId",
+        "describe_template",
+        "Template",
+        "describe_template_permissions",
+    ),
+    "dashboard": Kind(
+        "list_dashboards",
+        "DashboardSummaryList",
+        "DashboardId",
+        "describe_dashboard",
+        "Dashboard",
+        "describe_dashboard_permissions",
+    ),
+}
+
+# Records written between flushes; an interruption loses at most these.
+FLUSH_EVERY = 100
+PROGRESS_EVERY = 1000
+
+qs_client = calls.Client("quicksight")
+
+
+def compression(path):
+    """Returns "gzip", "zstd" or None, going by the extension of an archive path."""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith((".zst", ".zstd")):
+        return "zstd"
+    return None
+
+
+def open_archive(path, mode, compression_format=None):
+    """Opens a JSON Lines archive for reading ("r") or writing ("w") as text,
+    compressed with `compression_format`, or as `compression(path)` says.
+    """
+    compression_format = compression_format or compression(path)
+    if compression_format == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression_format == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise Exception(
+                "zstd archives need the zstandard package (pip install zstandard); "
+                "or use a .gz path."
+            )
+        raw = open(path, mode + "b")
+        if mode == "w":
+            stream = zstandard.ZstdCompressor().stream_writer(raw)
+        else:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def read_records(path, compression_format=None):
+    """Yields every complete record in an archive, stopping quietly at a
+    truncated end, as left by an interrupted export.
+    """
+    try:
+        with open_archive(path, "r", compression_format) as archive:
+            for line in archive:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    return
+                yield record
+    except EOFError:
+        return
+    except Exception as error:
+        # zstandard raises its own ZstdError on a truncated frame.
+        if type(error).__name__ != "ZstdError":
+            raise
+
+
+def record_key(record):
+    return record["type"], record["id"]
+
+
+def manifest_path(path):
+    return path + ".manifest.json"
+
+
+def load_manifest(path):
+    """Returns {type: {id: last updated}} for the archive at `path`, from its
+    manifest or, for archives without one, from its records.
+    """
+    if os.path.exists(manifest_path(path)):
+        with open(manifest_path(path)) as f:
+            return json.load(f)["assets"]
+    if not os.path.exists(path):
+        raise Exception(f"There is no archive at {path}")
+    assets = {}
+    for record in read_records(path):
+        # Records with errors are left out so that the next export retries them.
+        if record.get("change") != "deleted" and "errors" not in record:
+            assets.setdefault(record["type"], {})[record["id"]] = record["last_updated"]
+    return assets
+
+
+def _write_manifest(path, since, assets):
+    temporary_path = manifest_path(path) + ".partial"
+    with open(temporary_path, "w") as f:
+        json.dump(
+            {
+                "archive": os.path.basename(path),
+                "since": since,
+                "exported_at": time.time(),
+                "assets": assets,
+            },
+            f,
+        )
+    os.replace(temporary_path, manifest_path(path))
+
+
+def _last_updated(summary):
+    """Returns LastUpdatedTime as it is written to archives and manifests."""
+    last_updated = summary.get("LastUpdatedTime")
+    return None if last_updated is None else str(last_updated)
+
+
+def _summaries(kinds):
+    for kind_name in kinds:
+        kind = KINDS[kind_name]
+        for summary in calls.paginate(
+            getattr(qs_client, kind.list_operation),
+            kind.list_key,
+            AwsAccountId=session.account_id(),
+        ):
+            yield kind_name, summary
+
+
+def describe(kind_name, summary, change=None):
+    """Returns the archive record of one asset: its summary, its full description
+    and its permissions, plus `change` ("added" or "changed") in incremental
+    exports.  Failures are recorded in the record rather than raised, since
+    QuickSight cannot describe some assets (e.g. datasets made from file uploads).
+    """
+    kind = KINDS[kind_name]
+    resource_id = summary[kind.id_key]
+    record = {
+        "type": kind_name,
+        "id": resource_id,
+        "name": summary.get("Name"),
+        "arn": summary.get("Arn"),
+        "last_updated": _last_updated(summary),
+        "summary": summary,
+    }
+    if change:
+        record["change"] = change
+    params = {"AwsAccountId": session.account_id(), kind.id_key: resource_id}
+    for field, operation, key in [
+        ("description", kind.describe_operation, kind.describe_key),
+        ("permissions", kind.permissions_operation, "Permissions"),
+    ]:
+        try:
+            record[field] = getattr(qs_client, operation)(**params).get(key)
+        except Exception as error:
+            errors = record.setdefault("errors", {})
+            errors[field] = calls.error_code(error) or str(error)
+    return record
+
+
+def _recover(path, partial_path):
+    """Moves what an interrupted export left behind out of the way and returns
+    the path to read its records from, or None.
+    """
+    old_path = partial_path + ".old"
+    if os.path.exists(old_path):
+        # A previous resume was itself interrupted while copying records over.
+        return old_path
+    if os.path.exists(partial_path):
+        os.replace(partial_path, old_path)
+        return old_path
+    return None
+
+
+def export(
+    path, kinds=None, concurrency=calls.DEFAULT_CONCURRENCY, resume=True, since=None
+):
+    """Writes every asset of the given kinds (all of them by default) to the
+    archive at `path`, or with `since`, only those added, changed or deleted since
+    the archive at that path.  Returns an ExportResult.
+    """
+    kinds = list(kinds or KINDS)
+    previous = load_manifest(since) if since else None
+    partial_path = path + ".partial"
+    old_path = _recover(path, partial_path)
+    if old_path and not resume:
+        os.remove(old_path)
+        old_path = None
+
+    start_time = time.perf_counter()
+    done = set()
+    failed = set()
+    assets = {kind_name: {} for kind_name in kinds}
+    counts = collections.Counter()
+
+    def changed_assets():
+        for kind_name, summary in _summaries(kinds):
+            resource_id = summary[KINDS[kind_name].id_key]
+            last_updated = _last_updated(summary)
+            assets[kind_name][resource_id] = last_updated
+            if (kind_name, resource_id) in done:
+                continue
+            change = None
+            if previous is not None:
+                before = previous.get(kind_name, {})
+                if resource_id not in before:
+                    change = "added"
+                elif last_updated is None or before[resource_id] != last_updated:
+                    change = "changed"
+                else:
+                    counts["unchanged"] += 1
+                    continue
+            yield kind_name, summary, change
+
+    with open_archive(partial_path, "w", compression(path)) as archive:
+
+        def write(record):
+            archive.write(json.dumps(record, default=str) + "\n")
+            counts["written"] += 1
+            if counts["written"] % FLUSH_EVERY == 0:
+                archive.flush()
+
+        if old_path:
+            for record in read_records(old_path, compression(path)):
+                write(record)
+                done.add(record_key(record))
+                if "errors" in record:
+                    failed.add(record_key(record))
+            archive.flush()
+            os.remove(old_path)
+            print(f"Resuming after {len(done)} records already exported.")
+
+        for _, record in calls.map_ordered(
+            lambda item: describe(*item), changed_assets(), concurrency
+        ):
+            write(record)
+            counts["exported"] += 1
+            if "errors" in record:
+                counts["failed"] += 1
+                failed.add(record_key(record))
+            if counts["exported"] % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"{counts['exported']} records exported in {elapsed:.0f}s...")
+
+        for kind_name in kinds:
+            for resource_id in (previous or {}).get(kind_name, {}):
+                key = (kind_name, resource_id)
+                if resource_id not in assets[kind_name] and key not in done:
+                    write({"type": kind_name, "id": resource_id, "change": "deleted"})
+                    counts["deleted"] += 1
+
+    # Failed assets keep their previous entry, if any, to be retried next time.
+    for kind_name, resource_id in failed:
+        before = (previous or {}).get(kind_name, {})
+        if resource_id in before:
+            assets[kind_name][resource_id] = before[resource_id]
+        else:
+            assets[kind_name].pop(resource_id, None)
+
+    os.replace(partial_path, path)
+    _write_manifest(path, since, assets)
+    return ExportResult(
+        counts["exported"],
+        len(done),
+        counts["unchanged"],
+        counts["deleted"],
+        counts["failed"],
+    )
@@ -0,0 +1,72 @@
+"""Building QuickSight ARNs locally, instead of describing a resource to get one.
+
+QuickSight ARNs are arn:<partition>:quicksight:<region>:<account>:<resource>/<id>,
+with the partition and account taken from the caller identity.  Assets (data
+sources, datasets, analyses, templates and dashboards) are in the session's
+region.  Users, groups and namespaces are in the account's identity region, which
+may be a different one: set FV_IDENTITY_REGION when it is not the session's.
+
+Building an ARN does not check that the resource exists; `check` does, for many
+resources at once, from the catalog.
+"""
+import os
+
+from fastview import catalog, session
+
+
+def partition():
+    return session.caller_identity()["Arn"].split(":")[1]
+
+
+def identity_region():
+    return os.environ.get("FV_IDENTITY_REGION") or session.region()
+
+
+def arn(resource, resource_id, region=None):
+    return (
+        f"arn:{partition()}:quicksight:{region or session.region()}:"
+        f"{session.account_id()}:{resource}/{resource_id}"
+    )
+
+
+def data_source(data_source_id):
+    return arn("datasource", data_source_id)
+
+
+def dataset(dataset_id):
+    return arn("dataset", dataset_id)
+
+
+def analysis(analysis_id):
+    return arn("analysis", analysis_id)
+
+
+def template(template_id):
+    return arn("template", template_id)
+
+
+def dashboard(dashboard_id):
+    return arn("dashboard", dashboard_id)
+
+
+def group(group_name, namespace_name="default"):
+    return arn("group", f"{namespace_name}/{group_name}", identity_region())
+
+
+def user(user_name, namespace_name="default"):
+    return arn("user", f"{namespace_name}/{user_name}", identity_region())
+
+
+def namespace(namespace_name="default"):
+    return arn("namespace", namespace_name, identity_region())
+
+
+def check(resource_type, resource_ids):
+    """Raises an Exception naming every ID (a name, for users and groups) of this
+    type that is not in the catalog.
+    """
+    missing = catalog.missing(resource_type, resource_ids)
+    if missing:
+        label = resource_type.replace("_", " ")
+        named = "named" if resource_type in ("group", "user") else "with ID"
+        raise Exception(f"No {label} {named} {', '.join(missing)}.")
@@ -0,0 +1,155 @@
+"""The account-wide permission matrix: which principal can do what on which asset.
+
+`fetch` lists every data source, dataset, template and dashboard from the catalog
+and fetches their permissions on a thread pool, as one Cell per principal, asset
+and action.  The cells are cached as gzipped JSON Lines in the catalog's
+directory, so `load` answers queries like "what can group X see" without calling
+QuickSight again until the copy is older than its TTL (FV_AUDIT_TTL, in seconds)
+or `fv --refresh` is used.  Permission changes made through fastview, and the
+assets and groups it creates or deletes, drop the cached copy; changes made
+elsewhere show up once it expires.
+"""
+import collections
+import csv
+import fnmatch
+import json
+import os
+import time
+
+from fastview import archive, calls, catalog, session
+
+Cell = collections.namedtuple("Cell", ["principal", "type", "id", "name", "action"])
+Cell.__doc__ = """One action a principal may take on one asset.
+
+type is a key of archive.KINDS.  An asset whose permissions could not be fetched
+gets a single cell with no principal and the error code as its action.
+"""
+
+TTL = 3600
+
+qs_client = calls.Client("quicksight")
+
+
+def ttl():
+    override = os.environ.get("FV_AUDIT_TTL")
+    return TTL if override is None else float(override)
+
+
+def cache_path():
+    account, region = session.account_id(), session.region()
+    return os.path.join(catalog.cache_dir(), f"audit-{account}-{region}.jsonl.gz")
+
+
+def _cells(kind_name, summary):
+    kind = archive.KINDS[kind_name]
+    resource_id = summary[kind.id_key]
+    name = summary.get("Name", resource_id)
+    try:
+        permission_list = getattr(qs_client, kind.permissions_operation)(
+            AwsAccountId=session.account_id(), **{kind.id_key: resource_id}
+        )["Permissions"]
+    except Exception as error:
+        error = calls.error_code(error) or str(error)
+        return [Cell(None, kind_name, resource_id, name, error)]
+    return [
+        Cell(permission["Principal"], kind_name, resource_id, name, action)
+        for permission in permission_list
+        for action in sorted(permission["Actions"])
+    ]
+
+
+def fetch(concurrency=calls.DEFAULT_CONCURRENCY):
+    """Fetches the permissions of every asset, writes the cache and returns the
+    cells, sorted by principal, asset and action.
+    """
+    assets = (
+        (kind_name, summary)
+        for kind_name in archive.KINDS
+        for summary in catalog.summaries(kind_name)
+    )
+    cells = []
+    for _, asset_cells in calls.map_ordered(
+        lambda asset: _cells(*asset), assets, concurrency
+    ):
+        cells.extend(asset_cells)
+    cells.sort(key=lambda cell: tuple("" if x is None else x for x in cell))
+    path = cache_path()
+    with archive.open_archive(path + ".partial", "w", "gzip") as f:
+        for cell in cells:
+            f.write(json.dumps(cell._asdict()) + "\n")
+    os.replace(path + ".partial", path)
+    return cells
+
+
+def load(concurrency=calls.DEFAULT_CONCURRENCY, fetch_again=False):
+    """Returns the cells from the cache, fetching them first if the cache is
+    missing, older than its TTL, or `fetch_again` is set.
+    """
+    path = cache_path()
+    if (
+        fetch_again
+        or catalog.refresh_forced()
+        or not os.path.exists(path)
+        or time.time() - os.path.getmtime(path) > ttl()
+    ):
+        return fetch(concurrency)
+    return [Cell(**record) for record in archive.read_records(path, "gzip")]
+
+
+def invalidate():
+    """Drops the cached copy, after fastview has changed some permissions or
+    created or deleted an asset or group.
+    """
+    try:
+        os.remove(cache_path())
+    except FileNotFoundError:
+        pass
+
+
+def age():
+    """Returns how many seconds ago the cache was written, or None."""
+    path = cache_path()
+    return time.time() - os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def principal_matches(principal, pattern):
+    """Whether `pattern` names this principal: its whole ARN, the last part of it
+    (a user or group name), or a glob of either.
+    """
+    if principal is None:
+        return False
+    name = principal.rsplit("/", 1)[-1]
+    return any(
+        candidate == pattern or fnmatch.fnmatchcase(candidate, pattern)
+        for candidate in (principal, name)
+    )
+
+
+def query(cells, principal=None, resource_types=None, asset=None, action=None):
+    """Returns the cells matching every filter given: a principal (see
+    principal_matches), asset types, a glob of asset names, and a substring of
+    action names (ignoring case).
+    """
+    return [
+        cell
+        for cell in cells
+        if (principal is None or principal_matches(cell.principal, principal))
+        and (not resource_types or cell.type in resource_types)
+        and (asset is None or fnmatch.fnmatchcase(cell.name, asset))
+        and (action is None or action.lower() in cell.action.lower())
+    ]
+
+
+def write(cells, path):
+    """Writes cells to a CSV file if `path` ends in .csv, and to JSON Lines
+    (compressed as archive.compression says) otherwise.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(Cell._fields)
+            writer.writerows(cells)
+        return
+    with archive.open_archive(path, "w") as f:
+        for cell in cells:
+            f.write(json.dumps(cell._asdict()) + "\n")
@@ -0,0 +1,358 @@
+"""The layer every QuickSight call goes through.
+
+`Client` stands in for a boto3 client and sends each method call through `call`,
+which paces it with a per-operation token bucket and retries throttled or
+transiently failing calls with jittered exponential backoff.  Buckets are shared
+by every thread in the process, start at the rate in `MAX_RATES` and halve each
+time QuickSight throttles the operation, then climb back while calls succeed, so
+bulk work settles at the highest rate the account allows.
+
+Read calls are also memoized for the duration of a command: identical describe_* and
+list_* calls, including concurrent ones, share one request.  A write forgets the
+memoized reads of the same kind of resource (create_template forgets
+describe_template and list_templates, but not describe_data_set), and every command
+starts with an empty memo (see `reset_memo`).  Only the MEMO_SIZE most recently used
+responses are kept, so commands that read a whole account stay within bounded
+memory.
+
+Memoized responses and rate limiters are kept per session.Target, since each
+account and region has its own quotas.
+"""
+import collections
+import contextvars
+import copy
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fastview import session, tracing
+
+# The largest page QuickSight returns for any of its list operations.
+MAX_PAGE_SIZE = 100
+
+# Well within the connection pool of every client (session.MAX_POOL_CONNECTIONS).
+DEFAULT_CONCURRENCY = 8
+
+THROTTLING_ERROR_CODES = {"ThrottlingException", "TooManyRequestsException"}
+
+# Retried for read operations only, since a write may have gone through.
+TRANSIENT_ERROR_CODES = {
+    "InternalFailureException",
+    "ServiceUnavailableException",
+    "RequestTimeout",
+}
+
+MAX_ATTEMPTS = 8
+BASE_DELAY = 0.2
+MAX_DELAY = 10.0
+
+# Requests per second for each operation, following QuickSight's per-account API
+# quotas.  Exact names take precedence over prefixes, and FV_TPS_<OPERATION>
+# (e.g. FV_TPS_CREATE_GROUP_MEMBERSHIP=5) overrides both.
+MAX_RATES = {
+    "describe_": 20.0,
+    "list_": 20.0,
+    "create_group_membership": 10.0,
+    "delete_group_membership": 10.0,
+    "create_": 5.0,
+    "update_": 5.0,
+    "delete_": 5.0,
+}
+DEFAULT_MAX_RATE = 5.0
+MIN_RATE = 0.2
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+MEMO_SIZE = 256
+
+_memo = collections.OrderedDict()
+_memo_lock = threading.Lock()
+
+
+def error_code(error):
+    """Returns the AWS error code of a botocore ClientError, or None."""
+    return getattr(error, "response", {}).get("Error", {}).get("Code")
+
+
+def is_read_operation(operation_name):
+    return operation_name.startswith(("describe_", "list_", "get_", "search_"))
+
+
+class RateLimiter:
+    """Token bucket whose rate is halved on throttling (down to MIN_RATE) and
+    recovers by a twentieth of its ceiling per successful call.
+    """
+
+    def __init__(self, max_rate):
+        self.max_rate = max_rate
+        self.rate = max_rate
+        self._tokens = 1.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a call may be made."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    max(self.rate, 1.0),
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self._lock:
+            self.rate = max(MIN_RATE, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def max_rate(operation_name):
+    override = os.environ.get(f"FV_TPS_{operation_name.upper()}")
+    if override is not None:
+        return float(override)
+    if operation_name in MAX_RATES:
+        return MAX_RATES[operation_name]
+    for prefix, rate in MAX_RATES.items():
+        if prefix.endswith("_") and operation_name.startswith(prefix):
+            return rate
+    return DEFAULT_MAX_RATE
+
+
+def rate_limiter(service_name, operation_name):
+    """Returns the process-wide limiter for one operation in the current target."""
+    key = (session.target(), service_name, operation_name)
+    with _limiters_lock:
+        if key not in _limiters:
+            _limiters[key] = RateLimiter(max_rate(operation_name))
+        return _limiters[key]
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given (0-based) retry."""
+    return random.uniform(0, min(MAX_DELAY, BASE_DELAY * 2**attempt))
+
+
+def reset_memo():
+    """Forgets every memoized response.  Called at the start of each command."""
+    with _memo_lock:
+        _memo.clear()
+
+
+# Plural resource names that are not the singular plus "s".
+_PLURALS = {"analyses": "analysis"}
+
+
+def _resource(operation_name):
+    """Returns the resource an operation is about: the first noun after its verb,
+    in the singular.  E.g. "data_set" for "list_data_sets" and
+    "update_data_set_permissions", and "dashboard" for "list_dashboard_versions".
+    """
+    words = operation_name.split("_")[1:]
+    noun = "_".join(words[:2] if words[:1] == ["data"] else words[:1])
+    if noun in _PLURALS:
+        return _PLURALS[noun]
+    if noun.endswith("s") and not noun.endswith(("ss", "is")):
+        return noun[:-1]
+    return noun
+
+
+def _forget(service_name, operation_name):
+    """Forgets the memoized reads of the resource that a write operation may have
+    made stale, whatever part of it they read.
+    """
+    written = _resource(operation_name)
+    with _memo_lock:
+        for key in list(_memo):
+            if key[1] == service_name and _resource(key[2]) == written:
+                del _memo[key]
+
+
+def call(service_name, operation_name, params, fresh=False):
+    """Makes one API call, or returns the memoized response of an identical read
+    call made earlier in this command.
+
+    A write call forgets the memoized reads of its resource once it has gone
+    through.  With `fresh`, a read call is always made, and its response replaces
+    any memoized one; use it for polling.
+    """
+    if not is_read_operation(operation_name):
+        try:
+            return _call_with_retries(service_name, operation_name, params)
+        finally:
+            _forget(service_name, operation_name)
+
+    key = (
+        session.target(),
+        service_name,
+        operation_name,
+        json.dumps(params, sort_keys=True, default=str),
+    )
+    with _memo_lock:
+        pending = _memo.get(key)
+        is_owner = pending is None or fresh
+        if is_owner:
+            pending = _memo[key] = Future()
+            if len(_memo) > MEMO_SIZE:
+                _memo.popitem(last=False)
+        _memo.move_to_end(key)
+    if is_owner:
+        try:
+            pending.set_result(_call_with_retries(service_name, operation_name, params))
+        except Exception as error:
+            pending.set_exception(error)
+            with _memo_lock:
+                if _memo.get(key) is pending:
+                    del _memo[key]
+    elif tracing.enabled():
+        tracing.record(
+            service_name,
+            operation_name,
+            params,
+            time.perf_counter(),
+            0.0,
+            memoized=True,
+        )
+    # Callers get their own copy, so one caller's changes never leak to another.
+    return copy.deepcopy(pending.result())
+
+
+def _call_with_retries(service_name, operation_name, params):
+    """Makes one API call, paced by its rate limiter and retried when throttled.
+
+    Throttling is retried for every operation, and transient service errors for
+    read operations only.  Anything else, or running out of attempts, raises the
+    original botocore error.
+    """
+    limiter = rate_limiter(service_name, operation_name)
+    retryable = THROTTLING_ERROR_CODES
+    if is_read_operation(operation_name):
+        retryable = retryable | TRANSIENT_ERROR_CODES
+
+    start = time.perf_counter()
+    for attempt in range(MAX_ATTEMPTS):
+        limiter.acquire()
+        try:
+            response = getattr(session.client(service_name), operation_name)(**params)
+        except Exception as error:
+            code = error_code(error)
+            if code in THROTTLING_ERROR_CODES:
+                limiter.throttled()
+            if code not in retryable or attempt == MAX_ATTEMPTS - 1:
+                tracing.record(
+                    service_name,
+                    operation_name,
+                    params,
+                    start,
+                    time.perf_counter() - start,
+                    retries=attempt,
+                    error=code or type(error).__name__,
+                )
+                raise
+            time.sleep(backoff_delay(attempt))
+            continue
+        limiter.succeeded()
+        tracing.record(
+            service_name,
+            operation_name,
+            params,
+            start,
+            time.perf_counter() - start,
+            retries=attempt,
+            response=response,
+        )
+        return response
+
+
+class Client:
+    """Stand-in for a boto3 client whose methods all go through `call`.
+
+    The underlying client is only built on the first call, so creating one is
+    free.  A client made with `fresh=True` never reuses memoized responses.
+    """
+
+    def __init__(self, service_name, fresh=False):
+        self._service_name = service_name
+        self._fresh = fresh
+
+    def __getattr__(self, operation_name):
+        if operation_name.startswith("_"):
+            raise AttributeError(operation_name)
+
+        def method(**params):
+            return call(self._service_name, operation_name, params, self._fresh)
+
+        method.__name__ = operation_name
+        return method
+
+
+def paginate(operation, result_key, **params):
+    """Yields the items of every page of a list operation, following NextToken.
+
+    Pages are fetched one at a time as the caller consumes them, so memory use
+    does not grow with the number of resources in the account, and a caller that
+    stops early (e.g. with itertools.islice) never fetches the remaining pages.
+
+    Args:
+        operation: A client method, e.g. `qs_client.list_data_sets`.
+        result_key (str): The response key holding the items, e.g. "DataSetSummaries".
+        **params: Passed to every call, e.g. AwsAccountId.
+    """
+    params.setdefault("MaxResults", MAX_PAGE_SIZE)
+    while True:
+        response = operation(**params)
+        yield from response.get(result_key, [])
+        next_token = response.get("NextToken")
+        if not next_token:
+            return
+        params["NextToken"] = next_token
+
+
+def submit(executor, function, *args):
+    """Submits a call to an executor, to run with the context variables (such as
+    the current session.Target) of the code submitting it.
+    """
+    return executor.submit(contextvars.copy_context().run, function, *args)
+
+
+def map_ordered(function, items, concurrency=DEFAULT_CONCURRENCY):
+    """Yields (item, function(item)) for every item, in the order of `items`.
+
+    Up to `concurrency` calls run at once on a thread pool, and at most twice that
+    many results are held back waiting for an earlier one, so `items` can be a
+    generator of any length.  An exception from `function` is raised when its
+    result is reached.
+    """
+    window = 2 * concurrency
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = collections.deque()
+        for item in items:
+            pending.append((item, submit(executor, function, item)))
+            if len(pending) >= window:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+
+
+def concurrently(*functions):
+    """Calls every function at once, each on its own thread, and returns their
+    results in order.  The first exception raised, if any, is re-raised.
+    """
+    with ThreadPoolExecutor(max_workers=len(functions)) as executor:
+        futures = [submit(executor, function) for function in functions]
+        return [future.result() for future in futures]
@@ -0,0 +1,298 @@
+"""On-disk catalog of QuickSight resource summaries, used for name -> ID/ARN lookups.
+
+Every resource type is listed (all pages) at most once per TTL and stored in a
+SQLite database indexed by name, ID and ARN, so repeated commands resolve names
+without calling QuickSight.  Commands that create, update or delete a resource
+invalidate its type, and `fv --refresh` re-lists every type once before it is used.
+
+The database lives in $FV_CACHE_DIR, $XDG_CACHE_HOME/fastview or ~/.cache/fastview.
+TTLs can be overridden per type with e.g. FV_CATALOG_TTL_DATASET=60 (seconds).
+"""
+import collections
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from fastview import calls, session
+
+ResourceType = collections.namedtuple(
+    "ResourceType", ["list_operation", "list_key", "id_key", "ttl", "list_params"]
+)
+
+RESOURCE_TYPES = {
+    "data_source": ResourceType(
+        "list_data_sources", "DataSources", "DataSourceId", 24 * 3600, {}
+    ),
+    "dataset": ResourceType(
+        "list_data_sets", "DataSetSummaries", "DataSetId", 3600, {}
+    ),
+    "template": ResourceType(
+        "list_templates", "TemplateSummaryList", "TemplateId", 900, {}
+    ),
+    "dashboard": ResourceType(
+        "list_dashboards", "DashboardSummaryList", "DashboardId", 900, {}
+    ),
+    "group": ResourceType(
+        "list_groups", "GroupList", "GroupName", 3600, {"Namespace": "default"}
+    ),
+    "user": ResourceType(
+        "list_users", "UserList", "UserName", 3600, {"Namespace": "default"}
+    ),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS resources (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    type TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT,
+    arn TEXT,
+    summary TEXT NOT NULL,
+    PRIMARY KEY (account, region, type, id)
+);
+CREATE INDEX IF NOT EXISTS resources_by_name ON resources (account, region, type, name);
+CREATE INDEX IF NOT EXISTS resources_by_arn ON resources (arn);
+CREATE TABLE IF NOT EXISTS refreshes (
+    account TEXT NOT NULL,
+    region TEXT NOT NULL,
+    type TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (account, region, type)
+);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_force_refresh = False
+_refreshed_this_run = set()
+_refresh_locks = {}
+_generation = 0
+
+
+def cache_dir():
+    path = os.environ.get("FV_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "fastview"
+    )
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(os.path.join(cache_dir(), "catalog.sqlite3"), timeout=60)
+        conn.executescript(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def generation():
+    """Returns a number that changes whenever the catalog is refreshed or
+    invalidated, so that anything derived from it knows to rebuild.
+    """
+    return _generation
+
+
+def _scope():
+    return session.account_id(), session.region()
+
+
+def ttl(resource_type):
+    override = os.environ.get(f"FV_CATALOG_TTL_{resource_type.upper()}")
+    if override is not None:
+        return float(override)
+    return RESOURCE_TYPES[resource_type].ttl
+
+
+def force_refresh():
+    """Makes the next lookup of every type re-list it, whatever its age."""
+    global _force_refresh
+    _force_refresh = True
+    with _lock:
+        _refreshed_this_run.clear()
+
+
+def start_run():
+    """Forgets `--refresh` and which types were re-listed.  Called at the start of
+    each command, for processes that run several (fv shell and fv daemon).
+    """
+    global _force_refresh
+    _force_refresh = False
+    with _lock:
+        _refreshed_this_run.clear()
+
+
+def refresh_forced():
+    """Returns whether this run was asked to re-list everything (`fv --refresh`)."""
+    return _force_refresh
+
+
+def refresh(resource_type):
+    """Re-lists every resource of a type from QuickSight and stores the summaries."""
+    spec = RESOURCE_TYPES[resource_type]
+    account, region = _scope()
+    items = calls.paginate(
+        getattr(calls.Client("quicksight"), spec.list_operation),
+        spec.list_key,
+        AwsAccountId=account,
+        **spec.list_params,
+    )
+    # Listing a large account takes a while, so it happens before the write
+    # transaction starts rather than while it holds the database lock.
+    rows = [
+        (
+            account,
+            region,
+            resource_type,
+            summary[spec.id_key],
+            summary.get("Name", summary[spec.id_key]),
+            summary.get("Arn"),
+            json.dumps(summary, default=str),
+        )
+        for summary in items
+    ]
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "DELETE FROM resources WHERE account = ? AND region = ? AND type = ?",
+            (account, region, resource_type),
+        )
+        conn.executemany("INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.execute(
+            "INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?, ?)",
+            (account, region, resource_type, time.time()),
+        )
+    global _generation
+    with _lock:
+        _refreshed_this_run.add((account, region, resource_type))
+        _generation += 1
+
+
+def invalidate(resource_type):
+    """Marks a type as stale, so the next lookup re-lists it."""
+    account, region = _scope()
+    conn = _connection()
+    with conn:
+        conn.execute(
+            "DELETE FROM refreshes WHERE account = ? AND region = ? AND type = ?",
+            (account, region, resource_type),
+        )
+    global _generation
+    with _lock:
+        _refreshed_this_run.discard((account, region, resource_type))
+        _generation += 1
+
+
+def _refresh_lock(key):
+    """Returns the lock that threads hold while deciding whether to refresh a
+    type, so that concurrent lookups list it only once.
+    """
+    with _lock:
+        return _refresh_locks.setdefault(key, threading.Lock())
+
+
+def _ensure_fresh(resource_type):
+    account, region = _scope()
+    key = (account, region, resource_type)
+    if key in _refreshed_this_run:
+        return
+    with _refresh_lock(key):
+        if key in _refreshed_this_run:
+            return
+        row = (
+            _connection()
+            .execute(
+                "SELECT refreshed_at FROM refreshes "
+                "WHERE account = ? AND region = ? AND type = ?",
+                key,
+            )
+            .fetchone()
+        )
+        if _force_refresh or row is None or time.time() - row[0] > ttl(resource_type):
+            refresh(resource_type)
+
+
+def _select(resource_type, column, value):
+    account, region = _scope()
+    return [
+        json.loads(summary)
+        for (summary,) in _connection().execute(
+            f"SELECT summary FROM resources "
+            f"WHERE account = ? AND region = ? AND type = ? AND {column} = ?",
+            (account, region, resource_type, value),
+        )
+    ]
+
+
+def _find(resource_type, column, value):
+    _ensure_fresh(resource_type)
+    matches = _select(resource_type, column, value)
+    key = (*_scope(), resource_type)
+    if not matches and key not in _refreshed_this_run:
+        # Resources made outside `fv` (e.g. in the console) only show up once the
+        # catalog has been re-listed, so a miss on cached data is retried once.
+        with _refresh_lock(key):
+            if key not in _refreshed_this_run:
+                refresh(resource_type)
+        matches = _select(resource_type, column, value)
+    return matches
+
+
+def missing(resource_type, resource_ids):
+    """Returns the IDs of this type that are not in the catalog, in order, with a
+    single query (and a single re-list if any are missing from cached data).
+    """
+    resource_ids = list(dict.fromkeys(resource_ids))
+    if not resource_ids:
+        return []
+    _ensure_fresh(resource_type)
+    key = (*_scope(), resource_type)
+
+    def absent():
+        found = {
+            resource_id
+            for (resource_id,) in _connection().execute(
+                f"SELECT id FROM resources "
+                f"WHERE account = ? AND region = ? AND type = ? "
+                f"AND id IN ({', '.join('?' * len(resource_ids))})",
+                (*key, *resource_ids),
+            )
+        }
+        return [resource_id for resource_id in resource_ids if resource_id not in found]
+
+    result = absent()
+    if result and key not in _refreshed_this_run:
+        with _refresh_lock(key):
+            if key not in _refreshed_this_run:
+                refresh(resource_type)
+        result = absent()
+    return result
+
+
+def lookup(resource_type, name):
+    """Returns the summaries of every resource of this type with the given name."""
+    return _find(resource_type, "name", name)
+
+
+def by_id(resource_type, resource_id):
+    """Returns a list with the summary of the resource with this ID, if any."""
+    return _find(resource_type, "id", resource_id)
+
+
+def by_arn(resource_type, arn):
+    """Returns a list with the summary of the resource with this ARN, if any."""
+    return _find(resource_type, "arn", arn)
+
+
+def summaries(resource_type):
+    """Yields every cached summary of a type, re-listing it first if stale."""
+    _ensure_fresh(resource_type)
+    account, region = _scope()
+    for (summary,) in _connection().execute(
+        "SELECT summary FROM resources WHERE account = ? AND region = ? AND type = ?",
+        (account, region, resource_type),
+    ):
+        yield json.loads(summary)
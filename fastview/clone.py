@@ -0,0 +1,176 @@
+"""Cloning datasets, within an account or from one profile and region to another
+(e.g. stage to prod), without passing their table maps through the shell.
+
+`clone` describes the source dataset and its permissions in the current target,
+then creates the copy in the destination target with the same table maps and
+settings.  The DataSourceArn of every physical table is rewritten to the
+destination's data source with the same name (or the name `data_sources` maps it
+to), and permissions either go to the given owner groups or are copied, with
+each user and group matched by name in the destination.
+"""
+import copy
+
+from fastview import arns, audit, calls, catalog, permissions, session
+
+# Fields of a DataSet description that create_data_set takes as they are.
+CLONED_FIELDS = [
+    "PhysicalTableMap",
+    "LogicalTableMap",
+    "ImportMode",
+    "ColumnGroups",
+    "FieldFolders",
+    "ColumnLevelPermissionRules",
+    "DataSetUsageConfiguration",
+    "DatasetParameters",
+    "RowLevelPermissionDataSet",
+    "RowLevelPermissionTagConfiguration",
+]
+
+qs_client = calls.Client("quicksight")
+
+
+def data_source_arns(physical_table_map):
+    """Returns the ARNs of the data sources that a PhysicalTableMap reads."""
+    return {
+        table["DataSourceArn"]
+        for physical_table in physical_table_map.values()
+        for table in physical_table.values()
+        if isinstance(table, dict) and "DataSourceArn" in table
+    }
+
+
+def _only(resource_type, name):
+    """Returns the summary of the one resource of this type with this name."""
+    matches = catalog.lookup(resource_type, name)
+    label = resource_type.replace("_", " ")
+    if not matches:
+        raise Exception(f"No {label} named {name}.")
+    if len(matches) > 1:
+        raise Exception(f"Several {label}s are named {name}.")
+    return matches[0]
+
+
+def _parts(principal_arn):
+    """Returns (kind, namespace, name) for a user or group ARN, and (kind,
+    resource, None) for any other principal.
+    """
+    kind, _, path = principal_arn.split(":", 5)[-1].partition("/")
+    if kind in ("user", "group"):
+        namespace_name, _, name = path.partition("/")
+        return kind, namespace_name, name
+    return kind, path, None
+
+
+def _principal(principal_arn):
+    """Returns the ARN of the same user, group or namespace in the current
+    target, and any other principal as it is.
+    """
+    kind, path, name = _parts(principal_arn)
+    if kind == "user":
+        return arns.user(name, path)
+    if kind == "group":
+        return arns.group(name, path)
+    if kind == "namespace":
+        return arns.namespace(path)
+    return principal_arn
+
+
+def _permissions(source_permissions, owner_groups, moving):
+    """Returns the Permissions for the copy, in the current target."""
+    if owner_groups:
+        arns.check("group", owner_groups)
+        actions = permissions.KINDS["dataset"].actions
+        return [
+            {"Principal": arns.group(name), "Actions": actions} for name in owner_groups
+        ]
+    if not moving:
+        return source_permissions
+    actions_by_principal = permissions.by_principal(source_permissions)
+    parts = [_parts(principal) for principal in actions_by_principal]
+    for kind in ("user", "group"):
+        arns.check(kind, [name for k, _, name in parts if k == kind])
+    return [
+        {"Principal": _principal(principal), "Actions": sorted(actions)}
+        for principal, actions in actions_by_principal.items()
+    ]
+
+
+def clone(
+    source_id,
+    name,
+    dataset_id=None,
+    destination=None,
+    data_sources=None,
+    owner_groups=(),
+):
+    """Creates a copy of the dataset `source_id` of the current target, named
+    `name`, in the `destination` target (by default, the current one), and
+    returns the create_data_set response.
+
+    data_sources maps the names of source data sources to the names of the
+    destination's; any other data source is matched by its own name, unless the
+    copy stays in the same account and region, where it is kept.
+    """
+    destination = destination or session.target()
+    with session.using(destination):
+        place = (session.account_id(), session.region())
+    # Within one account and region, data sources and principals stay as they are.
+    moving = place != (session.account_id(), session.region())
+    data_sources = data_sources or {}
+    params = dict(AwsAccountId=session.account_id(), DataSetId=source_id)
+    description, source_permissions = calls.concurrently(
+        lambda: qs_client.describe_data_set(**params)["DataSet"],
+        lambda: qs_client.describe_data_set_permissions(**params)["Permissions"],
+    )
+    fields = {
+        field: copy.deepcopy(description[field])
+        for field in CLONED_FIELDS
+        if description.get(field)
+    }
+    names = {}
+    for arn in data_source_arns(fields.get("PhysicalTableMap", {})):
+        summaries = catalog.by_arn("data_source", arn)
+        if summaries:
+            names[arn] = summaries[0]["Name"]
+        elif moving:
+            raise Exception(f"No data source with the ARN {arn}.")
+    unused = set(data_sources) - set(names.values())
+    if unused:
+        unused = ", ".join(sorted(unused))
+        raise Exception(f"{description['Name']} reads no data source named {unused}.")
+    if moving:
+        for table in fields.get("LogicalTableMap", {}).values():
+            if "DataSetArn" in table.get("Source", {}):
+                raise Exception(
+                    f"{description['Name']} is built on another dataset, "
+                    "so it can only be cloned within its account and region."
+                )
+        if "RowLevelPermissionDataSet" in fields:
+            raise Exception(
+                f"{description['Name']} has row-level security, "
+                "so it can only be cloned within its account and region."
+            )
+
+    with session.using(destination):
+        replacements = {}
+        for arn, source_name in names.items():
+            if source_name in data_sources or moving:
+                target_name = data_sources.get(source_name, source_name)
+                replacements[arn] = _only("data_source", target_name)["Arn"]
+        for physical_table in fields.get("PhysicalTableMap", {}).values():
+            for table in physical_table.values():
+                if isinstance(table, dict) and "DataSourceArn" in table:
+                    table["DataSourceArn"] = replacements.get(
+                        table["DataSourceArn"], table["DataSourceArn"]
+                    )
+
+        response = qs_client.create_data_set(
+            AwsAccountId=session.account_id(),
+            DataSetId=dataset_id or name,
+            Name=name,
+            Permissions=_permissions(source_permissions, owner_groups, moving),
+            **fields,
+        )
+        catalog.invalidate("dataset")
+        audit.invalidate()
+    return response
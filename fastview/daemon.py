@@ -0,0 +1,378 @@
+"""Running many commands in one process, so that every command after the first
+skips Python and boto3 start-up, credential resolution and the STS identity lookup.
+
+`fv shell` reads commands from a prompt and `fv daemon` takes them from a Unix
+socket.  Both run them with `run_command`, in a process that keeps its boto3
+sessions, clients, caller identities and resource indexes between commands.  Read
+calls are still memoized for one command only, and catalog types are still
+re-listed when their TTLs run out.
+
+`main`, the `fv` entry point, sends the command to the daemon when one is running
+for the same AWS_* and FV_* environment, and runs it in-process otherwise (always,
+with FV_NO_DAEMON=1).  The daemon runs one command at a time, in the caller's
+working directory, and streams its output back as it is written.
+"""
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shlex
+import socket
+import struct
+import sys
+import time
+import traceback
+
+from fastview import catalog
+
+# Every `fv` run imports this module, so what only the daemon or the shell needs
+# is imported where it is used.
+
+# Seconds without a command after which the daemon stops.
+IDLE_TIMEOUT = 3600
+
+# Options of `fv` itself that take a value, skipped when finding the command name.
+_VALUE_OPTIONS = {"--trace-file", "--output", "-o", "--aws-profiles", "--regions"}
+# Commands that run in their own process, never in a shell or the daemon.
+_LOCAL_COMMANDS = {"daemon", "shell"}
+
+# Every message is a kind, a 4-byte length and a payload.  The client sends one
+# request (or stop), then input lines when asked; the daemon sends output and,
+# last, the exit code.
+_HEADER = struct.Struct("!cI")
+_REQUEST, _STOP, _INPUT = b"r", b"s", b"i"
+_STDOUT, _STDERR, _READ, _EXIT = b"o", b"e", b"?", b"x"
+
+_command = None
+
+
+def socket_path():
+    """Returns the socket of the daemon for this environment, which differs for
+    different AWS credentials, profiles or fastview settings.
+    """
+    override = os.environ.get("FV_DAEMON_SOCKET")
+    if override:
+        return override
+    settings = sorted(
+        (name, value)
+        for name, value in os.environ.items()
+        if name.startswith(("AWS_", "FV_")) and name != "FV_NO_DAEMON"
+    )
+    digest = hashlib.sha256(json.dumps(settings).encode()).hexdigest()[:12]
+    return os.path.join(catalog.cache_dir(), f"daemon-{digest}.sock")
+
+
+def _send(connection, kind, payload=b""):
+    connection.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+
+def _receive_exactly(connection, size):
+    chunks = []
+    while size:
+        chunk = connection.recv(min(size, 1 << 16))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _receive(connection):
+    """Returns the next (kind, payload), or (None, None) once the other end has
+    gone away.
+    """
+    header = _receive_exactly(connection, _HEADER.size)
+    if header is None:
+        return None, None
+    kind, size = _HEADER.unpack(header)
+    payload = _receive_exactly(connection, size)
+    return (None, None) if payload is None else (kind, payload)
+
+
+def _connect(path):
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def _command_name(argv):
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in _VALUE_OPTIONS:
+            next(arguments, None)
+        elif not argument.startswith("-"):
+            return argument
+    return None
+
+
+def run_command(argv):
+    """Runs one fv command in this process and returns its exit code."""
+    global _command
+    if _command is None:
+        import typer
+
+        from fastview.main import app
+
+        _command = typer.main.get_command(app)
+    try:
+        # Standalone mode shows usage errors and "Aborted!" as fv does, and
+        # always ends in SystemExit.
+        _command.main(argv, prog_name="fv")
+    except SystemExit as exit:
+        if exit.code is None or isinstance(exit.code, int):
+            return exit.code or 0
+        print(exit.code, file=sys.stderr)
+        return 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+class _Channel(io.RawIOBase):
+    """Sends what is written as messages of one kind, and asks the client for a
+    line of its standard input when read.
+    """
+
+    def __init__(self, connection, kind):
+        self._connection = connection
+        self._kind = kind
+
+    def writable(self):
+        return self._kind != _READ
+
+    def readable(self):
+        return self._kind == _READ
+
+    def write(self, data):
+        _send(self._connection, self._kind, bytes(data))
+        return len(data)
+
+    def readinto(self, buffer):
+        _send(self._connection, _READ)
+        kind, payload = _receive(self._connection)
+        if kind != _INPUT:
+            return 0
+        payload = payload[: len(buffer)]
+        buffer[: len(payload)] = payload
+        return len(payload)
+
+
+def _streams(connection):
+    def text(kind):
+        raw = _Channel(connection, kind)
+        buffered = io.BufferedReader(raw) if kind == _READ else io.BufferedWriter(raw)
+        return io.TextIOWrapper(
+            buffered, encoding="utf-8", errors="replace", line_buffering=True
+        )
+
+    return text(_READ), text(_STDOUT), text(_STDERR)
+
+
+def _handle(connection):
+    """Runs the command a client asked for.  Returns False if it asked the daemon
+    to stop instead.
+    """
+    kind, payload = _receive(connection)
+    if kind == _STOP:
+        return False
+    if kind != _REQUEST:
+        return True
+    request = json.loads(payload)
+    saved = sys.stdin, sys.stdout, sys.stderr
+    directory = os.getcwd()
+    try:
+        sys.stdin, sys.stdout, sys.stderr = _streams(connection)
+        os.chdir(request["cwd"])
+        code = run_command(request["argv"])
+        sys.stdout.flush()
+        sys.stderr.flush()
+        _send(connection, _EXIT, str(code).encode())
+    except OSError:
+        # The client went away, e.g. after Ctrl-C.
+        pass
+    finally:
+        sys.stdin, sys.stdout, sys.stderr = saved
+        os.chdir(directory)
+    return True
+
+
+def serve(idle_timeout=IDLE_TIMEOUT):
+    """Runs commands sent to this environment's socket, one at a time, until
+    stopped or idle for `idle_timeout` seconds.
+    """
+    from fastview import session
+
+    path = socket_path()
+    connection = _connect(path)
+    if connection is not None:
+        connection.close()
+        raise Exception(f"A daemon is already running at {path}.")
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(umask)
+    server.listen(16)
+    server.settimeout(idle_timeout)
+    print(f"Serving fv commands at {path}", flush=True)
+    try:
+        # Anything that fails here fails again, with its error, in the first
+        # command that needs it.
+        with contextlib.suppress(Exception):
+            session.caller_identity()
+            session.client("quicksight")
+        while True:
+            try:
+                connection, _ = server.accept()
+            except socket.timeout:
+                break
+            with connection:
+                if not _handle(connection):
+                    break
+    finally:
+        server.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def start_in_background(idle_timeout=IDLE_TIMEOUT, timeout=30):
+    """Starts the daemon in a detached process and waits until it takes
+    commands.
+    """
+    import subprocess
+
+    subprocess.Popen(
+        [sys.executable, "-m", "fastview.main", "daemon"]
+        + ["--idle-timeout", str(idle_timeout)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if is_running():
+            return
+        time.sleep(0.05)
+    raise Exception("The daemon did not start; run `fv daemon` to see why.")
+
+
+def is_running():
+    connection = _connect(socket_path())
+    if connection is None:
+        return False
+    connection.close()
+    return True
+
+
+def stop():
+    """Stops this environment's daemon.  Returns whether one was running."""
+    connection = _connect(socket_path())
+    if connection is None:
+        return False
+    with connection:
+        _send(connection, _STOP)
+    return True
+
+
+def forward(argv):
+    """Runs a command in this environment's daemon and returns its exit code, or
+    None if no daemon is running.
+    """
+    connection = _connect(socket_path())
+    if connection is None:
+        return None
+    with connection:
+        _send(
+            connection,
+            _REQUEST,
+            json.dumps({"argv": argv, "cwd": os.getcwd()}).encode(),
+        )
+        while True:
+            kind, payload = _receive(connection)
+            if kind == _STDOUT:
+                sys.stdout.buffer.write(payload)
+                sys.stdout.flush()
+            elif kind == _STDERR:
+                sys.stderr.buffer.write(payload)
+                sys.stderr.flush()
+            elif kind == _READ:
+                _send(connection, _INPUT, sys.stdin.buffer.readline())
+            elif kind == _EXIT:
+                return int(payload)
+            else:
+                print("The fv daemon stopped before the command finished.")
+                return 1
+
+
+def shell():
+    """Reads commands from a prompt and runs them in this process, until exit,
+    quit or end of input.
+    """
+    try:
+        import readline
+    except ImportError:
+        readline = None
+    history = os.path.join(catalog.cache_dir(), "shell_history")
+    if readline is not None:
+        with contextlib.suppress(OSError):
+            readline.read_history_file(history)
+
+    print('Type commands without "fv", e.g. list-datasets.  "exit" or Ctrl-D ends.')
+    while True:
+        try:
+            line = input("fv> ")
+        except EOFError:
+            print()
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+        try:
+            argv = shlex.split(line)
+        except ValueError as error:
+            print(error)
+            continue
+        if argv[:1] == ["fv"]:
+            argv = argv[1:]
+        if not argv:
+            continue
+        if argv[0] in ("exit", "quit"):
+            break
+        if _command_name(argv) in _LOCAL_COMMANDS:
+            print(f"{_command_name(argv)} cannot run inside fv shell.")
+            continue
+        try:
+            run_command(argv)
+        except KeyboardInterrupt:
+            print("\nInterrupted.")
+
+    if readline is not None:
+        with contextlib.suppress(OSError):
+            readline.write_history_file(history)
+
+
+def main():
+    """The `fv` entry point."""
+    argv = sys.argv[1:]
+    if (
+        os.environ.get("FV_NO_DAEMON") != "1"
+        and "_FV_COMPLETE" not in os.environ
+        and _command_name(argv) not in _LOCAL_COMMANDS
+    ):
+        code = forward(argv)
+        if code is not None:
+            sys.exit(code)
+    from fastview.main import app
+
+    app()
@@ -0,0 +1,558 @@
+"""An in-memory QuickSight stand-in for the benchmarks and tests.
+
+`FakeQuickSight` answers the QuickSight operations fastview uses from synthetic data
+for one account: `size` data sources, datasets, templates, dashboards and users,
+plus a group per hundred users.  It implements just enough of each operation for
+the commands to run; it does not validate requests like QuickSight does.
+
+`install` swaps the fakes in for the boto3 clients in fastview.session, behind a
+`Recorder` that counts every call and can add a fixed latency to each one.
+"""
+import collections
+import datetime
+import itertools
+import threading
+import time
+
+from fastview import session
+
+REGION = "us-east-1"
+CREATED = datetime.datetime(2020, 1, 1)
+
+
+class ClientError(Exception):
+    """Mimics botocore's ClientError closely enough for fastview.calls."""
+
+    def __init__(self, code, operation_name):
+        self.response = {"Error": {"Code": code, "Message": code}}
+        super().__init__(f"An error occurred ({code}) when calling {operation_name}")
+
+
+class FakeQuickSight:
+    def __init__(self, account_id, size):
+        self.account_id = account_id
+        self._lock = threading.RLock()
+        self.data_sources = {}
+        self.datasets = {}
+        self.templates = {}
+        self.dashboards = {}
+        self.permissions = collections.defaultdict(list)
+        self.users = [f"user{i}" for i in range(size)]
+        self.groups = {"admins": set(self.users[:5])}
+        for i, first in enumerate(range(0, size + 1, 100)):
+            self.groups[f"group{i}"] = set(
+                itertools.islice(self.users, first, first + 100)
+            )
+
+        for i in range(size):
+            self._add_data_source(f"source{i}", f"Source {i}")
+            self._add_dataset(f"dataset{i}", f"dataset{i}", f"source{i}")
+            self._add_template_version(f"template{i}", f"template{i}", [f"dataset{i}"])
+            self._add_dashboard(f"dashboard{i}", f"Dashboard {i}")
+
+    def arn(self, kind, resource_id):
+        return f"arn:aws:quicksight:{REGION}:{self.account_id}:{kind}/{resource_id}"
+
+    def _add_data_source(self, data_source_id, name):
+        self.data_sources[data_source_id] = {
+            "DataSourceId": data_source_id,
+            "Name": name,
+            "Arn": self.arn("datasource", data_source_id),
+            "Type": "REDSHIFT",
+            "Status": "CREATION_SUCCESSFUL",
+            "LastUpdatedTime": CREATED,
+        }
+
+    def _add_dataset(self, dataset_id, name, data_source_id, import_mode="SPICE"):
+        self.datasets[dataset_id] = {
+            "DataSetId": dataset_id,
+            "Name": name,
+            "Arn": self.arn("dataset", dataset_id),
+            "ImportMode": import_mode,
+            "LastUpdatedTime": CREATED,
+            "PhysicalTableMap": {
+                "table": {
+                    "RelationalTable": {
+                        "DataSourceArn": self.arn("datasource", data_source_id),
+                        "Name": "table",
+                        "InputColumns": [{"Name": "value", "Type": "STRING"}],
+                    }
+                }
+            },
+            "LogicalTableMap": {
+                "logical": {"Alias": "table", "Source": {"PhysicalTableId": "table"}}
+            },
+        }
+
+    def _add_template_version(self, template_id, name, dataset_names):
+        template = self.templates.setdefault(
+            template_id,
+            {
+                "TemplateId": template_id,
+                "Name": name,
+                "Arn": self.arn("template", template_id),
+                "LastUpdatedTime": CREATED,
+                "Versions": [],
+            },
+        )
+        number = len(template["Versions"]) + 1
+        template["Versions"].append(
+            {
+                "VersionNumber": number,
+                "Status": "CREATION_SUCCESSFUL",
+                "Description": f"version {number}",
+                "CreatedTime": CREATED,
+                "DataSetConfigurations": [
+                    {
+                        "Placeholder": f"{dataset_name}_placeholder",
+                        "DataSetSchema": {
+                            "ColumnSchemaList": [
+                                {"Name": "value", "DataType": "STRING"}
+                            ]
+                        },
+                    }
+                    for dataset_name in dataset_names
+                ],
+                "Sheets": [{"SheetId": "sheet", "Name": "Sheet 1"}],
+            }
+        )
+        return template, number
+
+    def _add_dashboard(self, dashboard_id, name, permission_list=()):
+        self.dashboards[dashboard_id] = {
+            "DashboardId": dashboard_id,
+            "Name": name,
+            "Arn": self.arn("dashboard", dashboard_id),
+            "LastUpdatedTime": CREATED,
+            "PublishedVersionNumber": 1,
+            "LatestVersion": 1,
+        }
+        self.permissions[dashboard_id] = [dict(p) for p in permission_list]
+
+    def _get(self, collection, resource_id, operation_name):
+        if resource_id not in collection:
+            raise ClientError("ResourceNotFoundException", operation_name)
+        return collection[resource_id]
+
+    def _page(self, items, result_key, params, summarize=dict):
+        """Returns one page of `items`, summarizing only the items on it so that
+        paging through large accounts stays cheap.
+        """
+        start = int(params.get("NextToken") or 0)
+        end = start + params.get("MaxResults", 100)
+        with self._lock:
+            items = list(items)
+        response = {
+            result_key: [summarize(item) for item in items[start:end]],
+            "Status": 200,
+        }
+        if end < len(items):
+            response["NextToken"] = str(end)
+        return response
+
+    # Lists
+
+    def list_data_sources(self, **params):
+        return self._page(self.data_sources.values(), "DataSources", params)
+
+    def list_data_sets(self, **params):
+        keys = ("DataSetId", "Name", "Arn", "ImportMode", "LastUpdatedTime")
+        return self._page(
+            self.datasets.values(),
+            "DataSetSummaries",
+            params,
+            lambda dataset: {key: dataset[key] for key in keys},
+        )
+
+    def list_templates(self, **params):
+        def summarize(template):
+            return {
+                "TemplateId": template["TemplateId"],
+                "Name": template["Name"],
+                "Arn": template["Arn"],
+                "LatestVersionNumber": len(template["Versions"]),
+                "LastUpdatedTime": template["LastUpdatedTime"],
+            }
+
+        return self._page(
+            self.templates.values(), "TemplateSummaryList", params, summarize
+        )
+
+    def list_template_versions(self, TemplateId, **params):
+        template = self._get(self.templates, TemplateId, "ListTemplateVersions")
+        keys = ("VersionNumber", "Status", "Description")
+        return self._page(
+            template["Versions"],
+            "TemplateVersionSummaryList",
+            params,
+            lambda version: {key: version[key] for key in keys},
+        )
+
+    def list_dashboards(self, **params):
+        keys = ("DashboardId", "Name", "Arn", "LastUpdatedTime")
+        return self._page(
+            self.dashboards.values(),
+            "DashboardSummaryList",
+            params,
+            lambda dashboard: dict(
+                {key: dashboard[key] for key in keys},
+                PublishedVersionNumber=dashboard["PublishedVersionNumber"],
+            ),
+        )
+
+    def list_dashboard_versions(self, DashboardId, **params):
+        dashboard = self._get(self.dashboards, DashboardId, "ListDashboardVersions")
+        return self._page(
+            range(1, dashboard["LatestVersion"] + 1),
+            "DashboardVersionSummaryList",
+            params,
+            lambda number: {
+                "VersionNumber": number,
+                "Arn": f"{dashboard['Arn']}/version/{number}",
+                "Status": "CREATION_SUCCESSFUL",
+            },
+        )
+
+    def list_groups(self, **params):
+        return self._page(
+            self.groups,
+            "GroupList",
+            params,
+            lambda name: {
+                "GroupName": name,
+                "Arn": self.arn("group", f"default/{name}"),
+                "Description": name,
+            },
+        )
+
+    def list_group_memberships(self, GroupName, **params):
+        members = self._get(self.groups, GroupName, "ListGroupMemberships")
+        return self._page(
+            sorted(members),
+            "GroupMemberList",
+            params,
+            lambda name: {"MemberName": name},
+        )
+
+    def list_users(self, **params):
+        return self._page(
+            self.users,
+            "UserList",
+            params,
+            lambda name: {
+                "UserName": name,
+                "Arn": self.arn("user", f"default/{name}"),
+                "Role": "READER",
+                "Active": True,
+            },
+        )
+
+    # Describes
+
+    def describe_data_source(self, DataSourceId, **params):
+        data_source = self._get(self.data_sources, DataSourceId, "DescribeDataSource")
+        return {"DataSource": dict(data_source), "Status": 200}
+
+    def describe_data_set(self, DataSetId, **params):
+        return {
+            "DataSet": dict(self._get(self.datasets, DataSetId, "DescribeDataSet")),
+            "Status": 200,
+        }
+
+    def describe_template(self, TemplateId, VersionNumber=None, **params):
+        template = self._get(self.templates, TemplateId, "DescribeTemplate")
+        versions = template["Versions"]
+        if VersionNumber is not None and not 0 < VersionNumber <= len(versions):
+            raise ClientError("ResourceNotFoundException", "DescribeTemplate")
+        version = versions[(VersionNumber or len(versions)) - 1]
+        return {
+            "Template": {
+                "TemplateId": TemplateId,
+                "Name": template["Name"],
+                "Arn": template["Arn"],
+                "Version": version,
+            },
+            "Status": 200,
+        }
+
+    def describe_dashboard(self, DashboardId, VersionNumber=None, **params):
+        dashboard = self._get(self.dashboards, DashboardId, "DescribeDashboard")
+        number = VersionNumber or dashboard["PublishedVersionNumber"]
+        return {
+            "Dashboard": {
+                "DashboardId": DashboardId,
+                "Name": dashboard["Name"],
+                "Arn": dashboard["Arn"],
+                "Version": {
+                    "VersionNumber": number,
+                    "Status": "CREATION_SUCCESSFUL",
+                    "SourceEntityArn": self.arn("template", "template0"),
+                },
+            },
+            "Status": 200,
+        }
+
+    def describe_ingestion(self, DataSetId, IngestionId, **params):
+        return {
+            "Ingestion": {"IngestionId": IngestionId, "IngestionStatus": "COMPLETED"},
+            "Status": 200,
+        }
+
+    def describe_group(self, GroupName, **params):
+        self._get(self.groups, GroupName, "DescribeGroup")
+        return {
+            "Group": {
+                "GroupName": GroupName,
+                "Arn": self.arn("group", f"default/{GroupName}"),
+            },
+            "Status": 200,
+        }
+
+    # Permissions, kept by resource ID whatever the resource type.
+
+    def _describe_permissions(self, resource_id):
+        return {"Permissions": [dict(p) for p in self.permissions[resource_id]]}
+
+    def _update_permissions(self, resource_id, params):
+        with self._lock:
+            current = collections.defaultdict(set)
+            for permission in self.permissions[resource_id]:
+                current[permission["Principal"]].update(permission["Actions"])
+            for permission in params.get("GrantPermissions", []):
+                current[permission["Principal"]].update(permission["Actions"])
+            for permission in params.get("RevokePermissions", []):
+                current[permission["Principal"]].difference_update(
+                    permission["Actions"]
+                )
+            self.permissions[resource_id] = [
+                {"Principal": principal, "Actions": sorted(actions)}
+                for principal, actions in current.items()
+                if actions
+            ]
+        return dict(self._describe_permissions(resource_id), Status=200)
+
+    def describe_data_source_permissions(self, DataSourceId, **params):
+        return self._describe_permissions(DataSourceId)
+
+    def describe_data_set_permissions(self, DataSetId, **params):
+        return self._describe_permissions(DataSetId)
+
+    def describe_template_permissions(self, TemplateId, **params):
+        return self._describe_permissions(TemplateId)
+
+    def describe_dashboard_permissions(self, DashboardId, **params):
+        return self._describe_permissions(DashboardId)
+
+    def update_data_source_permissions(self, DataSourceId, **params):
+        return self._update_permissions(DataSourceId, params)
+
+    def update_data_set_permissions(self, DataSetId, **params):
+        return self._update_permissions(DataSetId, params)
+
+    def update_template_permissions(self, TemplateId, **params):
+        return self._update_permissions(TemplateId, params)
+
+    def update_dashboard_permissions(self, DashboardId, **params):
+        return self._update_permissions(DashboardId, params)
+
+    # Writes
+
+    def create_group(self, GroupName, **params):
+        with self._lock:
+            if GroupName in self.groups:
+                raise ClientError("ResourceExistsException", "CreateGroup")
+            self.groups[GroupName] = set()
+        return self.describe_group(GroupName)
+
+    def delete_group(self, GroupName, **params):
+        with self._lock:
+            self._get(self.groups, GroupName, "DeleteGroup")
+            del self.groups[GroupName]
+        return {"Status": 200}
+
+    def create_group_membership(self, MemberName, GroupName, **params):
+        with self._lock:
+            self._get(self.groups, GroupName, "CreateGroupMembership").add(MemberName)
+        return {"GroupMember": {"MemberName": MemberName}, "Status": 200}
+
+    def create_data_source(self, DataSourceId, Name, Permissions=(), **params):
+        with self._lock:
+            if DataSourceId in self.data_sources:
+                raise ClientError("ResourceExistsException", "CreateDataSource")
+            self._add_data_source(DataSourceId, Name)
+            self.permissions[DataSourceId] = [dict(p) for p in Permissions]
+        return {
+            "DataSourceId": DataSourceId,
+            "Arn": self.arn("datasource", DataSourceId),
+            "CreationStatus": "CREATION_IN_PROGRESS",
+            "Status": 202,
+        }
+
+    def delete_data_source(self, DataSourceId, **params):
+        with self._lock:
+            self._get(self.data_sources, DataSourceId, "DeleteDataSource")
+            del self.data_sources[DataSourceId]
+        return {"Status": 200}
+
+    def create_data_set(self, DataSetId, Name, ImportMode, Permissions=(), **params):
+        with self._lock:
+            if DataSetId in self.datasets:
+                raise ClientError("ResourceExistsException", "CreateDataSet")
+            self._add_dataset(DataSetId, Name, "source0", ImportMode)
+            self.datasets[DataSetId]["PhysicalTableMap"] = params["PhysicalTableMap"]
+            self.datasets[DataSetId]["LogicalTableMap"] = params.get(
+                "LogicalTableMap", {}
+            )
+            self.permissions[DataSetId] = [dict(p) for p in Permissions]
+        response = {
+            "DataSetId": DataSetId,
+            "Arn": self.arn("dataset", DataSetId),
+            "Status": 201,
+        }
+        if ImportMode == "SPICE":
+            response["IngestionId"] = "ingestion"
+        return response
+
+    def create_template(self, TemplateId, Name, SourceEntity, **params):
+        references = SourceEntity["SourceAnalysis"]["DataSetReferences"]
+        dataset_names = [
+            reference["DataSetPlaceholder"].replace("_placeholder", "")
+            for reference in references
+        ]
+        with self._lock:
+            template, number = self._add_template_version(
+                TemplateId, Name, dataset_names
+            )
+        return {
+            "TemplateId": TemplateId,
+            "Arn": template["Arn"],
+            "VersionArn": f"{template['Arn']}/version/{number}",
+            "CreationStatus": "CREATION_IN_PROGRESS",
+            "Status": 202,
+        }
+
+    def update_template(self, TemplateId, SourceEntity, Name=None, **params):
+        self._get(self.templates, TemplateId, "UpdateTemplate")
+        name = Name or self.templates[TemplateId]["Name"]
+        return self.create_template(TemplateId, name, SourceEntity)
+
+    def delete_template(self, TemplateId, **params):
+        with self._lock:
+            self._get(self.templates, TemplateId, "DeleteTemplate")
+            del self.templates[TemplateId]
+        return {"Status": 200}
+
+    def create_dashboard(self, DashboardId, Name, Permissions=(), **params):
+        with self._lock:
+            if DashboardId in self.dashboards:
+                raise ClientError("ResourceExistsException", "CreateDashboard")
+            self._add_dashboard(DashboardId, Name, Permissions)
+        arn = self.arn("dashboard", DashboardId)
+        return {
+            "DashboardId": DashboardId,
+            "Arn": arn,
+            "VersionArn": f"{arn}/version/1",
+            "CreationStatus": "CREATION_IN_PROGRESS",
+            "Status": 202,
+        }
+
+    def update_dashboard(self, DashboardId, Name, **params):
+        with self._lock:
+            dashboard = self._get(self.dashboards, DashboardId, "UpdateDashboard")
+            dashboard["Name"] = Name
+            dashboard["LatestVersion"] += 1
+            number = dashboard["LatestVersion"]
+        return {
+            "DashboardId": DashboardId,
+            "Arn": dashboard["Arn"],
+            "VersionArn": f"{dashboard['Arn']}/version/{number}",
+            "CreationStatus": "CREATION_IN_PROGRESS",
+            "Status": 202,
+        }
+
+    def update_dashboard_published_version(self, DashboardId, VersionNumber, **params):
+        with self._lock:
+            dashboard = self._get(
+                self.dashboards, DashboardId, "UpdateDashboardPublishedVersion"
+            )
+            dashboard["PublishedVersionNumber"] = VersionNumber
+        return {"DashboardId": DashboardId, "Status": 200}
+
+    def delete_dashboard(self, DashboardId, **params):
+        with self._lock:
+            self._get(self.dashboards, DashboardId, "DeleteDashboard")
+            del self.dashboards[DashboardId]
+            self.permissions.pop(DashboardId, None)
+        return {"Status": 200}
+
+
+class FakeSTS:
+    def __init__(self, account_id):
+        self.account_id = account_id
+
+    def get_caller_identity(self):
+        return {
+            "Account": self.account_id,
+            "Arn": f"arn:aws:iam::{self.account_id}:user/benchmark",
+            "UserId": "BENCHMARK",
+        }
+
+
+class Recorder:
+    """Wraps a fake client, counting calls per operation and sleeping `latency`
+    seconds in each one, like a round trip to AWS.
+    """
+
+    def __init__(self, client, service_name, latency=0.0):
+        self._client = client
+        self._service_name = service_name
+        self._latency = latency
+        self._lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def __getattr__(self, operation_name):
+        operation = getattr(self._client, operation_name)
+
+        def method(**params):
+            with self._lock:
+                self.counts[f"{self._service_name}.{operation_name}"] += 1
+            if self._latency:
+                time.sleep(self._latency)
+            return operation(**params)
+
+        return method
+
+
+class _FakeBotoSession:
+    """Stands in for the boto3 session of a target, handing out the fakes."""
+
+    def __init__(self, target, clients):
+        self.region_name = target.region or REGION
+        self._clients = clients
+
+    def client(self, service_name, config=None):
+        return self._clients[service_name]
+
+
+def install(quicksight, sts, latency=0.0, setattr=setattr):
+    """Makes fastview.session hand out the fakes, for every profile and region,
+    and returns their Recorders.
+
+    Also forgets the caller identity, so that the next command resolves it again
+    as a fresh process would.  The session's attributes are set with `setattr`;
+    tests pass pytest's monkeypatch.setattr, so that they are restored afterwards.
+    """
+    recorders = {
+        "quicksight": Recorder(quicksight, "quicksight", latency),
+        "sts": Recorder(sts, "sts", latency),
+    }
+    with session._lock:
+        setattr(
+            session,
+            "_new_boto_session",
+            lambda target: _FakeBotoSession(target, recorders),
+        )
+        setattr(session, "_boto_sessions", {})
+        setattr(session, "_clients", {})
+        setattr(session, "_identities", {})
+    return recorders
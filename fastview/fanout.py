@@ -0,0 +1,234 @@
+"""Running a command against several AWS profiles and regions at once.
+
+`fv --aws-profiles stage,prod --regions us-east-1,eu-west-1 list-datasets` runs
+list-datasets against each of the four targets at the same time, each on its own
+thread with its own boto3 session.  Commands opt in with `across_targets`.
+
+What each run writes through fastview.output is merged into one result: lists
+become a single list with Account and Region columns, and other results (e.g.
+descriptions) are written one per target.  Lists are streamed: rows are written
+in the order they arrive from the runs, and a run that gets more than QUEUE_SIZE
+rows ahead of the output waits, so memory use does not grow with the lists.
+Anything else a run prints is held back and printed afterwards under a heading
+for its target, so that runs never interleave.
+"""
+import collections
+import contextvars
+import functools
+import io
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastview import calls, output, session
+
+# Rows the runs can get ahead of the merged output by.
+QUEUE_SIZE = 1000
+
+# Names of the functions of the commands that can run against several targets.
+COMMANDS = set()
+
+Outcome = collections.namedtuple(
+    "Outcome", ["target", "account", "region", "stdout", "stderr", "collector", "error"]
+)
+
+_stdout = contextvars.ContextVar("stdout", default=None)
+_stderr = contextvars.ContextVar("stderr", default=None)
+
+
+class _Capture:
+    """Stands in for sys.stdout or sys.stderr, sending writes to the buffer of
+    the current run, if any, and to the real stream otherwise.
+    """
+
+    def __init__(self, stream, buffer_variable):
+        self._stream = stream
+        self._buffer_variable = buffer_variable
+
+    def write(self, text):
+        buffer = self._buffer_variable.get()
+        return (self._stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        if self._buffer_variable.get() is None:
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def across_targets(command):
+    """Decorates a command so that it runs against every session target."""
+    COMMANDS.add(command.__name__)
+
+    @functools.wraps(command)
+    def wrapper(*args, **kwargs):
+        targets = session.targets()
+        if len(targets) == 1:
+            return command(*args, **kwargs)
+        run(functools.partial(command, *args, **kwargs), targets)
+
+    return wrapper
+
+
+class _Stopped(Exception):
+    pass
+
+
+class _Stream(output.Collector):
+    """Sends every row a run writes to the merged output, and keeps its
+    documents.
+    """
+
+    def __init__(self, run, events, stopped):
+        super().__init__()
+        self._run = run
+        self._events = events
+        self._stopped = stopped
+
+    def _put(self, kind, value):
+        while True:
+            try:
+                return self._events.put((kind, self._run, value), timeout=0.1)
+            except queue.Full:
+                if self._stopped.is_set():
+                    raise _Stopped("The output stopped.")
+
+    def add_records(self, rows, columns):
+        self._put("list", columns)
+        tags = {"Account": session.account_id(), "Region": session.region()}
+        for row in rows:
+            self._put("row", _tagged(tags, row))
+
+    def done(self):
+        try:
+            self._put("done", None)
+        except _Stopped:
+            pass
+
+
+def _run_in(run, target, function, events, stopped):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    collector = _Stream(run, events, stopped)
+    _stdout.set(stdout)
+    _stderr.set(stderr)
+    error = None
+    try:
+        with session.using(target), output.collecting(collector):
+            try:
+                function()
+            except Exception as exception:
+                error = exception
+            try:
+                account, region = session.account_id(), session.region()
+            except Exception:
+                account, region = None, target.region
+    finally:
+        collector.done()
+    return Outcome(
+        target, account, region, stdout.getvalue(), stderr.getvalue(), collector, error
+    )
+
+
+def _tagged(tags, value):
+    if isinstance(value, dict):
+        return dict(tags, **value)
+    return dict(tags, Result=value)
+
+
+def _write_lists(events, runs):
+    """Writes the n-th list of every run as one list, as the rows arrive, until
+    every run is done.
+    """
+    started = [0] * runs
+    done = [False] * runs
+    columns = {}
+    # Rows of lists that some runs got to before others finished the one being
+    # written.
+    waiting = collections.defaultdict(list)
+
+    def take():
+        """Handles the next event; returns (list index, row) for a row."""
+        kind, run, value = events.get()
+        if kind == "list":
+            columns.setdefault(started[run], value)
+            started[run] += 1
+        elif kind == "row":
+            return started[run] - 1, value
+        else:
+            done[run] = True
+        return None, None
+
+    def rows(i):
+        yield from waiting.pop(i, [])
+        # A run has finished its i-th list once it starts the next or is done.
+        while not all(done[run] or started[run] > i + 1 for run in range(runs)):
+            index, row = take()
+            if index == i:
+                yield row
+            elif index is not None:
+                waiting[index].append(row)
+
+    i = 0
+    while True:
+        while i not in columns and not all(done):
+            index, row = take()
+            if index is not None:
+                waiting[index].append(row)
+        if i not in columns:
+            return
+        output.records(
+            rows(i), [("Account", "Account"), ("Region", "Region")] + columns[i]
+        )
+        i += 1
+
+
+def run(function, targets):
+    """Calls `function` against every target at once and writes the merged
+    results.  Raises an Exception if it failed for any target.
+    """
+    events = queue.Queue(QUEUE_SIZE)
+    stopped = threading.Event()
+    real_stdout, real_stderr = sys.stdout, sys.stderr
+    sys.stdout = _Capture(real_stdout, _stdout)
+    sys.stderr = _Capture(real_stderr, _stderr)
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = [
+                calls.submit(executor, _run_in, run, target, function, events, stopped)
+                for run, target in enumerate(targets)
+            ]
+            try:
+                _write_lists(events, len(targets))
+            finally:
+                # Lets runs still writing rows give up, if the output failed.
+                stopped.set()
+        outcomes = [future.result() for future in futures]
+    finally:
+        sys.stdout, sys.stderr = real_stdout, real_stderr
+
+    for outcome in outcomes:
+        documents = [] if output.is_json() else outcome.collector.documents
+        if outcome.stdout or outcome.stderr or documents or outcome.error:
+            label = outcome.target.profile or "default profile"
+            output.note(f"\n== {label}, {outcome.region}, {outcome.account} ==")
+        sys.stdout.write(outcome.stdout)
+        sys.stderr.write(outcome.stderr)
+        for _, human in documents:
+            human()
+        if outcome.error:
+            output.note(f"Failed: {outcome.error}")
+
+    if output.is_json():
+        documents = [
+            _tagged({"Account": outcome.account, "Region": outcome.region}, value)
+            for outcome in outcomes
+            for value, _ in outcome.collector.documents
+        ]
+        if documents:
+            output.records(documents, [])
+
+    failed = [outcome for outcome in outcomes if outcome.error]
+    if failed:
+        raise Exception(f"Failed for {len(failed)} of {len(outcomes)} targets.")
@@ -0,0 +1,129 @@
+"""In-memory index of every resource in the catalog, for searching across types.
+
+`get` loads the summaries of every resource type from the catalog once (listing
+stale types concurrently) and keys them by name, ID and ARN.  Names shared by
+several resources of the same type are collected up front in
+`Index.duplicates`, and `Index.find` does prefix, substring and glob searches
+over names and IDs without calling QuickSight again.
+"""
+import bisect
+import collections
+import fnmatch
+import threading
+
+from fastview import calls, catalog, session
+
+Entry = collections.namedtuple("Entry", ["type", "id", "name", "arn", "summary"])
+Entry.__doc__ = """One indexed resource.  type is a key of catalog.RESOURCE_TYPES."""
+
+MATCH_MODES = ["auto", "prefix", "substring", "glob"]
+GLOB_CHARACTERS = "*?["
+
+# {(account, region): (catalog generation, Index)}, each built under its own lock.
+_cached = {}
+_locks = collections.defaultdict(threading.Lock)
+
+
+class Index:
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.by_name = collections.defaultdict(list)
+        self.by_id = {}
+        self.by_arn = {}
+        keys = []
+        for position, entry in enumerate(self.entries):
+            self.by_name[(entry.type, entry.name)].append(entry)
+            self.by_id[(entry.type, entry.id)] = entry
+            if entry.arn:
+                self.by_arn[entry.arn] = entry
+            keys.append((entry.name.lower(), position))
+            if entry.id != entry.name:
+                keys.append((entry.id.lower(), position))
+        # Sorted (lowercase name or ID, position) pairs, for prefix searches.
+        self._keys = sorted(keys)
+        self.duplicates = {
+            key: entries for key, entries in self.by_name.items() if len(entries) > 1
+        }
+
+    def lookup(self, resource_type, name):
+        """Returns every entry of this type with the given name."""
+        return list(self.by_name.get((resource_type, name), []))
+
+    def find(self, pattern, match="auto", resource_types=None):
+        """Returns the entries whose name or ID matches `pattern`, ignoring case,
+        sorted by type and name.
+
+        match is "prefix", "substring" or "glob"; "auto" means glob when the
+        pattern has any of * ? [ in it, and substring otherwise.
+        """
+        pattern = pattern.lower()
+        if match == "auto":
+            match = (
+                "glob" if any(c in pattern for c in GLOB_CHARACTERS) else "substring"
+            )
+        if match == "prefix":
+            start = bisect.bisect_left(self._keys, (pattern, -1))
+            positions = set()
+            for key, position in self._keys[start:]:
+                if not key.startswith(pattern):
+                    break
+                positions.add(position)
+        elif match == "substring":
+            positions = {position for key, position in self._keys if pattern in key}
+        elif match == "glob":
+            positions = {
+                position
+                for key, position in self._keys
+                if fnmatch.fnmatchcase(key, pattern)
+            }
+        else:
+            raise ValueError(f"Unknown match mode: {match}")
+        matches = [
+            self.entries[position]
+            for position in positions
+            if not resource_types or self.entries[position].type in resource_types
+        ]
+        return sorted(matches, key=lambda entry: (entry.type, entry.name, entry.id))
+
+    def is_duplicate(self, entry):
+        return (entry.type, entry.name) in self.duplicates
+
+
+def load(resource_types=None):
+    """Builds an index of the given resource types (all of them by default),
+    refreshing stale types in the catalog concurrently.
+    """
+    resource_types = list(resource_types or catalog.RESOURCE_TYPES)
+    entries = []
+    for resource_type, summaries in calls.map_ordered(
+        lambda resource_type: list(catalog.summaries(resource_type)),
+        resource_types,
+        len(resource_types),
+    ):
+        id_key = catalog.RESOURCE_TYPES[resource_type].id_key
+        for summary in summaries:
+            entries.append(
+                Entry(
+                    resource_type,
+                    summary[id_key],
+                    summary.get("Name", summary[id_key]),
+                    summary.get("Arn"),
+                    summary,
+                )
+            )
+    return Index(entries)
+
+
+def get():
+    """Returns the index of every resource type in the current account and
+    region, building it on first use and again after anything in the catalog has
+    changed.
+    """
+    key = (session.account_id(), session.region())
+    with _locks[key]:
+        generation, cached = _cached.get(key, (None, None))
+        if cached is None or generation != catalog.generation():
+            cached = load()
+            # Loading may have refreshed stale types, which is not a change.
+            _cached[key] = (catalog.generation(), cached)
+        return cached
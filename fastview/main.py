@@ -1,148 +1,265 @@
+import functools
+import itertools
 import json
 import pprint
+import sys
+import threading
+import time
 from typing import List, Optional
 
-import boto3
 import typer
 
-app = typer.Typer()
-
-sts = boto3.client("sts")
+from fastview import (
+    archive,
+    arns,
+    audit,
+    calls,
+    catalog,
+    clone,
+    daemon,
+    fanout,
+    index,
+    permissions,
+    scheduler,
+    session,
+    output,
+    templates,
+    tracing,
+    waiters,
+)
 
-aws_region = boto3.session.Session().region_name
-aws_account_id = sts.get_caller_identity()["Account"]
-aws_user = sts.get_caller_identity()["Arn"].split("/")[-1]
+app = typer.Typer()
 
-qs_client = boto3.client("quicksight")
+# Built on first use, so that `fv --help` never touches boto3 or the network.
+# Every call is rate limited and retried by fastview.calls.
+qs_client = calls.Client("quicksight")
 
 
 @app.callback()
-def callback():
+def callback(
+    ctx: typer.Context,
+    refresh: bool = typer.Option(
+        False, "--refresh", help="Re-list resources instead of using the local catalog"
+    ),
+    profile: bool = typer.Option(
+        False,
+        "--profile",
+        help="Print where the time went in AWS calls when the command finishes",
+    ),
+    trace_file: Optional[str] = typer.Option(
+        None,
+        "--trace-file",
+        help="With --profile, also write the calls to this Chrome-trace JSON file",
+    ),
+    output_mode: str = typer.Option(
+        "table",
+        "--output",
+        "-o",
+        help="table for people; json or ndjson for scripts (list, describe and find)",
+    ),
+    aws_profiles: str = typer.Option(
+        "",
+        "--aws-profiles",
+        help="Comma-separated AWS profiles to run against, e.g. stage,prod",
+    ),
+    regions: str = typer.Option(
+        "",
+        "--regions",
+        help="Comma-separated AWS regions to run against, e.g. us-east-1,eu-west-1",
+    ),
+):
     """
     This is a wrapper around the AWS CLI that adds default values and accesses credentials
     from the current AWS user.
     """
+    output.set_mode(output_mode)
+    session.set_targets(
+        [profile for profile in aws_profiles.split(",") if profile],
+        [region for region in regions.split(",") if region],
+    )
+    command = (ctx.invoked_subcommand or "").replace("-", "_")
+    if len(session.targets()) > 1 and command not in fanout.COMMANDS:
+        raise Exception(
+            f"{ctx.invoked_subcommand} runs against one profile and region at a time."
+        )
+    calls.reset_memo()
+    catalog.start_run()
+    if refresh:
+        catalog.force_refresh()
+    if profile or trace_file:
+        tracing.enable()
+        ctx.call_on_close(functools.partial(_report_profile, trace_file))
+    else:
+        tracing.disable()
+
+
+def _report_profile(trace_file):
+    tracing.report()
+    if trace_file:
+        tracing.write_chrome_trace(trace_file)
+        print(f"Wrote Chrome trace to {trace_file}", file=sys.stderr)
+
+
+LIMIT_OPTION = typer.Option(None, "--limit", help="Stop after this many rows")
+WAIT_OPTION = typer.Option(
+    True, "--wait/--no-wait", help="Wait until QuickSight has finished building it"
+)
+RECREATE_OPTION = typer.Option(
+    False,
+    help="Delete and re-create an existing dashboard instead of updating it "
+    "in place (viewers get errors until the new one is ready)",
+)
+
+# AWS sample assets that are left out of list_data_sources and list_datasets.
+SAMPLE_ASSET_NAMES = [
+    "Sales Pipeline",
+    "Web and Social Media Analytics",
+    "Business Review",
+    "People Overview",
+]
 
 
 @app.command()
-def list_groups():
-    group_list = qs_client.list_groups(AwsAccountId=aws_account_id, Namespace="default")
-    for group in group_list["GroupList"]:
-        member_list = qs_client.list_group_memberships(
-            GroupName=group["GroupName"],
-            AwsAccountId=aws_account_id,
+@fanout.across_targets
+def list_groups(
+    limit: Optional[int] = LIMIT_OPTION,
+    members: bool = typer.Option(True, help="Also list the members of every group"),
+    concurrency: int = typer.Option(
+        calls.DEFAULT_CONCURRENCY, help="Number of groups to fetch members for at once"
+    ),
+):
+    groups = itertools.islice(
+        calls.paginate(
+            qs_client.list_groups,
+            "GroupList",
+            AwsAccountId=session.account_id(),
             Namespace="default",
-        )["GroupMemberList"]
-        print("\nName: ", group["GroupName"])
-        print("Description: ", group["Description"])
-        print("Members:")
-        for member in member_list:
-            print("> ", member["MemberName"])
+        ),
+        limit,
+    )
+    columns = [("Name", "GroupName"), ("Description", "Description")]
+    if not members:
+        output.records(groups, columns)
+        return
+
+    def get_member_names(group):
+        return [
+            member["MemberName"]
+            for member in calls.paginate(
+                qs_client.list_group_memberships,
+                "GroupMemberList",
+                GroupName=group["GroupName"],
+                AwsAccountId=session.account_id(),
+                Namespace="default",
+            )
+        ]
+
+    output.records(
+        (
+            dict(group, Members=member_names)
+            for group, member_names in calls.map_ordered(
+                get_member_names, groups, max(concurrency, 1)
+            )
+        ),
+        columns + [("Members", lambda group: ", ".join(group["Members"]))],
+    )
 
 
 @app.command()
-def list_users():
-    user_list = qs_client.list_users(AwsAccountId=aws_account_id, Namespace="default")
-    print("\nNames and ARNs of all the users in this AWS account:\n")
-    for user in user_list["UserList"]:
-        print(user["UserName"])
-        print(user["Arn"])
-        print()
+@fanout.across_targets
+def list_users(limit: Optional[int] = LIMIT_OPTION):
+    users = calls.paginate(
+        qs_client.list_users,
+        "UserList",
+        AwsAccountId=session.account_id(),
+        Namespace="default",
+    )
+    output.note("\nAll the users in this AWS account:\n")
+    output.records(
+        itertools.islice(users, limit),
+        [("Name", "UserName"), ("Role", "Role"), ("ARN", "Arn")],
+    )
 
 
 @app.command()
-def list_data_sources():
-    data_source_list = qs_client.list_data_sources(AwsAccountId=aws_account_id)
-    print(
-        "\n[Name : ID] for each data source in this AWS account \
+@fanout.across_targets
+def list_data_sources(limit: Optional[int] = LIMIT_OPTION):
+    data_sources = calls.paginate(
+        qs_client.list_data_sources, "DataSources", AwsAccountId=session.account_id()
+    )
+    output.note(
+        "\nData sources in this AWS account \
 (excluding AWS sample data sources and any of type AWS_IOT_ANALYTICS):\n"
     )
-    exclusion_list = [
-        "Sales Pipeline",
-        "Web and Social Media Analytics",
-        "Business Review",
-        "People Overview",
-    ]
-    relevant = sorted(
-        [
-            x
-            for x in data_source_list["DataSources"]
-            if x["Name"] not in exclusion_list and x["Type"] != "AWS_IOT_ANALYTICS"
-        ],
-        key=lambda x: x["Name"],
+    relevant = (
+        x
+        for x in data_sources
+        if x["Name"] not in SAMPLE_ASSET_NAMES and x["Type"] != "AWS_IOT_ANALYTICS"
+    )
+    output.records(
+        itertools.islice(relevant, limit),
+        [("Name", "Name"), ("ID", "DataSourceId"), ("Type", "Type")],
     )
-    max_len = max([len(x["Name"]) for x in relevant])
-    for x in relevant:
-        name = x["Name"]
-        ds_id = x["DataSourceId"]
-        print(f"{name:<{max_len}} : {ds_id:<{max_len}}")
 
 
 @app.command()
-def list_datasets():
-    dataset_list = qs_client.list_data_sets(AwsAccountId=aws_account_id)
-    print(
-        "\n[Name : ID] for each dataset in this AWS account (excluding AWS sample datasets):\n"
+@fanout.across_targets
+def list_datasets(limit: Optional[int] = LIMIT_OPTION):
+    datasets = calls.paginate(
+        qs_client.list_data_sets, "DataSetSummaries", AwsAccountId=session.account_id()
     )
-    exclusion_list = [
-        "Sales Pipeline",
-        "Web and Social Media Analytics",
-        "Business Review",
-        "People Overview",
-    ]
-    relevant = sorted(
-        [
-            x
-            for x in dataset_list["DataSetSummaries"]
-            if x["Name"] not in exclusion_list
-        ],
-        key=lambda x: x["Name"],
+    output.note("\nDatasets in this AWS account (excluding AWS sample datasets):\n")
+    relevant = (x for x in datasets if x["Name"] not in SAMPLE_ASSET_NAMES)
+    output.records(
+        itertools.islice(relevant, limit),
+        [("Name", "Name"), ("ID", "DataSetId"), ("Import mode", "ImportMode")],
     )
-    max_len = max([len(x["Name"]) for x in relevant])
-    for x in relevant:
-        name = x["Name"]
-        ds_id = x["DataSetId"]
-        print(f"{name:<{max_len}} : {ds_id:<{max_len}}")
 
 
 @app.command()
-def list_templates():
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    print("\nAll templates in this AWS account:")
-    summary_list = sorted(template_list["TemplateSummaryList"], key=lambda x: x["Name"])
-    for x in summary_list:
-        print("\n\n>>> ", x["Name"])
-        pprint.pp(x)
-
-    print("\n\nTemplates listed above:\n")
-    for x in summary_list:
-        print(x["Name"])
+@fanout.across_targets
+def list_templates(limit: Optional[int] = LIMIT_OPTION):
+    templates = calls.paginate(
+        qs_client.list_templates,
+        "TemplateSummaryList",
+        AwsAccountId=session.account_id(),
+    )
+    output.note("\nAll templates in this AWS account:\n")
+    output.records(
+        itertools.islice(templates, limit),
+        [
+            ("Name", "Name"),
+            ("ID", "TemplateId"),
+            ("Latest version", "LatestVersionNumber"),
+            ("Last updated", "LastUpdatedTime"),
+        ],
+    )
 
 
 @app.command()
-def list_dashboards():
-    dashboard_list = qs_client.list_dashboards(AwsAccountId=aws_account_id)
-    print("\nAll dashboards in this AWS account:")
-    summary_list = sorted(
-        dashboard_list["DashboardSummaryList"], key=lambda x: x["Name"]
+@fanout.across_targets
+def list_dashboards(limit: Optional[int] = LIMIT_OPTION):
+    dashboards = calls.paginate(
+        qs_client.list_dashboards,
+        "DashboardSummaryList",
+        AwsAccountId=session.account_id(),
+    )
+    output.note("\nAll dashboards in this AWS account:\n")
+    output.records(
+        itertools.islice(dashboards, limit),
+        [
+            ("Name", "Name"),
+            ("ID", "DashboardId"),
+            ("Published version", "PublishedVersionNumber"),
+            ("Last updated", "LastUpdatedTime"),
+        ],
     )
-    for x in summary_list:
-        print("\n\n>>> ", x["Name"])
-        pprint.pp(x)
-
-    print("\n\nDashboards listed above:\n")
-    for x in summary_list:
-        print(x["Name"])
 
 
 @app.command()
-def list_template_versions(template_name: str):
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    matches = [
-        temp
-        for temp in template_list["TemplateSummaryList"]
-        if temp["Name"] == template_name
-    ]
+@fanout.across_targets
+def list_template_versions(template_name: str, limit: Optional[int] = LIMIT_OPTION):
+    matches = catalog.lookup("template", template_name)
 
     if len(matches) > 1:
         print(f"\nThere are multiple templates with name {template_name}")
@@ -154,103 +271,357 @@ def list_template_versions(template_name: str):
         return
 
     template_id = matches[0]["TemplateId"]
-    response = qs_client.list_template_versions(
-        AwsAccountId=aws_account_id, TemplateId=template_id,
+    versions = calls.paginate(
+        qs_client.list_template_versions,
+        "TemplateVersionSummaryList",
+        AwsAccountId=session.account_id(),
+        TemplateId=template_id,
     )
-    summary_list = sorted(
-        response["TemplateVersionSummaryList"], key=lambda x: x["VersionNumber"]
+    output.records(
+        itertools.islice(versions, limit),
+        [
+            ("Version", "VersionNumber"),
+            ("Status", "Status"),
+            ("Created", "CreatedTime"),
+            ("Description", "Description"),
+        ],
     )
-    for x in summary_list:
-        print()
-        pprint.pp(x)
-    print("\n\n Versions listed above:\n")
-    for x in summary_list:
-        version = x["VersionNumber"]
-        description = x["Description"]
-        print(f"{version} -- {description}")
 
 
 @app.command()
-def describe_data_source(
-    name: str,
-    data_source_id: str = typer.Option("", help="Search by ID, ignoring the name"),
+@fanout.across_targets
+def find(
+    pattern: str = typer.Argument(
+        "*", help="Name or ID to search for; * ? and [] make it a glob"
+    ),
+    match: str = typer.Option(
+        "auto", help="prefix, substring or glob (auto: glob if the pattern has one)"
+    ),
+    resource_type: List[str] = typer.Option(
+        [],
+        "--type",
+        help="Only search this type (data_source, dataset, template, dashboard, "
+        "group or user); may be repeated",
+    ),
+    duplicates: bool = typer.Option(
+        False, help="Only show names shared by several resources of the same type"
+    ),
+    limit: Optional[int] = LIMIT_OPTION,
 ):
-    """Describe data source, by a unique name or (optionally) by ID.
+    """Searches the names and IDs of every resource type at once, ignoring case.
+
+    Answers from the local catalog, listing only the types that are stale.
     """
-    if data_source_id == "":
-        description = _get_data_source_description(name)
-    else:
-        description = qs_client.describe_data_source(
-            AwsAccountId=aws_account_id, DataSourceId=data_source_id,
-        )["DataSource"]
+    if match not in index.MATCH_MODES:
+        raise Exception(f"--match must be one of {', '.join(index.MATCH_MODES)}.")
+    unknown = set(resource_type) - set(catalog.RESOURCE_TYPES)
+    if unknown:
+        raise Exception(f"Unknown resource types: {', '.join(sorted(unknown))}")
+
+    resource_index = index.get()
+    matches = resource_index.find(pattern, match, resource_type)
+    if duplicates:
+        matches = [entry for entry in matches if resource_index.is_duplicate(entry)]
+
+    output.note("\nResources whose name or ID matches:\n")
+    shown = itertools.islice(matches, limit)
+    output.records(
+        (
+            {
+                "Type": entry.type,
+                "Name": entry.name,
+                "Id": entry.id,
+                "Arn": entry.arn,
+                "DuplicateName": resource_index.is_duplicate(entry),
+            }
+            for entry in shown
+        ),
+        [
+            ("Type", "Type"),
+            ("Name", "Name"),
+            ("ID", "Id"),
+            ("", lambda row: "duplicate name" if row["DuplicateName"] else ""),
+        ],
+    )
+    count = len(matches) if limit is None else min(limit, len(matches))
+    output.note(f"\n{count} of {len(matches)} matches shown.")
+
+    duplicate_names = {
+        (entry.type, entry.name)
+        for entry in matches
+        if resource_index.is_duplicate(entry)
+    }
+    if duplicate_names:
+        output.note(
+            f"{len(duplicate_names)} names are shared by several resources of the "
+            "same type; commands that take a name refuse to pick between them."
+        )
 
-    print()
-    pprint.pp(description)
 
-    print("\n\n>> Permissions <<")
-    response = qs_client.describe_data_source_permissions(
-        AwsAccountId=aws_account_id, DataSourceId=description["DataSourceId"]
+@app.command()
+def export(
+    path: str = typer.Argument(
+        ..., help="Archive to write; .gz is gzip, .zst is zstd, anything else is plain"
+    ),
+    resource_type: List[str] = typer.Option(
+        [],
+        "--type",
+        help="Only export this type (data_source, dataset, template or dashboard); "
+        "may be repeated",
+    ),
+    concurrency: int = typer.Option(
+        calls.DEFAULT_CONCURRENCY, help="Number of assets to describe at once"
+    ),
+    resume: bool = typer.Option(
+        True,
+        "--resume/--restart",
+        help="Carry on from an interrupted export of the same path, or start over",
+    ),
+    since: Optional[str] = typer.Option(
+        None,
+        help="Previous archive; only export what was added, changed or deleted since",
+    ),
+):
+    """Exports every data source, dataset, template and dashboard, with its full
+    description and permissions, to a JSON Lines archive with one record per asset.
+
+    With --since, only assets whose LastUpdatedTime differs from the previous
+    archive's manifest are described, and deleted ones are written as tombstones.
+    """
+    unknown = set(resource_type) - set(archive.KINDS)
+    if unknown:
+        raise Exception(f"Unknown resource types: {', '.join(sorted(unknown))}")
+
+    start_time = time.perf_counter()
+    result = archive.export(path, resource_type, max(concurrency, 1), resume, since)
+    elapsed = time.perf_counter() - start_time
+    written = result.exported + result.resumed + result.deleted
+    print(f"\nWrote {written} records to {path} in {elapsed:.1f}s", end="")
+    print(f" ({result.resumed} from an earlier run)." if result.resumed else ".")
+    if since:
+        print(
+            f"{result.unchanged} assets unchanged since {since}, "
+            f"{result.deleted} deleted."
+        )
+    if result.failed:
+        print(
+            f"{result.failed} records have errors, e.g. assets QuickSight cannot "
+            "describe."
+        )
+
+
+@app.command()
+@fanout.across_targets
+def audit_permissions(
+    principal: Optional[str] = typer.Option(
+        None, help="Only this user or group: its name, its ARN, or a glob of either"
+    ),
+    resource_type: List[str] = typer.Option(
+        [],
+        "--type",
+        help="Only this type (data_source, dataset, template or dashboard); "
+        "may be repeated",
+    ),
+    asset: Optional[str] = typer.Option(
+        None, help="Only assets whose name matches this glob"
+    ),
+    action: Optional[str] = typer.Option(
+        None, help="Only actions containing this, e.g. Delete"
+    ),
+    file: Optional[str] = typer.Option(
+        None,
+        help="Also write the matching principal/asset/action cells to this file: "
+        "CSV if it ends in .csv, JSON Lines otherwise",
+    ),
+    fetch: bool = typer.Option(
+        False, help="Fetch every permission again instead of using the cached copy"
+    ),
+    concurrency: int = typer.Option(
+        calls.DEFAULT_CONCURRENCY, help="Number of permission lists to fetch at once"
+    ),
+):
+    """Shows which users and groups can do what on every data source, dataset,
+    template and dashboard, e.g. `fv audit-permissions --principal analysts`.
+
+    Permissions are fetched concurrently and cached, so later queries are
+    answered locally until the copy is an hour old (FV_AUDIT_TTL, in seconds).
+    """
+    unknown = set(resource_type) - set(archive.KINDS)
+    if unknown:
+        raise Exception(f"Unknown resource types: {', '.join(sorted(unknown))}")
+
+    cells = audit.load(max(concurrency, 1), fetch)
+    failed = {(cell.type, cell.id) for cell in cells if cell.principal is None}
+    cells = audit.query(cells, principal, resource_type, asset, action)
+    if file:
+        audit.write(cells, file)
+
+    def grouped():
+        for (cell_principal, _, _), group in itertools.groupby(
+            cells, key=lambda cell: cell[:3]
+        ):
+            group = list(group)
+            if cell_principal is not None:
+                yield {
+                    "Principal": cell_principal,
+                    "Type": group[0].type,
+                    "Id": group[0].id,
+                    "Name": group[0].name,
+                    "Actions": [cell.action for cell in group],
+                }
+
+    output.records(
+        grouped(),
+        [
+            ("Principal", lambda row: row["Principal"].split(":", 5)[-1]),
+            ("Type", "Type"),
+            ("Name", "Name"),
+            (
+                "Actions",
+                lambda row: " ".join(
+                    action.replace("quicksight:", "") for action in row["Actions"]
+                ),
+            ),
+        ],
     )
-    for perms in response["Permissions"]:
-        print("\nPrincipal: ", perms["Principal"])
-        print("Actions: ")
-        pprint.pp(perms["Actions"])
+    minutes = (audit.age() or 0) / 60
+    output.note(f"\nPermissions as of {minutes:.0f} minutes ago (--fetch to update).")
+    if failed:
+        output.note(f"The permissions of {len(failed)} assets could not be fetched.")
+    if file:
+        output.note(f"Wrote {len(cells)} principal/asset/action cells to {file}")
+
+
+DESCRIBE_CONCURRENCY_OPTION = typer.Option(
+    calls.DEFAULT_CONCURRENCY, help="Number of assets to describe at once"
+)
+
+
+@app.command()
+@fanout.across_targets
+def describe_data_source(
+    names: Optional[List[str]] = typer.Argument(None, help="Data source names"),
+    data_source_id: List[str] = typer.Option(
+        [], help="Also describe the data source with this ID; may be repeated"
+    ),
+    concurrency: int = DESCRIBE_CONCURRENCY_OPTION,
+):
+    """Describe data sources and their permissions, by unique name or by ID.
+
+    Several data sources are described in parallel.
+    """
+    ids = [_resolve_id("data_source", name) for name in names or []]
+    ids += data_source_id
+
+    def describe(data_source_id):
+        params = dict(AwsAccountId=session.account_id(), DataSourceId=data_source_id)
+        description, permission_list = calls.concurrently(
+            lambda: qs_client.describe_data_source(**params)["DataSource"],
+            lambda: qs_client.describe_data_source_permissions(**params)["Permissions"],
+        )
+        return {"DataSource": description, "Permissions": permission_list}
+
+    def human(document):
+        print()
+        pprint.pp(document["DataSource"])
+        _print_permissions(document["Permissions"])
+
+    _output_descriptions("data source", ids, describe, human, concurrency)
 
 
 @app.command()
+@fanout.across_targets
 def describe_dataset(
-    name: str,
-    dataset_id: str = typer.Option("", help="Search by ID, ignoring the name"),
+    names: Optional[List[str]] = typer.Argument(None, help="Dataset names"),
+    dataset_id: List[str] = typer.Option(
+        [], help="Also describe the dataset with this ID; may be repeated"
+    ),
+    concurrency: int = DESCRIBE_CONCURRENCY_OPTION,
 ):
-    """Describe dataset, by name or (optionally) by ID.
+    """Describe datasets and their permissions, by unique name or by ID.
+
+    Several datasets are described in parallel.
     """
-    if dataset_id == "":
-        description = _get_dataset_description(name)
-    else:
-        description = qs_client.describe_data_set(
-            AwsAccountId=aws_account_id, DataSetId=dataset_id
-        )["DataSet"]
+    ids = [_resolve_id("dataset", name) for name in names or []] + dataset_id
 
-    print()
-    pprint.pp(
-        {
-            k: v
-            for k, v in description.items()
-            if k not in ["PhysicalTableMap", "LogicalTableMap"]
-        }
-    )
-    print("\nPhysicalTableMap:")
-    print("'", json.dumps(description["PhysicalTableMap"]), "'")
-    print("\nLogicalTableMap:")
-    print("'", json.dumps(description["LogicalTableMap"]), "'")
+    def describe(dataset_id):
+        params = dict(AwsAccountId=session.account_id(), DataSetId=dataset_id)
+        description, permission_list = calls.concurrently(
+            lambda: qs_client.describe_data_set(**params)["DataSet"],
+            lambda: qs_client.describe_data_set_permissions(**params)["Permissions"],
+        )
+        return {"DataSet": description, "Permissions": permission_list}
 
-    print("\n\n>> Permissions <<")
-    response = qs_client.describe_data_set_permissions(
-        AwsAccountId=aws_account_id, DataSetId=description["DataSetId"]
-    )
-    for perms in response["Permissions"]:
-        print("\nPrincipal: ", perms["Principal"])
-        print("\nActions: ")
-        pprint.pp(perms["Actions"])
+    def human(document):
+        description = document["DataSet"]
+        print()
+        pprint.pp(
+            {
+                k: v
+                for k, v in description.items()
+                if k not in ["PhysicalTableMap", "LogicalTableMap"]
+            }
+        )
+        print("\nPhysicalTableMap:")
+        print("'", json.dumps(description["PhysicalTableMap"]), "'")
+        print("\nLogicalTableMap:")
+        print("'", json.dumps(description["LogicalTableMap"]), "'")
+        _print_permissions(document["Permissions"])
+
+    _output_descriptions("dataset", ids, describe, human, concurrency)
 
 
 @app.command()
-def describe_dashboard(name: str):
-    description = _get_dashboard_description(name)
-    print()
-    pprint.pp(description)
+@fanout.across_targets
+def describe_dashboard(
+    names: List[str] = typer.Argument(..., help="Dashboard names"),
+    concurrency: int = DESCRIBE_CONCURRENCY_OPTION,
+):
+    """Describe dashboards and their permissions, by unique name.
 
-    print("\n\n>> Permissions <<")
-    response = qs_client.describe_dashboard_permissions(
-        AwsAccountId=aws_account_id, DashboardId=description["DashboardId"]
+    Several dashboards are described in parallel.
+    """
+    ids = [_resolve_id("dashboard", name) for name in names]
+
+    def describe(dashboard_id):
+        params = dict(AwsAccountId=session.account_id(), DashboardId=dashboard_id)
+        description, permission_list = calls.concurrently(
+            lambda: qs_client.describe_dashboard(**params)["Dashboard"],
+            lambda: qs_client.describe_dashboard_permissions(**params)["Permissions"],
+        )
+        return {"Dashboard": description, "Permissions": permission_list}
+
+    def human(document):
+        print()
+        pprint.pp(document["Dashboard"])
+        _print_permissions(document["Permissions"])
+
+    _output_descriptions("dashboard", ids, describe, human, concurrency)
+
+
+def _output_descriptions(label, ids, describe, human, concurrency):
+    """Describes the assets with these IDs, `concurrency` at a time, and writes
+    the results in order: one JSON document for a single asset and a list for
+    several, or `human(document)` for each in table mode.
+    """
+    if not ids:
+        raise Exception(f"Give at least one {label} name or ID.")
+    documents = (
+        document
+        for _, document in calls.map_ordered(describe, ids, max(concurrency, 1))
     )
-    for perms in response["Permissions"]:
-        print("\nPrincipal: ", perms["Principal"])
-        print("\nActions: ")
-        pprint.pp(perms["Actions"])
+    if len(ids) == 1:
+        document = next(documents)
+        output.document(document, lambda: human(document))
+    elif output.is_json():
+        output.records(documents, [])
+    else:
+        for document in documents:
+            human(document)
 
 
 @app.command()
+@fanout.across_targets
 def describe_template(
     template_name: str,
     version: Optional[int] = typer.Argument(
@@ -258,13 +629,54 @@ def describe_template(
     ),
 ):
     description = _get_template_description(template_name, version)
-    if version is None:
-        latest_version = description["Version"]["VersionNumber"]
-        print(f"\nLatest version ({latest_version}) of template {template_name}:\n")
-    else:
-        print(f"\nVersion {version} of template {template_name}:\n")
 
-    pprint.pp(description)
+    def human():
+        if version is None:
+            latest_version = description["Version"]["VersionNumber"]
+            print(f"\nLatest version ({latest_version}) of template {template_name}:\n")
+        else:
+            print(f"\nVersion {version} of template {template_name}:\n")
+        pprint.pp(description)
+
+    output.document({"Template": description}, human)
+
+
+@app.command()
+@fanout.across_targets
+def template_diff(template_name: str, version: int, other_version: int):
+    """
+    Shows what changed between two versions of a template: its sheets, dataset
+    placeholders and their columns.  Finished versions are cached locally for good.
+    """
+    template_id = _resolve_id("template", template_name)
+    old, new = calls.concurrently(
+        lambda: templates.describe(template_id, version),
+        lambda: templates.describe(template_id, other_version),
+    )
+    differences = templates.diff(old["Version"], new["Version"])
+    output.note(
+        f"\nChanges from version {version} to {other_version} "
+        f"of template {template_name}:\n"
+    )
+    output.records(
+        (
+            {
+                "Part": difference.part,
+                "Name": difference.name,
+                "Change": difference.change,
+                "Old": difference.old,
+                "New": difference.new,
+            }
+            for difference in differences
+        ),
+        [
+            ("Part", "Part"),
+            ("Name", "Name"),
+            ("Change", "Change"),
+            (f"Version {version}", "Old"),
+            (f"Version {other_version}", "New"),
+        ],
+    )
 
 
 @app.command()
@@ -273,42 +685,100 @@ def create_group(group_name: str, description: str):
     response = qs_client.create_group(
         GroupName=group_name,
         Description=description,
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         Namespace="default",
     )
+    catalog.invalidate("group")
     pprint.pp(response)
 
 
 @app.command()
-def create_group_of_all_users(group_name: str):
+def create_group_of_all_users(
+    group_name: str,
+    concurrency: int = typer.Option(
+        calls.DEFAULT_CONCURRENCY, help="Number of members to add at once"
+    ),
+):
     """Creates a new Quicksight group with all users in the AWS account.
-    Will fail if that group already exists.
+    If the group already exists, only users who are not members yet are added,
+    so an interrupted run can simply be repeated.
     """
-    user_list = [
-        x["UserName"]
-        for x in qs_client.list_users(AwsAccountId=aws_account_id, Namespace="default")[
-            "UserList"
-        ]
-    ]
+    start = time.perf_counter()
 
     print(f"\nCreating group {group_name}...\n")
-    response = qs_client.create_group(
-        GroupName=group_name,
-        Description="All the Quicksight users in this AWS account",
-        AwsAccountId=aws_account_id,
-        Namespace="default",
-    )
-    pprint.pp(response)
-    print()
-
-    for name in user_list:
-        print(f"Adding: {name}")
-        response = qs_client.create_group_membership(
-            MemberName=name,
+    try:
+        response = qs_client.create_group(
             GroupName=group_name,
-            AwsAccountId=aws_account_id,
+            Description="All the Quicksight users in this AWS account",
+            AwsAccountId=session.account_id(),
             Namespace="default",
         )
+        catalog.invalidate("group")
+        pprint.pp(response)
+        existing_members = set()
+    except Exception as error:
+        if calls.error_code(error) != "ResourceExistsException":
+            raise
+        print(f"Group {group_name} already exists, adding missing members only.")
+        existing_members = {
+            x["MemberName"]
+            for x in calls.paginate(
+                qs_client.list_group_memberships,
+                "GroupMemberList",
+                GroupName=group_name,
+                AwsAccountId=session.account_id(),
+                Namespace="default",
+            )
+        }
+    print()
+
+    skipped = 0
+
+    def new_members():
+        nonlocal skipped
+        for x in calls.paginate(
+            qs_client.list_users,
+            "UserList",
+            AwsAccountId=session.account_id(),
+            Namespace="default",
+        ):
+            if x["UserName"] in existing_members:
+                skipped += 1
+            else:
+                yield x["UserName"]
+
+    def add_member(name):
+        try:
+            qs_client.create_group_membership(
+                MemberName=name,
+                GroupName=group_name,
+                AwsAccountId=session.account_id(),
+                Namespace="default",
+            )
+        except Exception as error:
+            return error
+
+    added = 0
+    failed = []
+    for name, error in calls.map_ordered(
+        add_member, new_members(), max(concurrency, 1)
+    ):
+        if error is None:
+            added += 1
+            print(f"Added: {name}")
+        else:
+            failed.append(name)
+            print(f"Failed to add {name}: {error}")
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"\nAdded {added} users, skipped {skipped} existing members, "
+        f"{len(failed)} failed, in {elapsed:.1f}s "
+        f"({added / max(elapsed, 1e-6):.1f} users/s)"
+    )
+    if failed:
+        print("Run this command again to retry the users that failed.")
+        raise typer.Exit(code=1)
     print("Done!")
 
 
@@ -322,12 +792,13 @@ def create_redshift_data_source(
     redshift_database_username: str,
     redshift_database_password: str,
     redshift_vpc_connection_arn: str,
+    wait: bool = WAIT_OPTION,
 ):
 
     owner_group_arn = _get_group_arn(owner_group_name)
 
     response = qs_client.create_data_source(
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         DataSourceId=data_source_name,
         Name=data_source_name,
         Type="REDSHIFT",
@@ -359,8 +830,13 @@ def create_redshift_data_source(
             },
         ],
     )
+    catalog.invalidate("data_source")
+    audit.invalidate()
 
     pprint.pp(response)
+    if wait:
+        print()
+        waiters.wait([waiters.Asset("data_source", data_source_name, None)])
 
 
 @app.command()
@@ -370,6 +846,7 @@ def create_dataset(
     import_mode: str,
     physical_table_map: str,
     logical_table_map: str,
+    wait: bool = WAIT_OPTION,
 ):
     """Creates dataset
 
@@ -382,12 +859,14 @@ def create_dataset(
     physical_table_map {str} -- Output from the description of another dataset.
 
     logical_table_map {str} -- Output from the description of another dataset.
+
+    For SPICE datasets, --wait waits for the first ingestion to finish.
     """
 
     owner_group_arn = _get_group_arn(owner_group_name)
 
     response = qs_client.create_data_set(
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         DataSetId=dataset_name,
         Name=dataset_name,
         PhysicalTableMap=json.loads(physical_table_map),
@@ -411,8 +890,140 @@ def create_dataset(
             },
         ],
     )
+    catalog.invalidate("dataset")
+    audit.invalidate()
+
+    pprint.pp(response)
+    if wait and response.get("IngestionId"):
+        print()
+        waiters.wait(
+            [waiters.Asset("ingestion", response["DataSetId"], response["IngestionId"])]
+        )
+
+
+def _destination(to_profile, to_region):
+    current = session.target()
+    return session.Target(to_profile or current.profile, to_region or current.region)
+
+
+def _wait_for_ingestions(destination, responses):
+    assets = [
+        waiters.Asset("ingestion", response["DataSetId"], response["IngestionId"])
+        for response in responses
+        if response.get("IngestionId")
+    ]
+    if assets:
+        print()
+        with session.using(destination):
+            waiters.wait(assets)
+
+
+@app.command()
+def clone_dataset(
+    source_name: str,
+    name: str,
+    dataset_id: Optional[str] = typer.Option(
+        None, help="ID of the copy (default: its name)"
+    ),
+    to_profile: Optional[str] = typer.Option(
+        None, help="AWS profile to clone into, e.g. prod (default: the current one)"
+    ),
+    to_region: Optional[str] = typer.Option(
+        None, help="AWS region to clone into (default: the current one)"
+    ),
+    data_source: List[str] = typer.Option(
+        [], help="OLD=NEW: read the data source NEW where the source reads OLD"
+    ),
+    owner_group: List[str] = typer.Option(
+        [], help="Give this group full control instead of copying the permissions"
+    ),
+    wait: bool = WAIT_OPTION,
+):
+    """Copies a dataset, with its table maps, settings and permissions, in this
+    account or into another profile or region (e.g. from stage to prod).
 
+    In another account or region, the copy reads the data sources with the same
+    names as the source's, and users and groups are matched by name.  For SPICE
+    datasets, --wait waits for the first ingestion to finish.
+    """
+    data_sources = {}
+    for pair in data_source:
+        old, separator, new = pair.partition("=")
+        if not separator:
+            raise Exception(f"--data-source takes OLD=NEW data source names: {pair}")
+        data_sources[old] = new
+    destination = _destination(to_profile, to_region)
+
+    response = clone.clone(
+        _resolve_id("dataset", source_name),
+        name,
+        dataset_id,
+        destination,
+        data_sources,
+        owner_group,
+    )
     pprint.pp(response)
+    if wait:
+        _wait_for_ingestions(destination, [response])
+
+
+@app.command()
+def clone_datasets(
+    manifest_path: str,
+    concurrency: int = typer.Option(
+        calls.DEFAULT_CONCURRENCY, help="Number of datasets to clone at once"
+    ),
+    wait: bool = WAIT_OPTION,
+):
+    """Clones many datasets at once, as listed in a YAML or JSON manifest (see the
+    README for its format).
+
+    Each entry is cloned like clone_dataset, concurrently, and a failure in one
+    entry does not stop the others.
+    """
+    manifest = _load_manifest(manifest_path)
+    entries = manifest.get("clone") or []
+    for i, entry in enumerate(entries):
+        if not entry.get("source"):
+            raise Exception(f"Manifest entry {i + 1} is missing: source")
+    destination = _destination(manifest.get("to_profile"), manifest.get("to_region"))
+
+    def clone_entry(entry):
+        try:
+            return (
+                clone.clone(
+                    _resolve_id("dataset", entry["source"]),
+                    entry.get("name", entry["source"]),
+                    entry.get("dataset_id"),
+                    destination,
+                    dict(
+                        manifest.get("data_sources") or {},
+                        **entry.get("data_sources", {}),
+                    ),
+                    entry.get("owner_groups", manifest.get("owner_groups") or []),
+                ),
+                None,
+            )
+        except Exception as error:
+            return None, error
+
+    responses = []
+    failures = 0
+    for entry, (response, error) in calls.map_ordered(
+        clone_entry, entries, max(concurrency, 1)
+    ):
+        name = entry.get("name", entry["source"])
+        if error:
+            failures += 1
+            print(f"Failed to clone {entry['source']} as {name}: {error}")
+        else:
+            responses.append(response)
+            print(f"Cloned {entry['source']} as {name} ({response['DataSetId']})")
+
+    if wait:
+        _wait_for_ingestions(destination, responses)
+    if failures:
+        raise Exception(f"Failed to clone {failures} of {len(entries)} datasets.")
 
 
 @app.command()
@@ -420,7 +1031,7 @@ def add_member_to_group(user_name: str, group_name: str):
     response = qs_client.create_group_membership(
         MemberName=user_name,
         GroupName=group_name,
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         Namespace="default",
     )
     print(f"\nAdding user {user_name} to group {group_name}...\n")
@@ -428,11 +1039,13 @@ def add_member_to_group(user_name: str, group_name: str):
 
 
 @app.command()
+@fanout.across_targets
 def create_or_update_template(
     template_name: str,
     analysis_id: str,
     dataset_name_list: List[str],
     version_description: str,
+    wait: bool = WAIT_OPTION,
 ):
     """Creates a new template, or updates an existing one if it already exists.
 
@@ -446,66 +1059,25 @@ def create_or_update_template(
     version_description {str} -- A description of what is new in this version.
     """
 
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    matches = [
-        temp
-        for temp in template_list["TemplateSummaryList"]
-        if temp["Name"] == template_name
-    ]
-    dataset_arn_list = [
-        _get_dataset_description(name)["Arn"] for name in dataset_name_list
-    ]
-
-    dataset_references = [
-        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn,}
-        for name, arn in zip(dataset_name_list, dataset_arn_list)
-    ]
-
-    if len(matches) > 1:
-        print(f"There are multiple templates with name {template_name}")
-        print("This function can handle one at most.")
-        return
-
-    elif len(matches) == 0:
-        print(f"\nCreating template {template_name}\n")
-        response = qs_client.create_template(
-            AwsAccountId=aws_account_id,
-            TemplateId=template_name,
-            Name=template_name,
-            SourceEntity={
-                "SourceAnalysis": {
-                    "Arn": f"arn:aws:quicksight:{aws_region}:{aws_account_id}:analysis/{analysis_id}",
-                    "DataSetReferences": dataset_references,
-                }
-            },
-            VersionDescription=version_description,
-        )
-        pprint.pp(response)
-        print(f"\nSuccessfully created {template_name}, Version 1")
-
-    else:
-        description = _get_template_description(template_name, None)
-        previous_version = description["Version"]["VersionNumber"]
+    dataset_arn_list = [_get_dataset_arn(name) for name in dataset_name_list]
+    response = _create_or_update_template(
+        template_name,
+        analysis_id,
+        dataset_name_list,
+        dataset_arn_list,
+        version_description,
+    )
+    pprint.pp(response)
+    template_version = waiters.version_number(response["VersionArn"])
+    print(f"\nSuccessfully created {template_name}, Version {template_version}")
 
-        template_id = matches[0]["TemplateId"]
-        print(f"\nUpdating template {template_name}\n")
-        response = qs_client.update_template(
-            AwsAccountId=aws_account_id,
-            TemplateId=template_id,
-            Name=template_name,
-            SourceEntity={
-                "SourceAnalysis": {
-                    "Arn": f"arn:aws:quicksight:{aws_region}:{aws_account_id}:analysis/{analysis_id}",
-                    "DataSetReferences": dataset_references,
-                }
-            },
-            VersionDescription=version_description,
-        )
-        pprint.pp(response)
-        print(f"\nSuccessfully created {template_name}, Version {previous_version + 1}")
+    if wait:
+        print()
+        waiters.wait([waiters.version_asset("template", response)])
 
 
 @app.command()
+@fanout.across_targets
 def create_or_update_dashboard(
     dashboard_id: str,
     dashboard_name: str,
@@ -513,6 +1085,8 @@ def create_or_update_dashboard(
     template_version: str,
     owner_group_name: str,
     viewer_group_name: str,
+    wait: bool = WAIT_OPTION,
+    recreate: bool = RECREATE_OPTION,
 ):
     """Create a dashboard from a template.  Will only work
     for templates where the dataset placeholder name is the dataset name + "_placeholder", as
@@ -531,18 +1105,14 @@ def create_or_update_dashboard(
 
     description = _get_template_description(template_name, int(template_version))
     template_arn = description["Arn"]
-    owner_group_arn = _get_group_arn(owner_group_name)
-    viewer_group_arn = _get_group_arn(viewer_group_name)
+    owner_group_arn, viewer_group_arn = _get_group_arns(
+        owner_group_name, viewer_group_name
+    )
     dataset_name_list = [
         dsc["Placeholder"].replace("_placeholder", "")
         for dsc in description["Version"]["DataSetConfigurations"]
     ]
-    dashboard_list = qs_client.list_dashboards(AwsAccountId=aws_account_id)
-    matches = [
-        ds
-        for ds in dashboard_list["DashboardSummaryList"]
-        if ds["Name"] == dashboard_name
-    ]
+    matches = catalog.lookup("dashboard", dashboard_name)
     if len(matches) > 1:
         print(f"\nThere are multiple dashboards with name {dashboard_name}:\n")
         for x in matches:
@@ -561,21 +1131,22 @@ def create_or_update_dashboard(
             viewer_group_arn,
         )
         pprint.pp(response)
+        if wait:
+            print()
+            waiters.wait([waiters.version_asset("dashboard", response)])
         print(f"\n\nSuccessfully created dashboard {dashboard_name}!\n")
-        print(">> Dashboard Permissions <<")
         permission_response = qs_client.describe_dashboard_permissions(
-            AwsAccountId=aws_account_id, DashboardId=response["DashboardId"]
+            AwsAccountId=session.account_id(), DashboardId=response["DashboardId"]
         )
-        for perms in permission_response["Permissions"]:
-            print("\nPrincipal: ", perms["Principal"])
-            print("\nActions: ")
-            pprint.pp(perms["Actions"])
-    else:
+        _print_dashboard_permissions(permission_response["Permissions"])
+    elif recreate:
         dashboard_id = matches[0]["DashboardId"]
         print("\nDeleting old dashboard...\n")
         response = qs_client.delete_dashboard(
-            AwsAccountId=aws_account_id, DashboardId=dashboard_id,
+            AwsAccountId=session.account_id(),
+            DashboardId=dashboard_id,
         )
+        catalog.invalidate("dashboard")
         pprint.pp(response)
 
         print("\nCreating new dashboard...\n")
@@ -588,18 +1159,31 @@ def create_or_update_dashboard(
             viewer_group_arn,
         )
         pprint.pp(response)
+        if wait:
+            print()
+            waiters.wait([waiters.version_asset("dashboard", response)])
         print(f"\n\nSuccessfully created dashboard {dashboard_name}!\n")
-        print(">> Dashboard Permissions <<")
         permission_response = qs_client.describe_dashboard_permissions(
-            AwsAccountId=aws_account_id, DashboardId=response["DashboardId"]
+            AwsAccountId=session.account_id(), DashboardId=response["DashboardId"]
+        )
+        _print_dashboard_permissions(permission_response["Permissions"])
+    else:
+        dashboard_id = matches[0]["DashboardId"]
+        print("\nUpdating dashboard in place...\n")
+        response, permission_list = _update_dashboard(
+            dashboard_id,
+            dashboard_name,
+            dataset_name_list,
+            template_arn,
+            _custom_access_dashboard_permissions(owner_group_arn, viewer_group_arn),
         )
-        for perms in permission_response["Permissions"]:
-            print("\nPrincipal: ", perms["Principal"])
-            print("\nActions: ")
-            pprint.pp(perms["Actions"])
+        pprint.pp(response)
+        print(f"\n\nSuccessfully updated dashboard {dashboard_name}!\n")
+        _print_dashboard_permissions(permission_list)
 
 
 @app.command()
+@fanout.across_targets
 def publish_analysis(
     template_name: str,
     dashboard_name: str,
@@ -608,6 +1192,8 @@ def publish_analysis(
     version_description: str,
     analysis_id: str,
     dataset_name_list: List[str],
+    wait: bool = WAIT_OPTION,
+    recreate: bool = RECREATE_OPTION,
 ):
     """Publishes changes directly from an analysis to a dashboard, creating a new template
     or refreshing the last version.
@@ -622,133 +1208,204 @@ def publish_analysis(
                                 This argument takes an unlimited number of names.
     """
 
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    matches = [
-        temp
-        for temp in template_list["TemplateSummaryList"]
-        if temp["Name"] == template_name
-    ]
-    dataset_arn_list = [
-        _get_dataset_description(name)["Arn"] for name in dataset_name_list
-    ]
-
-    dataset_references = [
-        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn,}
-        for name, arn in zip(dataset_name_list, dataset_arn_list)
-    ]
+    dataset_arn_list = [_get_dataset_arn(name) for name in dataset_name_list]
+    response = _create_or_update_template(
+        template_name,
+        analysis_id,
+        dataset_name_list,
+        dataset_arn_list,
+        version_description,
+    )
+    template_version = waiters.version_number(response["VersionArn"])
+    pprint.pp(response)
+    print(f"\nSuccessfully created {template_name}, Version {template_version}")
 
-    # Create or update template
-    if len(matches) > 1:
-        print(f"There are multiple templates with name {template_name}")
-        print("This function can handle one at most.")
-        return
+    # The dashboard can only be built from a template version that is finished
+    print()
+    waiters.wait([waiters.version_asset("template", response)])
+
+    print("\nPublishing dashboard...\n")
+    verb, response, permission_list = _publish_dashboard(
+        dashboard_name,
+        dashboard_display_name,
+        template_name,
+        template_version,
+        workspace,
+        recreate=recreate,
+        wait=wait,
+    )
+    pprint.pp(response)
+    print(f"\n\nSuccessfully {verb} dashboard {dashboard_display_name}!\n")
+    _print_dashboard_permissions(permission_list)
 
-    elif len(matches) == 0:
-        print(f"\nCreating template {template_name}\n")
-        response = qs_client.create_template(
-            AwsAccountId=aws_account_id,
-            TemplateId=template_name,
-            Name=template_name,
-            SourceEntity={
-                "SourceAnalysis": {
-                    "Arn": f"arn:aws:quicksight:{aws_region}:{aws_account_id}:analysis/{analysis_id}",
-                    "DataSetReferences": dataset_references,
-                }
-            },
-            VersionDescription=version_description,
-        )
-        template_version = 1
-        pprint.pp(response)
-        print(f"\nSuccessfully created {template_name}, Version {template_version}")
 
-    else:
-        description = _get_template_description(template_name, None)
-        previous_version = description["Version"]["VersionNumber"]
+@app.command()
+@fanout.across_targets
+def publish_batch(
+    manifest_path: str,
+    concurrency: int = typer.Option(4, help="Number of publish steps to run at once"),
+    wait: bool = WAIT_OPTION,
+    recreate: bool = RECREATE_OPTION,
+):
+    """Publishes many analyses at once, as listed in a YAML or JSON manifest
+    (see the README for its format).
 
-        template_id = matches[0]["TemplateId"]
-        print(f"\nUpdating template {template_name}\n")
-        response = qs_client.update_template(
-            AwsAccountId=aws_account_id,
-            TemplateId=template_id,
-            Name=template_name,
-            SourceEntity={
-                "SourceAnalysis": {
-                    "Arn": f"arn:aws:quicksight:{aws_region}:{aws_account_id}:analysis/{analysis_id}",
-                    "DataSetReferences": dataset_references,
-                }
-            },
-            VersionDescription=version_description,
-        )
-        template_version = previous_version + 1
-        pprint.pp(response)
-        print(f"\nSuccessfully created {template_name}, Version {template_version}")
+    Each entry is published like publish_analysis.  Datasets used by several
+    entries are looked up once, independent entries run concurrently, and a
+    failure in one entry does not stop the others.
+    """
+    start_time = time.perf_counter()
+    manifest = _load_manifest(manifest_path)
+    entries = manifest.get("publish") or []
+    for i, entry in enumerate(entries):
+        missing = [
+            key
+            for key in ["template", "analysis_id", "datasets", "version_description"]
+            if not entry.get(key)
+        ]
+        if entry.get("dashboard") and not entry.get(
+            "workspace", manifest.get("workspace")
+        ):
+            missing.append("workspace")
+        if missing:
+            raise Exception(f"Manifest entry {i + 1} is missing: {', '.join(missing)}")
+    _check_batch_entries(entries)
+
+    tasks = []
+    dataset_tasks = {}
+    template_tasks = set()
+    for entry in entries:
+        for name in entry["datasets"]:
+            if name not in dataset_tasks:
+                dataset_tasks[name] = f"dataset {name}"
+                lookup = functools.partial(_get_dataset_arn, name)
+                tasks.append(scheduler.Task(dataset_tasks[name], lookup, []))
+
+        def publish_template(*dataset_arn_list, entry=entry):
+            response = _create_or_update_template(
+                entry["template"],
+                entry["analysis_id"],
+                entry["datasets"],
+                list(dataset_arn_list),
+                entry["version_description"],
+            )
+            new_version = waiters.version_asset("template", response)
+            waiters.wait([new_version])
+            return new_version.version
+
+        # Entries that share a template publish it once, and all of their
+        # dashboards wait for that version.
+        template_task = f"template {entry['template']}"
+        if template_task not in template_tasks:
+            template_tasks.add(template_task)
+            tasks.append(
+                scheduler.Task(
+                    template_task,
+                    publish_template,
+                    [dataset_tasks[name] for name in entry["datasets"]],
+                )
+            )
+
+        if entry.get("dashboard"):
+
+            def publish_dashboard(template_version, entry=entry):
+                verb, _, _ = _publish_dashboard(
+                    entry["dashboard"],
+                    entry.get("dashboard_name", entry["dashboard"]),
+                    entry["template"],
+                    template_version,
+                    entry.get("workspace", manifest.get("workspace")),
+                    recreate=recreate,
+                    wait=wait,
+                )
+                return verb
+
+            dashboard_task = f"dashboard {entry['dashboard']}"
+            tasks.append(
+                scheduler.Task(dashboard_task, publish_dashboard, [template_task])
+            )
+
+    print(f"\nPublishing {len(entries)} entries in {len(tasks)} steps\n")
+    lock = threading.Lock()
+    finished = 0
+
+    def report(task, event, detail):
+        nonlocal finished
+        with lock:
+            if event == "started":
+                print(f"[started] {task.name}")
+                return
+            finished += 1
+            progress = f"({finished}/{len(tasks)})"
+            if event == "done":
+                if task.name.startswith("dataset"):
+                    detail = "found"
+                elif task.name.startswith("template"):
+                    detail = f"version {detail}"
+                print(f"[done]    {task.name}: {detail} {progress}")
+            elif event == "failed":
+                print(f"[failed]  {task.name}: {detail} {progress}")
+            else:
+                print(f"[skipped] {task.name}, because {detail} failed {progress}")
+
+    results, errors, skipped = scheduler.run(tasks, max(concurrency, 1), report)
+
+    elapsed = time.perf_counter() - start_time
+    print(
+        f"\n{len(results)} steps succeeded, {len(errors)} failed, "
+        f"{len(skipped)} skipped, in {elapsed:.1f}s"
+    )
+    if errors:
+        raise typer.Exit(code=1)
 
-    # Get the dataset list from the template
-    description = _get_template_description(template_name, int(template_version))
-    template_arn = description["Arn"]
-    dataset_name_list = [
-        dsc["Placeholder"].replace("_placeholder", "")
-        for dsc in description["Version"]["DataSetConfigurations"]
-    ]
-    dashboard_list = qs_client.list_dashboards(AwsAccountId=aws_account_id)
-    matches = [
-        ds
-        for ds in dashboard_list["DashboardSummaryList"]
-        if ds["DashboardId"] == dashboard_name
-    ]
 
-    if len(matches) > 1:
-        print(f"\nThere are multiple dashboards with name {dashboard_name}:\n")
-        for x in matches:
-            print(x["Name"])
-            pprint.pp(x)
-            print()
-        return
-    elif len(matches) == 0:
-        print("\nCreating new dashboard...\n")
-        response = _create_dashboard(
-            dashboard_name,
-            dashboard_display_name,
-            dataset_name_list,
-            template_arn,
-            workspace,
-        )
-        pprint.pp(response)
-        print(f"\n\nSuccessfully created dashboard {dashboard_display_name}!\n")
-        print(">> Dashboard Permissions <<")
-        permission_response = qs_client.describe_dashboard_permissions(
-            AwsAccountId=aws_account_id, DashboardId=response["DashboardId"]
-        )
-        for perms in permission_response["Permissions"]:
-            print("\nPrincipal: ", perms["Principal"])
-            print("\nActions: ")
-            pprint.pp(perms["Actions"])
-    else:
-        dashboard_id = matches[0]["DashboardId"]
-        print("\nDeleting old dashboard...\n")
-        response = qs_client.delete_dashboard(
-            AwsAccountId=aws_account_id, DashboardId=dashboard_id,
-        )
-        pprint.pp(response)
+def _check_batch_entries(entries):
+    """Fails unless every dashboard is published by one manifest entry, and the
+    entries that share a template publish it from the same analysis.
+    """
 
-        print("\nCreating new dashboard...\n")
-        response = _create_dashboard(
-            dashboard_name,
-            dashboard_display_name,
-            dataset_name_list,
-            template_arn,
-            workspace,
-        )
-        pprint.pp(response)
-        print(f"\n\nSuccessfully created dashboard {dashboard_display_name}!\n")
-        print(">> Dashboard Permissions <<")
-        permission_response = qs_client.describe_dashboard_permissions(
-            AwsAccountId=aws_account_id, DashboardId=response["DashboardId"]
-        )
-        for perms in permission_response["Permissions"]:
-            print("\nPrincipal: ", perms["Principal"])
-            print("\nActions: ")
-            pprint.pp(perms["Actions"])
+    def numbers(key):
+        by_value = {}
+        for i, entry in enumerate(entries):
+            if entry.get(key):
+                by_value.setdefault(entry[key], []).append(i + 1)
+        return by_value
+
+    for dashboard, entry_numbers in numbers("dashboard").items():
+        if len(entry_numbers) > 1:
+            listed = ", ".join(map(str, entry_numbers))
+            raise Exception(
+                f"Manifest entries {listed} all publish dashboard {dashboard}."
+            )
+    for template, entry_numbers in numbers("template").items():
+        sources = {
+            (
+                entries[i - 1]["analysis_id"],
+                tuple(entries[i - 1]["datasets"]),
+                entries[i - 1]["version_description"],
+            )
+            for i in entry_numbers
+        }
+        if len(sources) > 1:
+            listed = ", ".join(map(str, entry_numbers))
+            raise Exception(
+                f"Manifest entries {listed} publish template {template} from "
+                "different analyses, datasets or version descriptions."
+            )
+
+
+def _load_manifest(path):
+    with open(path) as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError:
+            raise Exception(
+                "Reading YAML manifests needs PyYAML (pip install pyyaml); "
+                "or write the manifest as a .json file."
+            )
+        return yaml.safe_load(f)
 
 
 @app.command()
@@ -760,32 +1417,26 @@ def update_data_source_permissions(name: str, owner_group_name: str):
         name {str} -- Name of the data source to have its permissions updated
         owner_group_name {str} -- Name of a Quicksight user or group
     """
-    data_source_id = _get_data_source_description(name)["DataSourceId"]
+    data_source_id = _resolve_id("data_source", name)
     owner_group_arn = _get_group_arn(owner_group_name)
 
     response = qs_client.update_data_source_permissions(
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         DataSourceId=data_source_id,
         GrantPermissions=[
             {
                 "Principal": owner_group_arn,
-                "Actions": [
-                    "quicksight:UpdateDataSourcePermissions",
-                    "quicksight:DescribeDataSource",
-                    "quicksight:DescribeDataSourcePermissions",
-                    "quicksight:PassDataSource",
-                    "quicksight:UpdateDataSource",
-                    "quicksight:DeleteDataSource",
-                ],
+                "Actions": permissions.KINDS["data_source"].actions,
             },
         ],
     )
+    audit.invalidate()
 
     pprint.pp(response)
 
     print(f"\n\n>> New permissions for {name} <<")
     response = qs_client.describe_data_source_permissions(
-        AwsAccountId=aws_account_id, DataSourceId=data_source_id
+        AwsAccountId=session.account_id(), DataSourceId=data_source_id
     )
     for perms in response["Permissions"]:
         print("\nPrincipal: ", perms["Principal"])
@@ -798,36 +1449,26 @@ def update_dataset_permissions(name: str, owner_group_name: str):
     """Will grant full permissions for a dataset to a given user/group,
     without altering any pre-existing permissions.
     """
-    dataset_id = _get_dataset_description(name)["DataSetId"]
+    dataset_id = _resolve_id("dataset", name)
     owner_group_arn = _get_group_arn(owner_group_name)
 
     response = qs_client.update_data_set_permissions(
-        AwsAccountId=aws_account_id,
+        AwsAccountId=session.account_id(),
         DataSetId=dataset_id,
         GrantPermissions=[
             {
                 "Principal": owner_group_arn,
-                "Actions": [
-                    "quicksight:UpdateDataSetPermissions",
-                    "quicksight:DescribeDataSet",
-                    "quicksight:DescribeDataSetPermissions",
-                    "quicksight:PassDataSet",
-                    "quicksight:DescribeIngestion",
-                    "quicksight:ListIngestions",
-                    "quicksight:UpdateDataSet",
-                    "quicksight:DeleteDataSet",
-                    "quicksight:CreateIngestion",
-                    "quicksight:CancelIngestion",
-                ],
+                "Actions": permissions.KINDS["dataset"].actions,
             },
         ],
     )
+    audit.invalidate()
 
     pprint.pp(response)
 
     print(f"\n\n>> New permissions for {name} <<")
     response = qs_client.describe_data_set_permissions(
-        AwsAccountId=aws_account_id, DataSetId=dataset_id
+        AwsAccountId=session.account_id(), DataSetId=dataset_id
     )
     for perms in response["Permissions"]:
         print("\nPrincipal: ", perms["Principal"])
@@ -835,12 +1476,150 @@ def update_dataset_permissions(name: str, owner_group_name: str):
         pprint.pp(perms["Actions"])
 
 
+PERMISSION_MODE_OPTION = typer.Option(
+    "grant",
+    "--mode",
+    help="grant: add missing actions; revoke: remove them; "
+    "exact: leave the principal with exactly these actions",
+)
+BULK_CONCURRENCY_OPTION = typer.Option(
+    calls.DEFAULT_CONCURRENCY, help="Number of assets to fetch or update at once"
+)
+
+
+@app.command()
+def bulk_update_data_source_permissions(
+    owner_group_name: str,
+    name: str = typer.Option(
+        None, help="Only data sources whose name matches this glob"
+    ),
+    all_assets: bool = typer.Option(False, "--all", help="Every data source"),
+    mode: str = PERMISSION_MODE_OPTION,
+    dry_run: bool = typer.Option(False, help="Only show what would change"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Do not ask to confirm"),
+    concurrency: int = BULK_CONCURRENCY_OPTION,
+):
+    """Gives a user/group full permissions on many data sources at once, only
+    updating the ones that are missing some.
+    """
+    _bulk_update_permissions(
+        "data_source",
+        owner_group_name,
+        name,
+        None,
+        all_assets,
+        mode,
+        dry_run,
+        yes,
+        concurrency,
+    )
+
+
+@app.command()
+def bulk_update_dataset_permissions(
+    owner_group_name: str,
+    name: str = typer.Option(None, help="Only datasets whose name matches this glob"),
+    downstream_of: str = typer.Option(
+        None, help="Only datasets that read from the data source with this name"
+    ),
+    all_assets: bool = typer.Option(False, "--all", help="Every dataset"),
+    mode: str = PERMISSION_MODE_OPTION,
+    dry_run: bool = typer.Option(False, help="Only show what would change"),
+    yes: bool = typer.Option(False, "--yes", "-y", help="Do not ask to confirm"),
+    concurrency: int = BULK_CONCURRENCY_OPTION,
+):
+    """Gives a user/group full permissions on many datasets at once, only
+    updating the ones that are missing some.
+    """
+    _bulk_update_permissions(
+        "dataset",
+        owner_group_name,
+        name,
+        downstream_of,
+        all_assets,
+        mode,
+        dry_run,
+        yes,
+        concurrency,
+    )
+
+
+def _bulk_update_permissions(
+    resource_type,
+    owner_group_name,
+    name,
+    downstream_of,
+    all_assets,
+    mode,
+    dry_run,
+    yes,
+    concurrency,
+):
+    label = RESOURCE_LABELS[resource_type]
+    if not (all_assets or name or downstream_of):
+        selectors = (
+            "--name, --downstream-of" if resource_type == "dataset" else "--name"
+        )
+        raise Exception(f"Choose the {label} with {selectors} or --all.")
+    if mode not in permissions.MODES:
+        raise Exception(f"--mode must be one of {', '.join(permissions.MODES)}.")
+    owner_group_arn = _get_group_arn(owner_group_name)
+    data_source_arn = None
+    if downstream_of:
+        data_source_id = _resolve_id("data_source", downstream_of)
+        data_source_arn = catalog.by_id("data_source", data_source_id)[0]["Arn"]
+
+    summaries = permissions.select(resource_type, name, data_source_arn, concurrency)
+    changes = permissions.plan(
+        resource_type, summaries, owner_group_arn, mode=mode, concurrency=concurrency
+    )
+    pending = [change for change in changes if change.grants or change.revokes]
+    failed = [change for change in changes if change.error]
+
+    def actions(permission_list):
+        return " ".join(
+            action.replace("quicksight:", "")
+            for permission in permission_list
+            for action in permission["Actions"]
+        )
+
+    output.records(
+        (change._asdict() for change in pending + failed),
+        [
+            ("Name", "name"),
+            ("ID", "id"),
+            ("Grant", lambda row: actions(row["grants"])),
+            ("Revoke", lambda row: actions(row["revokes"])),
+            ("Error", "error"),
+        ],
+    )
+    output.note(
+        f"\n{len(pending)} of {len(changes)} {label} need changes"
+        + (f", and {len(failed)} could not be read." if failed else ".")
+    )
+    if dry_run or not pending:
+        return
+    if not yes:
+        typer.confirm(f"Update the permissions of {len(pending)} {label}?", abort=True)
+
+    errors = 0
+    for change, error in permissions.apply(pending, concurrency):
+        if error:
+            errors += 1
+            output.note(f"Could not update {change.name} ({change.id}): {error}")
+    output.note(f"Updated {len(pending) - errors} {label}.")
+    if errors:
+        raise Exception(f"{errors} {label} could not be updated (see above).")
+
+
 @app.command()
 def delete_group(group_name: str):
     print(f"\nDeleting group {group_name}...\n")
     response = qs_client.delete_group(
-        GroupName=group_name, AwsAccountId=aws_account_id, Namespace="default"
+        GroupName=group_name, AwsAccountId=session.account_id(), Namespace="default"
     )
+    catalog.invalidate("group")
+    audit.invalidate()
     pprint.pp(response)
 
 
@@ -849,20 +1628,18 @@ def delete_data_source(data_source_id: str):
     typer.confirm("Are you sure you want to delete this data source?", abort=True)
     print(f"\nDeleting data source with ID: {data_source_id}\n")
     response = qs_client.delete_data_source(
-        AwsAccountId=aws_account_id, DataSourceId=data_source_id,
+        AwsAccountId=session.account_id(),
+        DataSourceId=data_source_id,
     )
+    catalog.invalidate("data_source")
+    audit.invalidate()
     pprint.pp(response)
 
 
 @app.command()
 def delete_dashboard(dashboard_name: str):
     typer.confirm("Are you sure you want to delete this data source?", abort=True)
-    dashboard_list = qs_client.list_dashboards(AwsAccountId=aws_account_id)
-    matches = [
-        ds
-        for ds in dashboard_list["DashboardSummaryList"]
-        if ds["Name"] == dashboard_name
-    ]
+    matches = catalog.lookup("dashboard", dashboard_name)
     if len(matches) > 1:
         print(f"\nThere are multiple dashboards with name {dashboard_name}")
         print("This function can handle one at most.")
@@ -875,20 +1652,18 @@ def delete_dashboard(dashboard_name: str):
 
     print(f"\nDeleting Dashboard with ID: {dashboard_id}\n")
     response = qs_client.delete_dashboard(
-        AwsAccountId=aws_account_id, DashboardId=dashboard_id,
+        AwsAccountId=session.account_id(),
+        DashboardId=dashboard_id,
     )
+    catalog.invalidate("dashboard")
+    audit.invalidate()
     pprint.pp(response)
 
 
 @app.command()
 def delete_template(template_name: str):
     typer.confirm("Are you sure you want to delete this template?", abort=True)
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    matches = [
-        temp
-        for temp in template_list["TemplateSummaryList"]
-        if temp["Name"] == template_name
-    ]
+    matches = catalog.lookup("template", template_name)
 
     if len(matches) > 1:
         print(f"\nThere are multiple templates with name {template_name}")
@@ -903,11 +1678,175 @@ def delete_template(template_name: str):
 
     print(f"\nDeleting template with ID: {template_id}\n")
     response = qs_client.delete_template(
-        AwsAccountId=aws_account_id, TemplateId=template_id,
+        AwsAccountId=session.account_id(),
+        TemplateId=template_id,
     )
+    catalog.invalidate("template")
+    audit.invalidate()
     pprint.pp(response)
 
 
+@app.command()
+def shell():
+    """
+    Runs commands typed at a prompt in one process, keeping AWS clients, the caller
+    identity and the resource index warm between them.
+    """
+    daemon.shell()
+
+
+@app.command("daemon")
+def run_daemon(
+    background: bool = typer.Option(
+        False, "--background", help="Start it in a detached process and return"
+    ),
+    stop: bool = typer.Option(False, "--stop", help="Stop the running daemon"),
+    status: bool = typer.Option(False, "--status", help="Say whether one is running"),
+    idle_timeout: int = typer.Option(
+        daemon.IDLE_TIMEOUT, help="Stop after this many seconds without a command"
+    ),
+):
+    """
+    Runs a daemon that `fv` sends its commands to, keeping AWS clients, the caller
+    identity and the resource index warm between them.
+    """
+    if stop:
+        print("Stopped." if daemon.stop() else "No daemon is running.")
+    elif status:
+        running = "running" if daemon.is_running() else "not running"
+        print(f"The daemon at {daemon.socket_path()} is {running}.")
+    elif background:
+        daemon.start_in_background(idle_timeout)
+        print(f"Serving fv commands at {daemon.socket_path()}")
+    else:
+        daemon.serve(idle_timeout)
+
+
+def _create_or_update_template(
+    template_name, analysis_id, dataset_name_list, dataset_arn_list, version_description
+):
+    """Helper function that creates a template from an analysis, or adds a version to
+    the existing template with that name.
+
+    Args:
+        template_name (str): Also used as the ID of a new template
+        analysis_id (str)
+        dataset_name_list (List[str]): All the datasets that went into the analysis
+        dataset_arn_list (List[str]): The ARNs of those datasets, in the same order
+        version_description (str)
+
+    Returns:
+        The create_template or update_template response.
+    """
+    matches = catalog.lookup("template", template_name)
+    if len(matches) > 1:
+        print(f"\nMultiple templates have the name {template_name}\n")
+        for x in matches:
+            print(x["Name"])
+            pprint.pp(x)
+            print()
+        raise Exception("Multiple templates with the same name (see list above).")
+
+    dataset_references = [
+        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn}
+        for name, arn in zip(dataset_name_list, dataset_arn_list)
+    ]
+    source_entity = {
+        "SourceAnalysis": {
+            "Arn": arns.analysis(analysis_id),
+            "DataSetReferences": dataset_references,
+        }
+    }
+
+    if len(matches) == 0:
+        response = qs_client.create_template(
+            AwsAccountId=session.account_id(),
+            TemplateId=template_name,
+            Name=template_name,
+            SourceEntity=source_entity,
+            VersionDescription=version_description,
+        )
+        audit.invalidate()
+    else:
+        response = qs_client.update_template(
+            AwsAccountId=session.account_id(),
+            TemplateId=matches[0]["TemplateId"],
+            Name=template_name,
+            SourceEntity=source_entity,
+            VersionDescription=version_description,
+        )
+    catalog.invalidate("template")
+    return response
+
+
+def _publish_dashboard(
+    dashboard_id,
+    dashboard_name,
+    template_name,
+    template_version,
+    workspace,
+    recreate=False,
+    wait=True,
+):
+    """Helper function that publishes a template version to the dashboard with this ID,
+    updating it in place if it exists (or re-creating it, with `recreate`) and
+    creating it otherwise.
+
+    Args:
+        dashboard_id (str): Must be unique; will be part of the URL
+        dashboard_name (str): Will be displayed as the title
+        template_name (str)
+        template_version (int)
+        workspace {'stage'|'prod'}: Determines permissions
+        recreate (bool): Delete and re-create an existing dashboard
+        wait (bool): Wait for a new dashboard to be built
+
+    Returns:
+        "created" or "updated", the create/update_dashboard response, and the
+        dashboard's permissions.
+    """
+    description = _get_template_description(template_name, int(template_version))
+    template_arn = description["Arn"]
+    dataset_name_list = [
+        dsc["Placeholder"].replace("_placeholder", "")
+        for dsc in description["Version"]["DataSetConfigurations"]
+    ]
+    matches = catalog.by_id("dashboard", dashboard_id)
+
+    if matches and not recreate:
+        response, permission_list = _update_dashboard(
+            dashboard_id,
+            dashboard_name,
+            dataset_name_list,
+            template_arn,
+            _workspace_dashboard_permissions(workspace),
+        )
+        return "updated", response, permission_list
+
+    if matches:
+        qs_client.delete_dashboard(
+            AwsAccountId=session.account_id(), DashboardId=dashboard_id
+        )
+        catalog.invalidate("dashboard")
+
+    response = _create_dashboard(
+        dashboard_id, dashboard_name, dataset_name_list, template_arn, workspace
+    )
+    if wait:
+        waiters.wait([waiters.version_asset("dashboard", response)])
+    permission_list = qs_client.describe_dashboard_permissions(
+        AwsAccountId=session.account_id(), DashboardId=dashboard_id
+    )["Permissions"]
+    return "created", response, permission_list
+
+
+DASHBOARD_PUBLISH_OPTIONS = {
+    "AdHocFilteringOption": {"AvailabilityStatus": "DISABLED"},
+    "ExportToCSVOption": {"AvailabilityStatus": "ENABLED"},
+    "SheetControlsOption": {"VisibilityState": "EXPANDED"},
+}
+
+
 def _create_dashboard(
     dashboard_id: str,
     dashboard_name: str,
@@ -925,17 +1864,119 @@ def _create_dashboard(
         template_arn (str)
         workspace {'stage'|'prod'}: Determines permissions
     """
-    dataset_arn_list = [
-        _get_dataset_description(name)["Arn"] for name in dataset_name_list
-    ]
+    response = qs_client.create_dashboard(
+        AwsAccountId=session.account_id(),
+        DashboardId=dashboard_id,
+        Name=dashboard_name,
+        Permissions=_workspace_dashboard_permissions(workspace),
+        SourceEntity=_dashboard_source_entity(dataset_name_list, template_arn),
+        DashboardPublishOptions=DASHBOARD_PUBLISH_OPTIONS,
+    )
+    catalog.invalidate("dashboard")
+    audit.invalidate()
+    return response
+
+
+def _create_custom_access_dashboard(
+    dashboard_id,
+    dashboard_name,
+    dataset_name_list,
+    template_arn,
+    owner_group_arn,
+    viewer_group_arn,
+):
+    """Helper function for creating dashboards with non-default access.
+
+    Args:
+        dashboard_id (str): Must be unique; will be part of the URL
+        dashboard_name (str): Will be displayed as the title
+        dataset_name_list (List[str]): All the datasets that went into the analysis
+        template_arn (str)
+        owner_group_arn (str): Arn of a group that will get read-write access
+        viewer_group_arn (str): Arn of a group that will get read-only access
+    """
+    response = qs_client.create_dashboard(
+        AwsAccountId=session.account_id(),
+        DashboardId=dashboard_id,
+        Name=dashboard_name,
+        Permissions=_custom_access_dashboard_permissions(
+            owner_group_arn, viewer_group_arn
+        ),
+        SourceEntity=_dashboard_source_entity(dataset_name_list, template_arn),
+        DashboardPublishOptions=DASHBOARD_PUBLISH_OPTIONS,
+    )
+    catalog.invalidate("dashboard")
+    audit.invalidate()
+    return response
+
+
+def _update_dashboard(
+    dashboard_id, dashboard_name, dataset_name_list, template_arn, permission_list
+):
+    """Helper function for updating a dashboard in place, so that it stays available
+    and keeps its version history. Waits for the new version to be built and
+    publishes it, then changes only the permissions that differ from `permission_list`.
+
+    Args:
+        dashboard_id (str)
+        dashboard_name (str): Will be displayed as the title
+        dataset_name_list (List[str]): All the datasets that went into the analysis
+        template_arn (str)
+        permission_list (List[dict]): The permissions the dashboard should end up with
+
+    Returns:
+        The update_dashboard response, and the dashboard's permissions afterwards.
+    """
+    response = qs_client.update_dashboard(
+        AwsAccountId=session.account_id(),
+        DashboardId=dashboard_id,
+        Name=dashboard_name,
+        SourceEntity=_dashboard_source_entity(dataset_name_list, template_arn),
+        DashboardPublishOptions=DASHBOARD_PUBLISH_OPTIONS,
+    )
+    catalog.invalidate("dashboard")
+
+    # Only a finished version can be published
+    new_version = waiters.version_asset("dashboard", response)
+    waiters.wait([new_version])
+    qs_client.update_dashboard_published_version(
+        AwsAccountId=session.account_id(),
+        DashboardId=dashboard_id,
+        VersionNumber=new_version.version,
+    )
+
+    current_permissions = qs_client.describe_dashboard_permissions(
+        AwsAccountId=session.account_id(), DashboardId=dashboard_id
+    )["Permissions"]
+    grants, revokes = permissions.delta(current_permissions, permission_list)
+    if grants or revokes:
+        current_permissions = qs_client.update_dashboard_permissions(
+            AwsAccountId=session.account_id(),
+            DashboardId=dashboard_id,
+            **permissions.update_params(grants, revokes),
+        )["Permissions"]
+        audit.invalidate()
+    return response, current_permissions
+
+
+def _dashboard_source_entity(dataset_name_list, template_arn):
+    dataset_arn_list = [_get_dataset_arn(name) for name in dataset_name_list]
     dataset_references = [
-        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn,}
+        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn}
         for name, arn in zip(dataset_name_list, dataset_arn_list)
     ]
+    return {
+        "SourceTemplate": {"DataSetReferences": dataset_references, "Arn": template_arn}
+    }
 
+
+def _workspace_dashboard_permissions(workspace):
+    """Read-write access for the "admins" group, plus read access for everyone
+    in the account when `workspace` is 'prod'.
+    """
     admin_write_permission = [
         {
-            "Principal": _get_group_arn("admins"),
+            "Principal": arns.group("admins"),
             "Actions": [
                 "quicksight:DescribeDashboard",
                 "quicksight:ListDashboardVersions",
@@ -950,7 +1991,7 @@ def _create_dashboard(
     ]
     general_read_permission = [
         {
-            "Principal": f"arn:aws:quicksight:us-east-1:{aws_account_id}:namespace/default",
+            "Principal": arns.namespace(),
             "Actions": [
                 "quicksight:DescribeDashboard",
                 "quicksight:ListDashboardVersions",
@@ -960,57 +2001,14 @@ def _create_dashboard(
     ]
 
     if workspace == "stage":
-        permissions = admin_write_permission
+        return admin_write_permission
     elif workspace == "prod":
-        permissions = admin_write_permission + general_read_permission
+        return admin_write_permission + general_read_permission
     else:
         raise Exception("Workspace must be 'stage' or 'prod'.")
 
-    response = qs_client.create_dashboard(
-        AwsAccountId=aws_account_id,
-        DashboardId=dashboard_id,
-        Name=dashboard_name,
-        Permissions=permissions,
-        SourceEntity={
-            "SourceTemplate": {
-                "DataSetReferences": dataset_references,
-                "Arn": template_arn,
-            },
-        },
-        DashboardPublishOptions={
-            "AdHocFilteringOption": {"AvailabilityStatus": "DISABLED"},
-            "ExportToCSVOption": {"AvailabilityStatus": "ENABLED"},
-            "SheetControlsOption": {"VisibilityState": "EXPANDED"},
-        },
-    )
-    return response
-
 
-def _create_custom_access_dashboard(
-    dashboard_id,
-    dashboard_name,
-    dataset_name_list,
-    template_arn,
-    owner_group_arn,
-    viewer_group_arn,
-):
-    """Helper function for creating dashboards with non-default access.
-
-    Args:
-        dashboard_id (str): Must be unique; will be part of the URL
-        dashboard_name (str): Will be displayed as the title
-        dataset_name_list (List[str]): All the datasets that went into the analysis
-        template_arn (str)
-        owner_group_arn (str): Arn of a group that will get read-write access
-        viewer_group_arn (str): Arn of a group that will get read-only access
-    """
-    dataset_arn_list = [
-        _get_dataset_description(name)["Arn"] for name in dataset_name_list
-    ]
-    dataset_references = [
-        {"DataSetPlaceholder": f"{name}_placeholder", "DataSetArn": arn,}
-        for name, arn in zip(dataset_name_list, dataset_arn_list)
-    ]
+def _custom_access_dashboard_permissions(owner_group_arn, viewer_group_arn):
     read_write_permission = [
         {
             "Principal": owner_group_arn,
@@ -1039,138 +2037,84 @@ def _create_custom_access_dashboard(
     ]
 
     if owner_group_arn == viewer_group_arn:
-        permissions = read_write_permission
+        return read_write_permission
     else:
-        permissions = read_write_permission + read_only_permission
-
-    response = qs_client.create_dashboard(
-        AwsAccountId=aws_account_id,
-        DashboardId=dashboard_id,
-        Name=dashboard_name,
-        Permissions=permissions,
-        SourceEntity={
-            "SourceTemplate": {
-                "DataSetReferences": dataset_references,
-                "Arn": template_arn,
-            },
-        },
-        DashboardPublishOptions={
-            "AdHocFilteringOption": {"AvailabilityStatus": "DISABLED"},
-            "ExportToCSVOption": {"AvailabilityStatus": "ENABLED"},
-            "SheetControlsOption": {"VisibilityState": "EXPANDED"},
-        },
-    )
-    return response
+        return read_write_permission + read_only_permission
 
 
-def _get_dashboard_description(name):
-    dashboard_list = qs_client.list_dashboards(AwsAccountId=aws_account_id)
-    matches = [
-        ds for ds in dashboard_list["DashboardSummaryList"] if ds["Name"] == name
-    ]
-    if len(matches) <= 0:
-        print(f"\nNo dashboards have the name {name}")
-        raise Exception("No dashboards with that name.")
-    elif len(matches) > 1:
-        print(f"\nMultiple dashboards have the name {name}:\n")
-        for x in matches:
-            print(x["Name"])
-            print(x)
-            print()
-        raise Exception("Multiple dashboards with the same name (see list above).")
-    else:
-        dashboard_id = matches[0]["DashboardId"]
+def _print_permissions(permission_list):
+    print("\n\n>> Permissions <<")
+    for perms in permission_list:
+        print("\nPrincipal: ", perms["Principal"])
+        print("\nActions: ")
+        pprint.pp(perms["Actions"])
 
-    response = qs_client.describe_dashboard(
-        AwsAccountId=aws_account_id, DashboardId=dashboard_id,
-    )
-    return response["Dashboard"]
 
+def _print_dashboard_permissions(permission_list):
+    print(">> Dashboard Permissions <<")
+    for perms in permission_list:
+        print("\nPrincipal: ", perms["Principal"])
+        print("\nActions: ")
+        pprint.pp(perms["Actions"])
 
-def _get_data_source_description(name):
-    data_source_list = qs_client.list_data_sources(AwsAccountId=aws_account_id)
-    matches = [ds for ds in data_source_list["DataSources"] if ds["Name"] == name]
-    if len(matches) <= 0:
-        print(f"\nNo data sources have the name {name}")
-        raise Exception("No data sources with that name.")
-    elif len(matches) > 1:
-        print(f"\nMultiple data sources have the name {name}\n")
-        for x in matches:
-            print(x["Name"])
-            pprint.pp(x)
-            print()
-        raise Exception("Multiple data sources with the same name (see list above).")
-    else:
-        data_source_id = matches[0]["DataSourceId"]
 
-    response = qs_client.describe_data_source(
-        AwsAccountId=aws_account_id, DataSourceId=data_source_id,
-    )
-    return response["DataSource"]
+RESOURCE_LABELS = {
+    "data_source": "data sources",
+    "dataset": "datasets",
+    "template": "templates",
+    "dashboard": "dashboards",
+}
 
 
-def _get_dataset_description(dataset_name):
-    dataset_list = qs_client.list_data_sets(AwsAccountId=aws_account_id)
-    matches = [
-        ds for ds in dataset_list["DataSetSummaries"] if ds["Name"] == dataset_name
-    ]
+def _resolve_id(resource_type, name):
+    """Returns the ID of the only resource of a type with this name, from the
+    catalog.  Raises an Exception if there are none or several.
+    """
+    label = RESOURCE_LABELS[resource_type]
+    matches = catalog.lookup(resource_type, name)
     if len(matches) <= 0:
-        print(f"\nNo datasets have the name {dataset_name}\n")
-        raise Exception("No datasets with that name.")
+        output.note(f"\nNo {label} have the name {name}")
+        raise Exception(f"No {label} with that name.")
     elif len(matches) > 1:
-        print(f"\nMultiple datasets have the name {dataset_name}\n")
+        output.note(f"\nMultiple {label} have the name {name}:\n")
         for x in matches:
-            print(x["Name"])
-            pprint.pp(x)
-            print()
-        raise Exception("Multiple datasets with the same name (see list above).")
-    else:
-        dataset_id = matches[0]["DataSetId"]
+            output.note(x["Name"])
+            output.note(pprint.pformat(x))
+            output.note()
+        raise Exception(f"Multiple {label} with the same name (see list above).")
+    return matches[0][catalog.RESOURCE_TYPES[resource_type].id_key]
 
-    response = qs_client.describe_data_set(
-        AwsAccountId=aws_account_id, DataSetId=dataset_id
-    )
-    return response["DataSet"]
 
+def _get_dataset_arn(dataset_name):
+    return arns.dataset(_resolve_id("dataset", dataset_name))
 
-def _get_template_description(template_name, version):
-    template_list = qs_client.list_templates(AwsAccountId=aws_account_id)
-    matches = [
-        temp
-        for temp in template_list["TemplateSummaryList"]
-        if temp["Name"] == template_name
-    ]
-
-    if len(matches) > 1:
-        print(f"\nMultiple templates have the name {template_name}\n")
-        for x in matches:
-            print(x["Name"])
-            pprint.pp(x)
-            print()
-        raise Exception("Multiple templates with the same name (see list above).")
 
-    elif len(matches) == 0:
-        print(f"\nThere are no templates with name {template_name}")
-        raise Exception("No templates with that name.")
-    else:
-        template_id = matches[0]["TemplateId"]
+def _get_template_description(template_name, version):
+    template_id = _resolve_id("template", template_name)
 
     if version is None:
         response = qs_client.describe_template(
-            AwsAccountId=aws_account_id, TemplateId=template_id,
+            AwsAccountId=session.account_id(),
+            TemplateId=template_id,
         )
     else:
         response = qs_client.describe_template(
-            AwsAccountId=aws_account_id, TemplateId=template_id, VersionNumber=version,
+            AwsAccountId=session.account_id(),
+            TemplateId=template_id,
+            VersionNumber=version,
         )
 
     return response["Template"]
 
 
 def _get_group_arn(group_name):
-    return qs_client.describe_group(
-        GroupName=group_name, AwsAccountId=aws_account_id, Namespace="default",
-    )["Group"]["Arn"]
+    return _get_group_arns(group_name)[0]
+
+
+def _get_group_arns(*group_names):
+    """Returns the ARNs of these groups, after checking that they all exist."""
+    arns.check("group", group_names)
+    return [arns.group(group_name) for group_name in group_names]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,152 @@
+"""Rendering command results for people or for scripts, chosen with `fv --output`.
+
+"table" (the default) is for people: lists are column-aligned tables and describe
+commands print their readable layout.  "ndjson" writes one JSON object per line
+and "json" a single JSON document (an array for lists).  Everything is written as
+it is produced, a row or a JSON chunk at a time, so long lists start printing
+straight away and large descriptions never become one giant string.
+
+In the JSON modes, headings and other notes for people go to standard error, so
+standard output is only the JSON.
+
+Inside `collecting`, records and documents go to a Collector instead of being
+written, for fastview.fanout to merge the results of several targets.
+"""
+import contextlib
+import contextvars
+import itertools
+import json
+import sys
+
+MODES = ["table", "json", "ndjson"]
+
+# Rows whose widths are measured before they are printed.  Later rows that are
+# wider widen their column from then on.
+TABLE_BLOCK = 100
+
+_mode = "table"
+_collector = contextvars.ContextVar("collector", default=None)
+
+
+class Collector:
+    """What a command wrote with `records` and `document`, in order: a list of
+    (rows, columns) and a list of (value, human).
+    """
+
+    def __init__(self):
+        self.records = []
+        self.documents = []
+
+    def add_records(self, rows, columns):
+        self.records.append((list(rows), columns))
+
+    def add_document(self, value, human):
+        self.documents.append((value, human))
+
+
+@contextlib.contextmanager
+def collecting(collector):
+    """Keeps records and documents written inside the block in `collector`."""
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+def set_mode(mode):
+    global _mode
+    if mode not in MODES:
+        raise Exception(f"--output must be one of {', '.join(MODES)}.")
+    _mode = mode
+
+
+def mode():
+    return _mode
+
+
+def is_json():
+    return _mode != "table"
+
+
+def note(*args):
+    """Prints something meant for people, out of the way of JSON output."""
+    print(*args, file=sys.stderr if is_json() else sys.stdout)
+
+
+def _write_json(value, indent=None):
+    # json.dump writes the encoder's chunks as it goes, unlike json.dumps.
+    json.dump(value, sys.stdout, indent=indent, default=str)
+
+
+def _json_line(row):
+    # A row is small, and one write per row is much faster than json.dump's many.
+    return json.dumps(row, default=str)
+
+
+def records(rows, columns):
+    """Writes a list of records: a table of `columns`, a list of (heading, key)
+    pairs, or every record in full as JSON.
+
+    A key may also be a function of the record, for computed columns.
+    """
+    collector = _collector.get()
+    if collector is not None:
+        collector.add_records(rows, columns)
+    elif _mode == "ndjson":
+        for row in rows:
+            sys.stdout.write(_json_line(row) + "\n")
+    elif _mode == "json":
+        sys.stdout.write("[")
+        for i, row in enumerate(rows):
+            sys.stdout.write((",\n" if i else "\n") + _json_line(row))
+        sys.stdout.write("\n]\n")
+    else:
+        table(rows, columns)
+
+
+def document(value, human):
+    """Writes a single result: as JSON, or by calling `human()` in table mode."""
+    collector = _collector.get()
+    if collector is not None:
+        collector.add_document(value, human)
+    elif _mode == "table":
+        human()
+    else:
+        _write_json(value, indent=2 if _mode == "json" else None)
+        sys.stdout.write("\n")
+
+
+def _cell(row, key):
+    value = key(row) if callable(key) else row.get(key)
+    return "" if value is None else str(value)
+
+
+def table(rows, columns):
+    """Prints rows as a column-aligned table, a block of rows at a time."""
+    widths = [len(heading) for heading, _ in columns]
+    rows = iter(rows)
+    printed_heading = False
+    while True:
+        block = [
+            [_cell(row, key) for _, key in columns]
+            for row in itertools.islice(rows, TABLE_BLOCK)
+        ]
+        if not block:
+            break
+        widths = [
+            max(width, *(len(cells[i]) for cells in block))
+            for i, width in enumerate(widths)
+        ]
+        if not printed_heading:
+            _print_row([heading for heading, _ in columns], widths)
+            _print_row(["-" * width for width in widths], widths)
+            printed_heading = True
+        for cells in block:
+            _print_row(cells, widths)
+    if not printed_heading:
+        print("(none)")
+
+
+def _print_row(cells, widths):
+    print("  ".join(cell.ljust(width) for cell, width in zip(cells, widths)).rstrip())
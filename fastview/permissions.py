@@ -0,0 +1,235 @@
+"""Helpers for comparing and bulk-updating QuickSight resource permissions.
+
+Permissions are lists of {"Principal": arn, "Actions": [...]} dicts, as returned by
+the describe_*_permissions calls and taken by the update_*_permissions calls.
+
+For changing one principal's access to many assets, `select` picks assets from
+the catalog (all of a type, those whose name matches a glob, or the datasets
+downstream of a data source), `plan` fetches their permissions concurrently and
+works out the grants and revokes each one needs, and `apply` sends an update
+only for the assets that change, paced by the rate limits in calls.
+"""
+import collections
+import fnmatch
+
+from fastview import audit, calls, catalog, session
+
+
+def by_principal(permission_list):
+    """Returns {principal: set of actions} for a permission list."""
+    result = {}
+    for permission in permission_list:
+        result.setdefault(permission["Principal"], set()).update(permission["Actions"])
+    return result
+
+
+def _as_list(actions_by_principal):
+    return [
+        {"Principal": principal, "Actions": sorted(actions)}
+        for principal, actions in sorted(actions_by_principal.items())
+        if actions
+    ]
+
+
+def delta(current, desired):
+    """Returns the (grants, revokes) that turn the `current` permissions into exactly
+    the `desired` ones.  Both are empty when nothing needs to change.
+    """
+    current = by_principal(current)
+    desired = by_principal(desired)
+    grants = {
+        principal: actions - current.get(principal, set())
+        for principal, actions in desired.items()
+    }
+    revokes = {
+        principal: actions - desired.get(principal, set())
+        for principal, actions in current.items()
+    }
+    return _as_list(grants), _as_list(revokes)
+
+
+def update_params(grants, revokes):
+    """Returns the Grant/RevokePermissions keyword arguments for an
+    update_*_permissions call, leaving out the empty ones.
+    """
+    params = {}
+    if grants:
+        params["GrantPermissions"] = grants
+    if revokes:
+        params["RevokePermissions"] = revokes
+    return params
+
+
+Kind = collections.namedtuple(
+    "Kind", ["id_key", "permissions_operation", "update_operation", "actions"]
+)
+
+KINDS = {
+    "data_source": Kind(
+        "DataSourceId",
+        "describe_data_source_permissions",
+        "update_data_source_permissions",
+        [
+            "quicksight:UpdateDataSourcePermissions",
+            "quicksight:DescribeDataSource",
+            "quicksight:DescribeDataSourcePermissions",
+            "quicksight:PassDataSource",
+            "quicksight:UpdateDataSource",
+            "quicksight:DeleteDataSource",
+        ],
+    ),
+    "dataset": Kind(
+        "DataSetId",
+        "describe_data_set_permissions",
+        "update_data_set_permissions",
+        [
+            "quicksight:UpdateDataSetPermissions",
+            "quicksight:DescribeDataSet",
+            "quicksight:DescribeDataSetPermissions",
+            "quicksight:PassDataSet",
+            "quicksight:DescribeIngestion",
+            "quicksight:ListIngestions",
+            "quicksight:UpdateDataSet",
+            "quicksight:DeleteDataSet",
+            "quicksight:CreateIngestion",
+            "quicksight:CancelIngestion",
+        ],
+    ),
+}
+
+# "grant" adds the actions a principal is missing, "revoke" removes the given
+# actions it has, and "exact" does both so that it ends up with exactly these.
+MODES = ["grant", "revoke", "exact"]
+
+Change = collections.namedtuple(
+    "Change", ["type", "id", "name", "grants", "revokes", "error"]
+)
+Change.__doc__ = """The grants and revokes, as permission lists, that one asset needs.
+
+error is set instead when its permissions could not be fetched.
+"""
+
+qs_client = calls.Client("quicksight")
+
+
+def select(resource_type, pattern=None, downstream_of=None, concurrency=None):
+    """Returns the catalog summaries of the assets of a type whose name matches
+    the glob `pattern` and, for datasets, that read from the data source with
+    the ARN `downstream_of`.  With neither, every asset of the type is selected.
+    """
+    summaries = [
+        summary
+        for summary in catalog.summaries(resource_type)
+        if pattern is None or fnmatch.fnmatchcase(summary.get("Name", ""), pattern)
+    ]
+    if downstream_of is None:
+        return summaries
+    if resource_type == "data_source":
+        return [summary for summary in summaries if summary["Arn"] == downstream_of]
+    if resource_type != "dataset":
+        raise Exception(f"Cannot select {resource_type}s by data source.")
+    # Dataset summaries do not say which data sources they read, so every
+    # candidate is described.
+    uses = calls.map_ordered(
+        lambda summary: downstream_of in _data_source_arns(summary["DataSetId"]),
+        summaries,
+        concurrency or calls.DEFAULT_CONCURRENCY,
+    )
+    return [summary for summary, used in uses if used]
+
+
+def _data_source_arns(dataset_id):
+    """Returns the ARNs of the data sources a dataset reads, or an empty set if it
+    cannot be described (as with datasets made from file uploads).
+    """
+    try:
+        description = qs_client.describe_data_set(
+            AwsAccountId=session.account_id(), DataSetId=dataset_id
+        )["DataSet"]
+    except Exception:
+        return set()
+    return {
+        table["DataSourceArn"]
+        for physical_table in description.get("PhysicalTableMap", {}).values()
+        for table in physical_table.values()
+        if isinstance(table, dict) and "DataSourceArn" in table
+    }
+
+
+def desired(permission_list, principal, actions, mode="grant"):
+    """Returns `permission_list` with the actions of `principal` changed as `mode`
+    asks for with `actions`.
+    """
+    result = by_principal(permission_list)
+    current = result.get(principal, set())
+    if mode == "grant":
+        result[principal] = current | set(actions)
+    elif mode == "revoke":
+        result[principal] = current - set(actions)
+    else:
+        result[principal] = set(actions)
+    return _as_list(result)
+
+
+def plan(
+    resource_type,
+    summaries,
+    principal,
+    actions=None,
+    mode="grant",
+    concurrency=calls.DEFAULT_CONCURRENCY,
+):
+    """Fetches the permissions of every asset concurrently and returns a Change
+    for each one, in order.  actions default to full control of the asset.
+    """
+    if mode not in MODES:
+        raise Exception(f"The mode must be one of {', '.join(MODES)}.")
+    kind = KINDS[resource_type]
+    actions = kind.actions if actions is None else actions
+
+    def change(summary):
+        resource_id = summary[kind.id_key]
+        try:
+            permission_list = getattr(qs_client, kind.permissions_operation)(
+                AwsAccountId=session.account_id(), **{kind.id_key: resource_id}
+            )["Permissions"]
+        except Exception as error:
+            error = calls.error_code(error) or str(error)
+            return Change(
+                resource_type, resource_id, summary.get("Name"), [], [], error
+            )
+        grants, revokes = delta(
+            permission_list, desired(permission_list, principal, actions, mode)
+        )
+        return Change(
+            resource_type, resource_id, summary.get("Name"), grants, revokes, None
+        )
+
+    return [result for _, result in calls.map_ordered(change, summaries, concurrency)]
+
+
+def apply(changes, concurrency=calls.DEFAULT_CONCURRENCY):
+    """Sends an update for each change with something to grant or revoke, and
+    yields (change, error code or None) as each one finishes, in order.
+    """
+
+    def update(change):
+        kind = KINDS[change.type]
+        try:
+            getattr(qs_client, kind.update_operation)(
+                AwsAccountId=session.account_id(),
+                **{kind.id_key: change.id},
+                **update_params(change.grants, change.revokes),
+            )
+        except Exception as error:
+            return calls.error_code(error) or str(error)
+        finally:
+            audit.invalidate()
+        return None
+
+    pending = (
+        change
+        for change in changes
+        if change.error is None and (change.grants or change.revokes)
+    )
+    return calls.map_ordered(update, pending, concurrency)
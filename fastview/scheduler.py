@@ -0,0 +1,86 @@
+"""A small dependency-aware task runner.
+
+Tasks run on a thread pool as soon as every task they depend on has succeeded, so
+independent chains of work proceed side by side.  When a task fails, the tasks
+that depend on it (directly or not) are skipped and everything else carries on.
+"""
+import collections
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from fastview import calls
+
+Task = collections.namedtuple("Task", ["name", "function", "dependencies"])
+Task.__doc__ = """A unit of work.
+
+function is called with the results of the tasks named in dependencies, in that
+order, and its return value is the task's result.
+"""
+
+
+def run(tasks, concurrency=calls.DEFAULT_CONCURRENCY, report=None):
+    """Runs every task and returns (results, errors, skipped).
+
+    results maps the names of tasks that succeeded to their return values, errors
+    maps the names of tasks that failed to their exceptions, and skipped lists the
+    tasks that never ran because a dependency failed.
+
+    report, if given, is called as report(task, event, detail) when a task
+    "started", is "done" (detail is its result), "failed" (detail is the
+    exception) or is "skipped" (detail is the name of the failed dependency).
+    """
+    report = report or (lambda task, event, detail: None)
+    by_name = {}
+    for task in tasks:
+        if task.name in by_name:
+            raise ValueError(f"Duplicate task: {task.name}")
+        by_name[task.name] = task
+    dependents = collections.defaultdict(list)
+    waiting_on = {}
+    for task in tasks:
+        for dependency in task.dependencies:
+            if dependency not in by_name:
+                raise ValueError(f"{task.name} depends on unknown task {dependency}")
+            dependents[dependency].append(task.name)
+        waiting_on[task.name] = len(task.dependencies)
+
+    results = {}
+    errors = {}
+    skipped = []
+
+    def skip_dependents(name, failed):
+        for dependent in dependents[name]:
+            if dependent not in skipped:
+                skipped.append(dependent)
+                report(by_name[dependent], "skipped", failed)
+                skip_dependents(dependent, failed)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        running = {}
+
+        def start(task):
+            report(task, "started", None)
+            arguments = [results[dependency] for dependency in task.dependencies]
+            running[calls.submit(executor, task.function, *arguments)] = task
+
+        for task in tasks:
+            if not task.dependencies:
+                start(task)
+
+        while running:
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                task = running.pop(future)
+                try:
+                    results[task.name] = future.result()
+                except Exception as error:
+                    errors[task.name] = error
+                    report(task, "failed", error)
+                    skip_dependents(task.name, task.name)
+                    continue
+                report(task, "done", results[task.name])
+                for dependent in dependents[task.name]:
+                    waiting_on[dependent] -= 1
+                    if waiting_on[dependent] == 0 and dependent not in skipped:
+                        start(by_name[dependent])
+
+    return results, errors, skipped
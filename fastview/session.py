@@ -0,0 +1,178 @@
+"""Lazily-resolved AWS state shared by every command.
+
+Nothing in this module imports boto3 or talks to AWS until a command actually
+needs a client or the caller identity, so `fv --help` and shell completion never
+pay for credential resolution or STS round trips.  Each value is resolved at most
+once per process.
+
+Everything is kept per Target, an AWS profile and region.  Commands run against
+the current target, which is the first of `targets()` unless `using` says
+otherwise; each target has its own boto3 session, and so its own connection pool.
+The current target is a context variable, so threads started through
+`calls.submit` carry on with the target of the code that started them.
+"""
+import collections
+import contextlib
+import contextvars
+import os
+import threading
+from concurrent.futures import Future
+
+Target = collections.namedtuple("Target", ["profile", "region"])
+Target.__doc__ = """An AWS profile and region; None means boto3's default."""
+
+DEFAULT_TARGET = Target(None, None)
+
+# Connections each client keeps open.  Commands make up to calls.DEFAULT_CONCURRENCY
+# calls at once, some of them two at a time (a description and its permissions),
+# so botocore's default of 10 would leave threads waiting for a connection.
+MAX_POOL_CONNECTIONS = 50
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+RETRY_MODE = "standard"
+
+# _lock guards the dicts below and is never held while boto3 builds a session
+# or client; each target has its own lock for that, so targets start in parallel.
+_lock = threading.Lock()
+_target_locks = {}
+_targets = [DEFAULT_TARGET]
+_current = contextvars.ContextVar("target", default=None)
+_boto_sessions = {}
+_clients = {}
+_identities = {}
+
+
+def set_targets(profiles=(), regions=()):
+    """Makes commands run against every combination of these profiles and
+    regions, or boto3's default profile or region when none are given.
+    """
+    global _targets
+    _targets = [
+        Target(profile, region)
+        for profile in list(profiles) or [None]
+        for region in list(regions) or [None]
+    ]
+
+
+def targets():
+    return list(_targets)
+
+
+def target():
+    """Returns the target that AWS calls made here go to."""
+    return _current.get() or _targets[0]
+
+
+@contextlib.contextmanager
+def using(target):
+    """Sends the AWS calls made inside the block to `target`."""
+    token = _current.set(target)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def _target_lock(target):
+    with _lock:
+        return _target_locks.setdefault(target, threading.RLock())
+
+
+def _new_boto_session(target):
+    import boto3
+
+    return boto3.session.Session(profile_name=target.profile, region_name=target.region)
+
+
+def boto_session():
+    """Returns the boto3 session of the current target, importing boto3 on first
+    use.
+    """
+    key = target()
+    with _target_lock(key):
+        if key not in _boto_sessions:
+            _boto_sessions[key] = _new_boto_session(key)
+        return _boto_sessions[key]
+
+
+def client_config(service_name, **options):
+    """Returns the botocore Config that clients for `service_name` are built with.
+
+    The pool size, timeouts (in seconds), TCP keep-alive and retry mode can be set
+    with FV_MAX_POOL_CONNECTIONS, FV_CONNECT_TIMEOUT, FV_READ_TIMEOUT,
+    FV_TCP_KEEPALIVE (0 turns it off) and FV_RETRY_MODE, and `options` override
+    them all.  Options that the installed botocore does not know are left out.
+    """
+    from botocore.config import Config
+
+    settings = {
+        "max_pool_connections": int(
+            os.environ.get("FV_MAX_POOL_CONNECTIONS", MAX_POOL_CONNECTIONS)
+        ),
+        "connect_timeout": float(os.environ.get("FV_CONNECT_TIMEOUT", CONNECT_TIMEOUT)),
+        "read_timeout": float(os.environ.get("FV_READ_TIMEOUT", READ_TIMEOUT)),
+        "tcp_keepalive": os.environ.get("FV_TCP_KEEPALIVE", "1") != "0",
+        "retries": {"mode": os.environ.get("FV_RETRY_MODE", RETRY_MODE)},
+    }
+    if service_name == "quicksight":
+        # fastview.calls retries QuickSight calls itself, so that it sees every
+        # throttle and can slow down.
+        settings["retries"]["total_max_attempts"] = 1
+    settings.update(options)
+    return Config(
+        **{
+            name: value
+            for name, value in settings.items()
+            if name in Config.OPTION_DEFAULTS
+        }
+    )
+
+
+def client(service_name):
+    """Returns the client for `service_name` in the current target, creating it
+    on first use.  Clients are thread-safe, so every thread shares it and its
+    connection pool.
+    """
+    key = (target(), service_name)
+    with _target_lock(key[0]):
+        if key not in _clients:
+            _clients[key] = boto_session().client(
+                service_name, config=client_config(service_name)
+            )
+        return _clients[key]
+
+
+def caller_identity():
+    """Returns the STS caller identity of the current target, calling STS only
+    the first time.  Threads that need it meanwhile wait for that call, without
+    holding any lock.
+    """
+    key = target()
+    with _lock:
+        identity = _identities.get(key)
+        calling = identity is None
+        if calling:
+            identity = _identities[key] = Future()
+    if calling:
+        from fastview import calls
+
+        try:
+            identity.set_result(calls.call("sts", "get_caller_identity", {}))
+        except BaseException as error:
+            # The next caller tries again.
+            with _lock:
+                del _identities[key]
+            identity.set_exception(error)
+    return identity.result()
+
+
+def account_id():
+    return caller_identity()["Account"]
+
+
+def user():
+    return caller_identity()["Arn"].split("/")[-1]
+
+
+def region():
+    return boto_session().region_name
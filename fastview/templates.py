@@ -0,0 +1,201 @@
+"""Template versions: a local cache of their descriptions, and structural diffs.
+
+A template version never changes once QuickSight has finished building it, so
+`describe` keeps every finished version it fetches in the catalog's directory
+and never asks for it again.  A template deleted and created again under the same
+ID starts its versions over, so cached versions are only used while the
+template's CreatedTime matches the catalog's.
+
+`diff` compares two versions by the parts that matter when publishing: the
+version's own fields, its sheets, its dataset configurations (placeholders) and
+their column schemas.  Everything is matched by ID or name through dicts, so it
+stays linear in the size of the templates.
+"""
+import collections
+import json
+import os
+
+from fastview import archive, calls, catalog, session, waiters
+
+Difference = collections.namedtuple(
+    "Difference", ["part", "name", "change", "old", "new"]
+)
+Difference.__doc__ = """One change between two template versions.
+
+part is "Version", "Errors", "Sheets", "Datasets", "Columns" or "Column groups";
+change is "added", "removed", "changed", "renamed" or "moved"; old and new are
+short descriptions of each side, None where it has none.
+"""
+
+# Fields of a version that are compared as they are.
+VERSION_FIELDS = ["Description", "SourceEntityArn", "ThemeArn", "Status"]
+
+qs_client = calls.Client("quicksight")
+
+
+def cache_path(template_id, version):
+    account, region = session.account_id(), session.region()
+    return os.path.join(
+        catalog.cache_dir(),
+        "templates",
+        f"{account}-{region}-{template_id}-{version}.json.gz",
+    )
+
+
+def _created_time(template_id):
+    summaries = catalog.by_id("template", template_id)
+    return summaries[0].get("CreatedTime") if summaries else None
+
+
+def describe(template_id, version):
+    """Returns the describe_template description of one version, from the local
+    cache when it has been fetched before.
+    """
+    path = cache_path(template_id, version)
+    created = _created_time(template_id)
+    if os.path.exists(path):
+        for description in archive.read_records(path, "gzip"):
+            if created is None or str(description.get("CreatedTime")) == str(created):
+                return description
+
+    description = qs_client.describe_template(
+        AwsAccountId=session.account_id(), TemplateId=template_id, VersionNumber=version
+    )["Template"]
+    status = description["Version"].get("Status")
+    if status in waiters.SUCCESS_STATUSES | waiters.FAILURE_STATUSES:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with archive.open_archive(path + ".partial", "w", "gzip") as f:
+            f.write(json.dumps(description, default=str) + "\n")
+        os.replace(path + ".partial", path)
+    return description
+
+
+def _keyed(items, key):
+    return {item[key]: item for item in items or []}
+
+
+def _compare(part, old_items, new_items, describe_item):
+    """Yields a Difference for every key only in `old_items` or only in
+    `new_items`.
+    """
+    for name in old_items:
+        if name not in new_items:
+            yield Difference(
+                part, name, "removed", describe_item(old_items[name]), None
+            )
+    for name in new_items:
+        if name not in old_items:
+            yield Difference(part, name, "added", None, describe_item(new_items[name]))
+
+
+def _column_type(column):
+    role = column.get("GeographicRole")
+    return f"{column.get('DataType')}, {role}" if role else column.get("DataType")
+
+
+def _columns(dataset):
+    return dataset.get("DataSetSchema", {}).get("ColumnSchemaList", [])
+
+
+def _column_count(dataset):
+    count = len(_columns(dataset))
+    return f"{count} column" if count == 1 else f"{count} columns"
+
+
+def _diff_sheets(old_sheets, new_sheets):
+    old, new = _keyed(old_sheets, "SheetId"), _keyed(new_sheets, "SheetId")
+    yield from _compare("Sheets", old, new, lambda sheet: sheet.get("Name"))
+    # Positions among the sheets in both, so that an added sheet moves nothing.
+    old_positions = {
+        sheet_id: position
+        for position, sheet_id in enumerate((i for i in old if i in new), 1)
+    }
+    new_positions = {
+        sheet_id: position
+        for position, sheet_id in enumerate((i for i in new if i in old), 1)
+    }
+    for sheet_id, new_position in new_positions.items():
+        old_name, new_name = old[sheet_id].get("Name"), new[sheet_id].get("Name")
+        if old_name != new_name:
+            yield Difference("Sheets", sheet_id, "renamed", old_name, new_name)
+        old_position = old_positions[sheet_id]
+        if old_position != new_position:
+            yield Difference(
+                "Sheets",
+                sheet_id,
+                "moved",
+                f"position {old_position}",
+                f"position {new_position}",
+            )
+
+
+def _diff_columns(placeholder, old_dataset, new_dataset):
+    old = _keyed(_columns(old_dataset), "Name")
+    new = _keyed(_columns(new_dataset), "Name")
+    for difference in _compare("Columns", old, new, _column_type):
+        yield difference._replace(name=f"{placeholder}: {difference.name}")
+    for name in new:
+        if name in old and _column_type(old[name]) != _column_type(new[name]):
+            yield Difference(
+                "Columns",
+                f"{placeholder}: {name}",
+                "changed",
+                _column_type(old[name]),
+                _column_type(new[name]),
+            )
+
+
+def _diff_column_groups(placeholder, old_dataset, new_dataset):
+    def columns(group):
+        return ", ".join(
+            column["Name"] for column in group.get("ColumnGroupColumnSchemaList", [])
+        )
+
+    old = _keyed(old_dataset.get("ColumnGroupSchemaList"), "Name")
+    new = _keyed(new_dataset.get("ColumnGroupSchemaList"), "Name")
+    for difference in _compare("Column groups", old, new, columns):
+        yield difference._replace(name=f"{placeholder}: {difference.name}")
+    for name in new:
+        if name in old and columns(old[name]) != columns(new[name]):
+            yield Difference(
+                "Column groups",
+                f"{placeholder}: {name}",
+                "changed",
+                columns(old[name]),
+                columns(new[name]),
+            )
+
+
+def diff(old_version, new_version):
+    """Returns the Differences between two template versions (the "Version" of
+    their descriptions), part by part.
+    """
+    differences = []
+    for field in VERSION_FIELDS:
+        old, new = old_version.get(field), new_version.get(field)
+        if old != new:
+            differences.append(Difference("Version", field, "changed", old, new))
+
+    def error(item):
+        return f"{item.get('Type')}: {item.get('Message')}"
+
+    old_errors = {error(item): item for item in old_version.get("Errors", [])}
+    new_errors = {error(item): item for item in new_version.get("Errors", [])}
+    differences.extend(_compare("Errors", old_errors, new_errors, lambda item: None))
+
+    differences.extend(
+        _diff_sheets(old_version.get("Sheets"), new_version.get("Sheets"))
+    )
+
+    old = _keyed(old_version.get("DataSetConfigurations"), "Placeholder")
+    new = _keyed(new_version.get("DataSetConfigurations"), "Placeholder")
+    differences.extend(_compare("Datasets", old, new, _column_count))
+    for placeholder in new:
+        if placeholder in old:
+            differences.extend(
+                _diff_columns(placeholder, old[placeholder], new[placeholder])
+            )
+            differences.extend(
+                _diff_column_groups(placeholder, old[placeholder], new[placeholder])
+            )
+    return differences
@@ -0,0 +1,233 @@
+"""Opt-in tracing of the AWS calls a command makes, for `fv --profile`.
+
+When enabled, fastview.calls records every QuickSight and STS call: its operation,
+a digest of its parameters, how long it took, how many times it was retried and
+how large the response was.  Reads answered from the memo are recorded too, with
+no latency.  `report` prints a flame-style summary, grouping the time spent by the
+fastview functions that made the calls, and `write_chrome_trace` saves the calls
+as a trace that chrome://tracing or https://ui.perfetto.dev can open.
+"""
+import collections
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+Span = collections.namedtuple(
+    "Span",
+    [
+        "service",
+        "operation",
+        "digest",
+        "start",
+        "duration",
+        "retries",
+        "response_bytes",
+        "error",
+        "memoized",
+        "stack",
+        "thread",
+    ],
+)
+Span.__doc__ = """One recorded call.
+
+start and duration are in seconds, start relative to `enable`.  stack is the tuple
+of fastview functions, outermost first, that led to the call.
+"""
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Frames in these modules are plumbing, not the code that wanted the call.
+_SKIPPED_FILES = {
+    os.path.join(_PACKAGE_DIR, name) for name in ("calls.py", "tracing.py")
+}
+
+_lock = threading.Lock()
+_enabled = False
+_started = None
+_spans = []
+
+
+def enable():
+    """Starts recording calls, forgetting any recorded before."""
+    global _enabled, _started
+    with _lock:
+        _enabled = True
+        _started = time.perf_counter()
+        _spans.clear()
+
+
+def disable():
+    global _enabled
+    with _lock:
+        _enabled = False
+        _spans.clear()
+
+
+def enabled():
+    return _enabled
+
+
+def digest(params):
+    """Returns a short, stable digest of a call's parameters."""
+    encoded = json.dumps(params, sort_keys=True, default=str).encode()
+    return hashlib.sha1(encoded).hexdigest()[:10]
+
+
+def response_size(response):
+    """Returns the size in bytes of a response, encoded as JSON."""
+    return len(json.dumps(response, default=str).encode())
+
+
+def _caller_stack():
+    stack = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if (
+            code.co_filename.startswith(_PACKAGE_DIR)
+            and code.co_filename not in _SKIPPED_FILES
+            # Comprehensions and lambdas only add noise to the tree.
+            and not code.co_name.startswith("<")
+        ):
+            stack.append(code.co_name)
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+def record(
+    service_name,
+    operation_name,
+    params,
+    start,
+    duration,
+    retries=0,
+    response=None,
+    error=None,
+    memoized=False,
+):
+    """Records one call, if tracing is enabled.
+
+    start is the time.perf_counter() at which the call began.
+    """
+    if not _enabled:
+        return
+    span = Span(
+        service=service_name,
+        operation=operation_name,
+        digest=digest(params),
+        start=start - _started,
+        duration=duration,
+        retries=retries,
+        response_bytes=0 if response is None else response_size(response),
+        error=error,
+        memoized=memoized,
+        stack=_caller_stack(),
+        thread=threading.get_ident(),
+    )
+    with _lock:
+        _spans.append(span)
+
+
+def spans():
+    """Returns the spans recorded so far, in the order the calls finished."""
+    with _lock:
+        return list(_spans)
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def report(file=None):
+    """Prints a summary of the recorded calls to `file` (standard error by
+    default): a tree of the fastview functions that made them with the time spent
+    under each, then totals per operation.
+    """
+    file = file or sys.stderr
+    recorded = spans()
+    if not recorded:
+        print("profile: no AWS calls were made", file=file)
+        return
+    wall = time.perf_counter() - _started
+
+    tree = {}
+    for span in recorded:
+        path = span.stack + (f"{span.service}.{span.operation}",)
+        node = tree
+        for name in path:
+            totals = node.setdefault(name, [0.0, 0, {}])
+            totals[0] += span.duration
+            totals[1] += 1
+            node = totals[2]
+
+    print(f"profile: {len(recorded)} calls in {wall:.2f}s", file=file)
+    print(f"{'call time':>10} {'calls':>6}  caller", file=file)
+
+    def print_node(node, depth):
+        for name, (seconds, count, children) in sorted(
+            node.items(), key=lambda item: -item[1][0]
+        ):
+            print(f"{seconds:>9.3f}s {count:>6}  {'  ' * depth}{name}", file=file)
+            print_node(children, depth + 1)
+
+    print_node(tree, 0)
+
+    by_operation = collections.OrderedDict()
+    for span in recorded:
+        key = f"{span.service}.{span.operation}"
+        totals = by_operation.setdefault(key, collections.Counter())
+        totals["calls"] += 1
+        totals["memoized"] += span.memoized
+        totals["retries"] += span.retries
+        totals["errors"] += span.error is not None
+        totals["seconds"] += span.duration
+        totals["bytes"] += span.response_bytes
+    print(
+        f"\n{'operation':<45} {'calls':>6} {'memo':>5} {'retry':>5} {'err':>4} "
+        f"{'total':>8} {'mean':>8} {'bytes':>8}",
+        file=file,
+    )
+    for operation, totals in sorted(
+        by_operation.items(), key=lambda item: -item[1]["seconds"]
+    ):
+        made = totals["calls"] - totals["memoized"]
+        mean = totals["seconds"] / made if made else 0.0
+        print(
+            f"{operation:<45} {totals['calls']:>6} {totals['memoized']:>5} "
+            f"{totals['retries']:>5} {totals['errors']:>4} "
+            f"{totals['seconds']:>7.3f}s {mean:>7.3f}s "
+            f"{_format_bytes(totals['bytes']):>8}",
+            file=file,
+        )
+
+
+def write_chrome_trace(path):
+    """Writes the recorded calls to `path` in the Chrome trace event format."""
+    events = []
+    for span in spans():
+        events.append(
+            {
+                "name": span.operation,
+                "cat": span.service + (",memoized" if span.memoized else ""),
+                "ph": "X",
+                "ts": round(span.start * 1e6),
+                "dur": round(span.duration * 1e6),
+                "pid": os.getpid(),
+                "tid": span.thread,
+                "args": {
+                    "params": span.digest,
+                    "retries": span.retries,
+                    "response_bytes": span.response_bytes,
+                    "error": span.error,
+                    "caller": " > ".join(span.stack),
+                },
+            }
+        )
+    with open(path, "w") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
@@ -0,0 +1,118 @@
+"""Waiting for QuickSight to finish building assets.
+
+Creating or updating a template, dashboard or data source, and creating a SPICE
+dataset, only starts the work on QuickSight's side.  `wait` polls the status of any
+number of such assets at once, backing off between polls, until each one reaches a
+terminal state.
+"""
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fastview import calls, session
+
+Asset = collections.namedtuple("Asset", ["kind", "resource_id", "version"])
+Asset.__doc__ = """An asset to wait for.
+
+kind is "template", "dashboard", "data_source" or "ingestion".  version is the
+template or dashboard version number, or the ingestion ID for "ingestion" (whose
+resource_id is the dataset ID), and is None for data sources.
+"""
+
+SUCCESS_STATUSES = {"CREATION_SUCCESSFUL", "UPDATE_SUCCESSFUL", "COMPLETED"}
+FAILURE_STATUSES = {"CREATION_FAILED", "UPDATE_FAILED", "FAILED", "CANCELLED"}
+
+FIRST_DELAY = 1.0
+MAX_DELAY = 15.0
+DEFAULT_TIMEOUT = 600.0
+
+# Polls must see the latest status, never a memoized one.
+qs_client = calls.Client("quicksight", fresh=True)
+
+
+def version_number(version_arn):
+    """Returns the version number at the end of a template or dashboard VersionArn."""
+    return int(version_arn.split("/")[-1])
+
+
+def version_asset(kind, response):
+    """Returns the Asset for the template or dashboard version that a create_* or
+    update_* call started building.
+    """
+    id_key = {"template": "TemplateId", "dashboard": "DashboardId"}[kind]
+    return Asset(kind, response[id_key], version_number(response["VersionArn"]))
+
+
+def status(asset):
+    """Returns (status, errors) for an asset, where errors is a list of the error
+    details QuickSight reports for it.
+    """
+    if asset.kind == "template":
+        version = qs_client.describe_template(
+            AwsAccountId=session.account_id(),
+            TemplateId=asset.resource_id,
+            VersionNumber=asset.version,
+        )["Template"]["Version"]
+        return version["Status"], version.get("Errors", [])
+    elif asset.kind == "dashboard":
+        version = qs_client.describe_dashboard(
+            AwsAccountId=session.account_id(),
+            DashboardId=asset.resource_id,
+            VersionNumber=asset.version,
+        )["Dashboard"]["Version"]
+        return version["Status"], version.get("Errors", [])
+    elif asset.kind == "data_source":
+        data_source = qs_client.describe_data_source(
+            AwsAccountId=session.account_id(), DataSourceId=asset.resource_id
+        )["DataSource"]
+        return data_source["Status"], [data_source.get("ErrorInfo")]
+    elif asset.kind == "ingestion":
+        ingestion = qs_client.describe_ingestion(
+            AwsAccountId=session.account_id(),
+            DataSetId=asset.resource_id,
+            IngestionId=asset.version,
+        )["Ingestion"]
+        return ingestion["IngestionStatus"], [ingestion.get("ErrorInfo")]
+    raise ValueError(f"Unknown asset kind: {asset.kind}")
+
+
+def _wait_for_one(asset, timeout):
+    deadline = time.monotonic() + timeout
+    delay = FIRST_DELAY
+    while True:
+        current_status, errors = status(asset)
+        if current_status in SUCCESS_STATUSES:
+            return current_status, []
+        if current_status in FAILURE_STATUSES:
+            return current_status, [error for error in errors if error]
+        if time.monotonic() + delay > deadline:
+            return current_status, [f"Still {current_status} after {timeout:.0f}s"]
+        time.sleep(delay)
+        delay = min(MAX_DELAY, delay * 1.5)
+
+
+def wait(assets, timeout=DEFAULT_TIMEOUT, concurrency=calls.DEFAULT_CONCURRENCY):
+    """Waits until every asset is built, printing each one as it finishes.
+
+    Raises an Exception listing the assets that failed or timed out, after all of
+    them have finished.
+    """
+    failures = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            calls.submit(executor, _wait_for_one, asset, timeout): asset
+            for asset in assets
+        }
+        for future in as_completed(futures):
+            asset = futures[future]
+            final_status, errors = future.result()
+            label = f"{asset.kind} {asset.resource_id}"
+            if asset.version is not None:
+                label += f" ({asset.version})"
+            print(f"{label}: {final_status}")
+            if errors:
+                failures.append(label)
+                for error in errors:
+                    print(f"    {error}")
+    if failures:
+        raise Exception(f"QuickSight could not build: {', '.join(failures)}")
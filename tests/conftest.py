@@ -0,0 +1,33 @@
+"""Fixtures for the tests: an in-memory QuickSight from fastview.fake_quicksight,
+so that nothing needs AWS credentials or network access.
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+# The catalog must not touch the real cache, so this is set before fastview loads.
+os.environ["FV_CACHE_DIR"] = tempfile.mkdtemp(prefix="fv-tests-")
+
+from fastview import calls, catalog, fake_quicksight  # noqa: E402
+
+# Every test gets its own account, so that none sees another's catalog.
+_account_numbers = itertools.count(1)
+
+
+@pytest.fixture
+def quicksight(monkeypatch):
+    """Installs a FakeQuickSight of 10 assets of each kind until the test ends and
+    returns it, with the Recorders that count its calls as `recorders`.
+    """
+    monkeypatch.setattr(calls, "MAX_RATES", {})
+    monkeypatch.setattr(calls, "DEFAULT_MAX_RATE", 1e6)
+    account_id = f"{next(_account_numbers):012d}"
+    fake = fake_quicksight.FakeQuickSight(account_id, 10)
+    fake.recorders = fake_quicksight.install(
+        fake, fake_quicksight.FakeSTS(account_id), setattr=monkeypatch.setattr
+    )
+    calls.reset_memo()
+    catalog.start_run()
+    return fake
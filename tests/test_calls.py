@@ -0,0 +1,27 @@
+from fastview import calls
+
+qs_client = calls.Client("quicksight")
+
+
+def test_identical_reads_are_memoized(quicksight):
+    params = dict(AwsAccountId=quicksight.account_id, DashboardId="dashboard0")
+    qs_client.list_dashboard_versions(**params)
+    qs_client.list_dashboard_versions(**params)
+    counts = quicksight.recorders["quicksight"].counts
+    assert counts["quicksight.list_dashboard_versions"] == 1
+
+
+def test_a_write_forgets_every_read_of_its_resource(quicksight):
+    params = dict(AwsAccountId=quicksight.account_id, DashboardId="dashboard0")
+    qs_client.list_dashboard_versions(**params)
+    qs_client.describe_dashboard(**params)
+    qs_client.list_data_sets(AwsAccountId=quicksight.account_id)
+    qs_client.update_dashboard_published_version(VersionNumber=1, **params)
+    qs_client.list_dashboard_versions(**params)
+    qs_client.describe_dashboard(**params)
+    qs_client.list_data_sets(AwsAccountId=quicksight.account_id)
+    counts = quicksight.recorders["quicksight"].counts
+    assert counts["quicksight.list_dashboard_versions"] == 2
+    assert counts["quicksight.describe_dashboard"] == 2
+    # Reads of other resources are kept.
+    assert counts["quicksight.list_data_sets"] == 1
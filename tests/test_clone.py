@@ -0,0 +1,12 @@
+from fastview import clone, session
+
+
+def test_clone_to_another_region_without_a_logical_table_map(quicksight):
+    del quicksight.datasets["dataset0"]["LogicalTableMap"]
+    destination = session.Target(None, "eu-west-1")
+    clone.clone("dataset0", "copy", destination=destination, owner_groups=["admins"])
+    copy = quicksight.datasets["copy"]
+    assert copy["LogicalTableMap"] == {}
+    assert (
+        copy["PhysicalTableMap"] == quicksight.datasets["dataset0"]["PhysicalTableMap"]
+    )
@@ -0,0 +1,91 @@
+from typer.testing import CliRunner
+
+from fastview import arns, permissions
+from fastview.main import app
+
+ALICE = "arn:aws:quicksight:us-east-1:111122223333:user/default/alice"
+ADMINS = "arn:aws:quicksight:us-east-1:111122223333:group/default/admins"
+
+
+def test_delta_grants_missing_actions_and_revokes_extra_ones():
+    current = [
+        {"Principal": ALICE, "Actions": ["a", "b"]},
+        {"Principal": ADMINS, "Actions": ["a"]},
+    ]
+    desired = [{"Principal": ALICE, "Actions": ["b", "c"]}]
+    grants, revokes = permissions.delta(current, desired)
+    assert grants == [{"Principal": ALICE, "Actions": ["c"]}]
+    assert revokes == [
+        {"Principal": ADMINS, "Actions": ["a"]},
+        {"Principal": ALICE, "Actions": ["a"]},
+    ]
+
+
+def test_delta_is_empty_when_nothing_changes():
+    current = [
+        {"Principal": ALICE, "Actions": ["b", "a"]},
+        {"Principal": ALICE, "Actions": ["c"]},
+    ]
+    desired = [{"Principal": ALICE, "Actions": ["a", "b", "c"]}]
+    assert permissions.delta(current, desired) == ([], [])
+
+
+def test_desired_modes():
+    current = [{"Principal": ALICE, "Actions": ["a", "b"]}]
+    assert permissions.desired(current, ALICE, ["c"], "grant") == [
+        {"Principal": ALICE, "Actions": ["a", "b", "c"]}
+    ]
+    assert permissions.desired(current, ALICE, ["b", "c"], "revoke") == [
+        {"Principal": ALICE, "Actions": ["a"]}
+    ]
+    assert permissions.desired(current, ALICE, ["c"], "exact") == [
+        {"Principal": ALICE, "Actions": ["c"]}
+    ]
+    # Revoking everything leaves the principal out, rather than with no actions.
+    assert permissions.desired(current, ALICE, ["a", "b"], "revoke") == []
+
+
+def test_plan_only_changes_assets_that_need_it(quicksight):
+    actions = permissions.KINDS["dataset"].actions
+    group = arns.group("admins")
+    quicksight.permissions["dataset0"] = [{"Principal": group, "Actions": actions}]
+    quicksight.permissions["dataset1"] = [{"Principal": group, "Actions": actions[:2]}]
+    summaries = [{"DataSetId": "dataset0"}, {"DataSetId": "dataset1"}]
+
+    unchanged, missing = permissions.plan("dataset", summaries, group)
+    assert (unchanged.grants, unchanged.revokes) == ([], [])
+    assert missing.grants == [{"Principal": group, "Actions": sorted(actions[2:])}]
+    assert missing.revokes == []
+
+    unchanged, missing = permissions.plan(
+        "dataset", summaries, group, actions[:2], mode="exact"
+    )
+    assert unchanged.revokes == [{"Principal": group, "Actions": sorted(actions[2:])}]
+    assert (missing.grants, missing.revokes) == ([], [])
+
+
+def test_dry_run_updates_nothing(quicksight):
+    before = {key: list(value) for key, value in quicksight.permissions.items()}
+    result = CliRunner().invoke(
+        app, ["bulk-update-dataset-permissions", "admins", "--all", "--dry-run"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "10 of 10 datasets need changes" in result.output
+    counts = quicksight.recorders["quicksight"].counts
+    assert counts["quicksight.update_data_set_permissions"] == 0
+    assert {key: value for key, value in quicksight.permissions.items() if value} == {
+        key: value for key, value in before.items() if value
+    }
+
+
+def test_update_grants_once(quicksight):
+    argv = ["bulk-update-dataset-permissions", "admins", "--all", "--yes"]
+    result = CliRunner().invoke(app, argv)
+    assert result.exit_code == 0, result.output
+    counts = quicksight.recorders["quicksight"].counts
+    assert counts["quicksight.update_data_set_permissions"] == 10
+
+    result = CliRunner().invoke(app, argv)
+    assert result.exit_code == 0, result.output
+    assert "0 of 10 datasets need changes" in result.output
+    assert counts["quicksight.update_data_set_permissions"] == 10
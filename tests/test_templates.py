@@ -0,0 +1,101 @@
+from fastview import templates
+from fastview.templates import Difference
+
+
+def version(sheets=(), datasets=None, **fields):
+    """Returns a template version with these sheets, as (ID, name) pairs, and
+    these placeholders, as {placeholder: {column: data type}}.
+    """
+    return dict(
+        fields,
+        Sheets=[{"SheetId": sheet_id, "Name": name} for sheet_id, name in sheets],
+        DataSetConfigurations=[
+            {
+                "Placeholder": placeholder,
+                "DataSetSchema": {
+                    "ColumnSchemaList": [
+                        {"Name": name, "DataType": data_type}
+                        for name, data_type in columns.items()
+                    ]
+                },
+            }
+            for placeholder, columns in (datasets or {}).items()
+        ],
+    )
+
+
+def test_identical_versions_have_no_differences():
+    old = version([("s1", "Overview")], {"orders": {"id": "INTEGER"}})
+    assert templates.diff(old, dict(old)) == []
+
+
+def test_version_fields():
+    old = version(Description="v1", Status="CREATION_SUCCESSFUL")
+    new = version(Description="v2", Status="CREATION_SUCCESSFUL")
+    assert templates.diff(old, new) == [
+        Difference("Version", "Description", "changed", "v1", "v2")
+    ]
+
+
+def test_added_and_removed_sheets():
+    old = version([("s1", "Overview"), ("s2", "Details")])
+    new = version([("s1", "Overview"), ("s3", "Trends")])
+    assert templates.diff(old, new) == [
+        Difference("Sheets", "s2", "removed", "Details", None),
+        Difference("Sheets", "s3", "added", None, "Trends"),
+    ]
+
+
+def test_renamed_sheet():
+    old = version([("s1", "Overview")])
+    new = version([("s1", "Summary")])
+    assert templates.diff(old, new) == [
+        Difference("Sheets", "s1", "renamed", "Overview", "Summary")
+    ]
+
+
+def test_moved_sheets():
+    old = version([("s1", "A"), ("s2", "B")])
+    new = version([("s2", "B"), ("s1", "A")])
+    assert templates.diff(old, new) == [
+        Difference("Sheets", "s2", "moved", "position 2", "position 1"),
+        Difference("Sheets", "s1", "moved", "position 1", "position 2"),
+    ]
+
+
+def test_an_added_sheet_moves_no_other():
+    old = version([("s1", "A"), ("s2", "B")])
+    new = version([("s3", "New"), ("s1", "A"), ("s2", "B")])
+    assert templates.diff(old, new) == [
+        Difference("Sheets", "s3", "added", None, "New")
+    ]
+
+
+def test_column_changes():
+    old = version(datasets={"orders": {"id": "INTEGER", "city": "STRING"}})
+    new = version(datasets={"orders": {"id": "STRING", "total": "DECIMAL"}})
+    assert templates.diff(old, new) == [
+        Difference("Columns", "orders: city", "removed", "STRING", None),
+        Difference("Columns", "orders: total", "added", None, "DECIMAL"),
+        Difference("Columns", "orders: id", "changed", "INTEGER", "STRING"),
+    ]
+
+
+def test_geographic_role_is_part_of_the_column_type():
+    old = version(datasets={"orders": {"city": "STRING"}})
+    new = version(datasets={"orders": {"city": "STRING"}})
+    new["DataSetConfigurations"][0]["DataSetSchema"]["ColumnSchemaList"][0][
+        "GeographicRole"
+    ] = "CITY"
+    assert templates.diff(old, new) == [
+        Difference("Columns", "orders: city", "changed", "STRING", "STRING, CITY")
+    ]
+
+
+def test_placeholder_changes():
+    old = version(datasets={"orders": {"id": "INTEGER"}})
+    new = version(datasets={"customers": {"id": "INTEGER", "name": "STRING"}})
+    assert templates.diff(old, new) == [
+        Difference("Datasets", "orders", "removed", "1 column", None),
+        Difference("Datasets", "customers", "added", None, "2 columns"),
+    ]
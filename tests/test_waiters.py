@@ -0,0 +1,28 @@
+import threading
+
+from fastview import waiters
+
+
+def test_wait_reports_assets_as_they_finish(monkeypatch):
+    reported = []
+    first_reported = threading.Event()
+
+    def wait_for_one(asset, timeout):
+        # The first asset only finishes once another has been reported.
+        if asset.resource_id == "slow":
+            assert first_reported.wait(5)
+        return "CREATION_SUCCESSFUL", []
+
+    def report(line):
+        reported.append(line)
+        first_reported.set()
+
+    monkeypatch.setattr(waiters, "_wait_for_one", wait_for_one)
+    monkeypatch.setattr(waiters, "print", report, raising=False)
+    waiters.wait(
+        [waiters.Asset("dashboard", "slow", 1), waiters.Asset("dashboard", "fast", 1)]
+    )
+    assert reported == [
+        "dashboard fast (1): CREATION_SUCCESSFUL",
+        "dashboard slow (1): CREATION_SUCCESSFUL",
+    ]